@@ -1,10 +1,231 @@
 import os
+import re
 import json
+import threading
+import time
+import uuid
 import numpy as np
 
+from core.data import compact_polydata
+from core.session import SESSION_EXT, mesh_to_arrays, read_header, write_session
+
+# 自动保存按组件拆分文件，只重写发生变化的组件
+COMPONENTS = ("mask", "measure", "marker", "ref", "camera", "calibration")
+STATE_VERSION = "2.1"
+# 标注类组件走追加日志，基础快照只在日志累计到一定条数后压缩重写
+ANNOTATIONS = ("measure", "marker", "ref")
+JOURNAL_COMPACT_OPS = 256
+# 决定会话快照几何的组件：快照记录写入时它们的代号，恢复前与清单比对
+SESSION_GEOMETRY = ("mask", "calibration")
+# 2.1: 组件文件名带代号 (<scan>_<comp>.<代号>.<扩展名>)，每批写完后最后写清单 _state.json，
+# 清单记录各组件当前文件及其代号；崩溃在批次中途时旧清单仍指向旧文件 (旧文件在新清单落盘后才删)，
+# 恢复时总能拿到同一批次的掩码与标注。
+_GEN_NAME = re.compile(r"^(.*)\.(\d+)(\.[^.]+)$")
+
+
+def _atomic_write(path, write):
+    """写临时文件 -> fsync -> 原子替换；崩溃时磁盘上只有旧文件或完整的新文件。"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _prune(directory, manifest):
+    """清单落盘后删除不再被引用的旧代号文件；删不掉的 (如仍被映射) 留到下次。"""
+    referenced = {name for name in manifest.get("components", {}).values() if name}
+    for key in ("journal", "session"):
+        if manifest.get(key):
+            referenced.add(manifest[key])
+    families = set()
+    for name in referenced:
+        m = _GEN_NAME.match(name)
+        if m:
+            families.add((m.group(1), m.group(3)))
+    if not families:
+        return
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if name in referenced:
+            continue
+        # 写失败留下的临时文件一并清掉
+        m = _GEN_NAME.match(name[:-4] if name.endswith(".tmp") else name)
+        if m and (m.group(1), m.group(3)) in families:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def _fsync_dir(path):
+    # Windows 不支持打开目录，忽略
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _AutosaveWriter:
+    """单个后台写盘线程。排队中的快照按组件合并，只写最新内容；清单总在批次最后写。"""
+
+    def __init__(self, on_failed):
+        self._cond = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._thread = None
+        self._on_failed = on_failed
+
+    def submit(self, files):
+        """files: {path: (component, payload)}，按插入顺序写，清单 ("state") 放最后。"""
+        with self._cond:
+            if self._pending is None:
+                self._pending = {}
+            for path, (comp, payload) in files.items():
+                # 同一组件的新代号文件取代排队中的旧代号文件 (新清单只引用新文件)
+                old = self._pending.pop(comp, None)
+                if comp == "journal" and old is not None and old[0] == path and not payload["reset"]:
+                    # 日志是追加写：合并两次提交的条目，保留前一次的截断标记
+                    payload = {"reset": old[1]["reset"], "lines": old[1]["lines"] + payload["lines"]}
+                self._pending[comp] = (path, payload)
+            self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="autosave-writer", daemon=True)
+                self._thread.start()
+
+    def cancel(self):
+        with self._cond:
+            self._pending = None
+        self.wait_idle()
+
+    def wait_idle(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                batch = self._pending
+                self._pending = None
+                self._busy = True
+            dirs = set()
+            failed = False
+            for comp, (path, payload) in batch.items():
+                try:
+                    if comp == "state":
+                        if failed:
+                            # 本批有文件没写成，不能提交清单；旧清单继续指向完整的上一批
+                            self._on_failed(comp)
+                            continue
+                        # 清单之前的文件先落盘，再原子替换清单
+                        for d in dirs:
+                            _fsync_dir(d)
+                    if comp == "journal":
+                        _write_journal(path, payload)
+                    else:
+                        _atomic_write(path, lambda f: _write_payload(f, comp, payload))
+                    dirs.add(os.path.dirname(path))
+                    if comp == "state":
+                        _fsync_dir(os.path.dirname(path))
+                        _prune(os.path.dirname(path), payload)
+                except Exception as e:
+                    print(f"[AUTOSAVE] write {os.path.basename(path)} failed: {e}", flush=True)
+                    failed = True
+                    self._on_failed(comp)
+            for d in dirs:
+                _fsync_dir(d)
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+
+def _write_payload(f, comp, payload):
+    if comp == "mask":
+        # 位集在写盘线程里打包，GUI 线程只持有 _orig_idx 的引用
+        orig_idx, n_ids, generation = payload
+        alive = np.zeros(n_ids, dtype=bool)
+        alive[orig_idx] = True
+        np.savez_compressed(f, bits=np.packbits(alive), n=n_ids, generation=generation)
+    elif comp == "session":
+        arrays, meta = payload
+        write_session(f, arrays, meta)
+    else:
+        f.write(json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def _write_journal(path, payload):
+    data = b"".join(json.dumps(op, ensure_ascii=False).encode('utf-8') + b"\n" for op in payload["lines"])
+    if payload["reset"] or not os.path.exists(path):
+        _atomic_write(path, lambda f: f.write(data))
+        return
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            # 上次崩溃可能留下半行，先补换行，避免与新条目粘连
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_journal(path):
+    ops = []
+    if not os.path.exists(path):
+        return ops
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                # 截断的最后一行
+                continue
+    return ops
+
+
 class AutosaveManager:
     def __init__(self, main_window):
         self.mw = main_window
+        # 上次写盘时各组件的签名；签名不变的组件跳过
+        self._signatures = {}
+        self._dirty = set(COMPONENTS)
+        self._target = None
+        # 批次代号：每批写盘 +1；_files/_file_gens 为清单中各组件当前引用的文件名与代号
+        self._generation = 0
+        self._files = {}
+        self._file_gens = {}
+        self._manifest_dirty = True
+        # 标注日志: 序号单调递增，基础快照记录已并入的最大序号
+        self._journal_seq = 0
+        self._journal_ops = 0
+        self._journal_ready = False
+        self._failed_lock = threading.Lock()
+        self._failed = set()
+        # 会话快照只在离开精修阶段/关闭时写 (整份复制点坐标)；记下写入时的掩码签名，几何没变就不重写
+        self._session_sig = None
+        self._session_prev = None
+        self._writer = _AutosaveWriter(self._on_write_failed)
+
+    def _on_write_failed(self, comp):
+        # 写盘线程回调：下次保存时重写该组件
+        with self._failed_lock:
+            self._failed.add(comp)
+
+    def flush(self, timeout=None):
+        """等待后台写盘完成 (退出程序前调用)。"""
+        return self._writer.wait_idle(timeout)
 
     def _autosave_dir(self):
         root = None
@@ -19,8 +240,171 @@ class AutosaveManager:
             return ""
         return os.path.join(root, "autosave")
 
-    def save(self):
-        """Background save of tool state and point mask."""
+    def _paths(self):
+        autosave_dir = self._autosave_dir()
+        name = self.mw.scan_name
+        paths = {"state": os.path.join(autosave_dir, f"{name}_state.json"),
+                 "mask": os.path.join(autosave_dir, f"{name}_mask.npz"),
+                 "journal": os.path.join(autosave_dir, f"{name}_journal.jsonl"),
+                 "session": os.path.join(autosave_dir, f"{name}_session{SESSION_EXT}"),
+                 "edit": os.path.join(autosave_dir, f"{name}_edit.ply")}
+        for comp in COMPONENTS[1:]:
+            paths[comp] = os.path.join(autosave_dir, f"{name}_{comp}.json")
+        return paths
+
+    def _gen_path(self, comp, generation):
+        """带代号的组件文件路径 (2.1)。"""
+        ext = {"mask": ".npz", "journal": ".jsonl", "session": SESSION_EXT}.get(comp, ".json")
+        return os.path.join(self._autosave_dir(), f"{self.mw.scan_name}_{comp}.{generation:06d}{ext}")
+
+    def _read_manifest(self, paths):
+        try:
+            with open(paths["state"], 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _component_path(self, paths, manifest, comp):
+        """清单中记录的组件文件 (2.0/2.1)；没有清单或未记录时用固定文件名。"""
+        key = comp if comp in ("journal", "session") else None
+        name = (manifest or {}).get(key) if key else (manifest or {}).get("components", {}).get(comp)
+        if name:
+            return os.path.join(os.path.dirname(paths["state"]), name)
+        return paths[comp]
+
+    def _adopt_manifest(self, paths):
+        """从磁盘清单接续代号与文件引用 (新文件代号不会与清单引用的文件重名)。"""
+        manifest = self._read_manifest(paths)
+        self._files = {}
+        self._file_gens = {}
+        self._generation = 0
+        if manifest and manifest.get("version") == STATE_VERSION:
+            self._generation = int(manifest.get("generation", 0))
+            self._files = dict(manifest.get("components", {}))
+            self._file_gens = {k: int(v) for k, v in manifest.get("generations", {}).items() if v is not None}
+            for key in ("journal", "session"):
+                if manifest.get(key):
+                    self._files[key] = manifest[key]
+        return manifest
+
+    def mark_dirty(self, *components):
+        """强制下次保存时重写指定组件 (不传参数则全部)。"""
+        self._dirty.update(components or COMPONENTS)
+
+    # --- 组件采集 ---
+    def _collect_mask(self):
+        mesh = self.mw.data_manager.mesh
+        if mesh is None or '_orig_idx' not in mesh.point_data:
+            return None
+        # 删除点总会替换 mesh，旧数组不再被修改，可直接交给写盘线程
+        orig_idx = np.asarray(mesh.point_data['_orig_idx'])
+        n_ids = int(orig_idx.max()) + 1 if len(orig_idx) else 0
+        orig = self.mw.data_manager.original_mesh
+        if orig is not None:
+            n_ids = max(n_ids, orig.n_points)
+        # 以原始点序号空间为位集: 5M 点仅 ~625KB
+        return orig_idx, n_ids
+
+    def _collect_camera(self):
+        if self.mw.data_manager.mesh is None or not self.mw.canvas.plotter.camera:
+            return {}
+        cam = self.mw.canvas.plotter.camera
+        return {
+            "position": list(cam.GetPosition()),
+            "focal_point": list(cam.GetFocalPoint()),
+            "view_up": list(cam.GetViewUp()),
+            "parallel_scale": cam.GetParallelScale()
+        }
+
+    def _measure_item(self, seg):
+        seg_data = {
+            "type": seg.get('type', 'poly'),
+            "color": seg.get('color', '#ffff00')
+        }
+        if seg_data['type'] == 'poly':
+            seg_data['points'] = [list(map(float, p)) for p in seg.get('points', [])]
+        elif seg_data['type'] in ['perp', 'direct', 'two_point']:
+            pts = seg.get('arrow_pts', {})
+            if 'pt' in pts:
+                seg_data['pt'] = list(map(float, pts.get('pt', [0,0,0])))
+                seg_data['h'] = list(map(float, pts.get('h', [0,0,0])))
+            if 'p1' in pts:
+                seg_data['p1'] = list(map(float, pts.get('p1', [0,0,0])))
+                seg_data['p2'] = list(map(float, pts.get('p2', [0,0,0])))
+            seg_data['dist'] = float(seg.get('distance', 0))
+        return seg_data
+
+    def _marker_item(self, mk):
+        # 批量恢复的标记没有独立点 actor，位置存在 'pos'
+        center = mk.get('pos') or mk['actors'][0].GetCenter()
+        return {
+            "pos": list(center),
+            "label": mk['label'],
+            "desc": mk.get('desc', ''),
+            "image": mk.get('image', '')
+        }
+
+    def _ref_item(self, ref):
+        if ref['type'] == 'line':
+            return {"type": "line", "p1": list(map(float, ref['p1'])), "p2": list(map(float, ref['p2']))}
+        if ref['type'] == 'point':
+            return {"type": "point", "pt": list(map(float, ref['pt']))}
+        return None
+
+    def _collect_annotations(self, comp):
+        """{uid: 数据}；uid 写在工具自己的字典里，跨次保存保持不变。"""
+        source = {
+            "measure": self.mw.tool_measure.segments,
+            "marker": self.mw.tool_marker.markers,
+            "ref": getattr(self.mw.tool_ref, 'refs', []),
+        }[comp]
+        item_fn = getattr(self, f"_{comp}_item")
+        items = {}
+        for obj in source:
+            data = item_fn(obj)
+            if data is None:
+                continue
+            uid = obj.get('_uid')
+            if uid is None:
+                uid = obj['_uid'] = uuid.uuid4().hex[:12]
+            items[uid] = data
+        return items
+
+    def _collect_calibration(self):
+        # Calibration transform (ground + north)
+        try:
+            mat = getattr(self.mw.tool_calibration, 'accumulated_matrix', None)
+            if mat is not None:
+                return np.array(mat, dtype=float).tolist()
+        except Exception:
+            pass
+        return []
+
+    def _signature(self, comp):
+        """组件的廉价变化签名；掩码只看 mesh 代数，不触碰点数组。"""
+        if comp == "mask":
+            dm = self.mw.data_manager
+            return (id(dm.mesh), dm.mesh_generation)
+        if comp in ANNOTATIONS:
+            return self._collect_annotations(comp)
+        return getattr(self, f"_collect_{comp}")()
+
+    def _remember_current(self):
+        """把当前状态记为已保存 (恢复之后调用，避免立即整份重写)。"""
+        self._target = self._paths()
+        self._signatures = {comp: self._signature(comp) for comp in COMPONENTS}
+        self._dirty.clear()
+        # 恢复出的标注拿到了新的 uid，下次保存时压缩成新的基础快照
+        self._dirty.update(ANNOTATIONS)
+        self._adopt_manifest(self._target)
+        if not all(comp in self._files for comp in COMPONENTS):
+            # 旧版 1.0/2.0 状态文件：全部组件按 2.1 重写一次
+            self._dirty.update(COMPONENTS)
+            self._journal_ready = False
+
+    def save(self, session=False):
+        """Snapshot changed components on the GUI thread; the writer thread does the disk I/O.
+        session=True 时 (离开精修阶段/关闭) 一并写整份会话快照。"""
         if getattr(self.mw, '_suspend_autosave', False):
             return
         if getattr(self.mw, '_is_closing', False):
@@ -34,83 +418,186 @@ class AutosaveManager:
             return
         os.makedirs(autosave_dir, exist_ok=True)
 
-        mask_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_mask.npz")
-        state_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_state.json")
+        paths = self._paths()
+        if paths != self._target:
+            # 换了工程/扫描: 全部重写 (代号接着磁盘上的清单往后编)
+            self._target = paths
+            self._signatures = {}
+            self._dirty.update(COMPONENTS)
+            self._journal_ready = False
+            self._journal_seq = 0
+            self._adopt_manifest(paths)
+            self._manifest_dirty = True
+            self._session_sig = None
 
-        # 1. Save mask
-        mesh = self.mw.data_manager.mesh
-        if mesh is not None and '_orig_idx' in mesh.point_data:
-            orig_idx = mesh.point_data['_orig_idx']
-            np.savez_compressed(mask_path, orig_idx=orig_idx)
-
-        # 2. Save Tool States
-        state = {
-            "version": "1.0",
-            "camera": {},
-            "measure": [],
-            "marker": [],
-            "ref": {},
-            "calibration_matrix": []
+        with self._failed_lock:
+            if "state" in self._failed:
+                self._manifest_dirty = True
+            if "journal" in self._failed:
+                self._journal_ready = False
+            if "session" in self._failed:
+                # 快照没写成：清单退回上一份快照，等下次离开阶段/关闭时再写
+                self._session_sig = None
+                if self._session_prev:
+                    self._files["session"] = self._session_prev
+                else:
+                    self._files.pop("session", None)
+            self._dirty.update(self._failed & set(COMPONENTS))
+            self._failed.clear()
+
+        generation = self._generation + 1
+        files = {}
+        for comp in COMPONENTS:
+            if comp in ANNOTATIONS:
+                continue
+            sig = self._signature(comp)
+            if comp in self._dirty or sig != self._signatures.get(comp) or comp not in self._files:
+                payload = self._collect_mask() if comp == "mask" else sig   # 签名即组件内容
+                if payload is not None:
+                    if comp == "mask":
+                        payload = payload + (generation,)
+                    self._stage_file(files, comp, generation, payload)
+                self._signatures[comp] = sig
+                self._dirty.discard(comp)
+
+        # 标注: 只追加变化的条目；日志过长或基础快照缺失时压缩
+        annotations = {comp: self._signature(comp) for comp in ANNOTATIONS}
+        compact = (
+            not self._journal_ready
+            or self._journal_ops >= JOURNAL_COMPACT_OPS
+            or any(comp in self._dirty or comp not in self._files for comp in ANNOTATIONS)
+        )
+        if compact:
+            self._compact(files, generation, annotations)
+        else:
+            ops = []
+            for comp in ANNOTATIONS:
+                ops.extend(self._diff(comp, self._signatures.get(comp, {}), annotations[comp]))
+            if ops:
+                path = os.path.join(os.path.dirname(paths["state"]), self._files["journal"])
+                files[path] = ("journal", {"reset": False, "lines": ops})
+                self._journal_ops += len(ops)
+        for comp in ANNOTATIONS:
+            self._signatures[comp] = annotations[comp]
+            self._dirty.discard(comp)
+
+        # 会话快照写到新代号的文件：当前 mesh 可能正映射着上一份快照，不能原地替换
+        if session and getattr(self.mw, 'current_stage', '') in ('EDITOR', 'OUTPUT'):
+            sig = {comp: self._file_gens.get(comp) for comp in SESSION_GEOMETRY}
+            if sig != self._session_sig or "session" not in self._files:
+                snapshot = self._session_snapshot(annotations, sig)
+                if snapshot is not None:
+                    self._session_prev = self._files.get("session")
+                    self._stage_file(files, "session", generation, snapshot)
+                    self._session_sig = sig
+
+        if files or self._manifest_dirty:
+            # 清单最后写：记录本批各组件文件、代号与已提交的日志序号
+            self._generation = generation
+            files[paths["state"]] = ("state", self._manifest())
+            self._manifest_dirty = False
+            self._writer.submit(files)
+
+    def _stage_file(self, files, comp, generation, payload):
+        path = self._gen_path(comp, generation)
+        files[path] = (comp, payload)
+        self._files[comp] = os.path.basename(path)
+        self._file_gens[comp] = generation
+
+    def _manifest(self):
+        return {
+            "version": STATE_VERSION,
+            "generation": self._generation,
+            "components": {comp: self._files.get(comp) for comp in COMPONENTS},
+            "generations": {comp: self._file_gens.get(comp) for comp in COMPONENTS},
+            "journal": self._files.get("journal"),
+            "journal_seq": self._journal_seq,
+            "session": self._files.get("session"),
         }
 
-        # Camera
-        if mesh is not None and self.mw.canvas.plotter.camera:
-            cam = self.mw.canvas.plotter.camera
-            state["camera"] = {
-                "position": list(cam.GetPosition()),
-                "focal_point": list(cam.GetFocalPoint()),
-                "view_up": list(cam.GetViewUp()),
-                "parallel_scale": cam.GetParallelScale()
-            }
+    def _session_snapshot(self, annotations, generations):
+        mesh = self.mw.data_manager.mesh
+        if mesh is None or mesh.n_points == 0:
+            return None
+        arrays, meta = mesh_to_arrays(mesh)
+        # 点坐标可能被原地变换，复制一份交给写盘线程；其余数组随 mesh 替换而不变
+        arrays["points"] = np.array(arrays["points"])
+        meta.update({
+            "scan_name": self.mw.scan_name,
+            "texture_path": self.mw.texture_path if getattr(self.mw, 'has_texture_input', False) else "",
+            "camera": self._signatures.get("camera", {}),
+            "calibration_matrix": self._signatures.get("calibration", []),
+            "annotations": {
+                comp: [dict(data, _uid=uid) for uid, data in annotations[comp].items()]
+                for comp in ANNOTATIONS
+            },
+            "journal_seq": self._journal_seq,
+            # 快照几何对应的掩码/标定代号；恢复时与清单不符说明之后又有删除/撤回/标定
+            "generations": generations,
+        })
+        return arrays, meta
 
-        # Measure 
-        for seg in self.mw.tool_measure.segments:
-            seg_data = {
-                "type": seg.get('type', 'poly'),
-                "color": seg.get('color', '#ffff00')
-            }
-            if seg_data['type'] == 'poly':
-                seg_data['points'] = [list(p) for p in seg.get('points', [])]
-            elif seg_data['type'] in ['perp', 'direct', 'two_point']:
-                pts = seg.get('arrow_pts', {})
-                if 'pt' in pts:
-                    seg_data['pt'] = list(pts.get('pt', [0,0,0]))
-                    seg_data['h'] = list(pts.get('h', [0,0,0]))
-                if 'p1' in pts:
-                    seg_data['p1'] = list(pts.get('p1', [0,0,0]))
-                    seg_data['p2'] = list(pts.get('p2', [0,0,0]))
-                seg_data['dist'] = seg.get('distance', 0)
-            state["measure"].append(seg_data)
-
-        # Marker
-        for mk in self.mw.tool_marker.markers:
-            # First actor is the point (sphere)
-            center = mk['actors'][0].GetCenter()
-            state["marker"].append({
-                "pos": list(center),
-                "label": mk['label'],
-                "desc": mk.get('desc', ''),
-                "image": mk.get('image', '')
-            })
-
-        # Ref
-        state["ref"] = []
-        for ref in getattr(self.mw.tool_ref, 'refs', []):
-            if ref['type'] == 'line':
-                state["ref"].append({"type": "line", "p1": list(ref['p1']), "p2": list(ref['p2'])})
-            elif ref['type'] == 'point':
-                state["ref"].append({"type": "point", "pt": list(ref['pt'])})
+    def session_path(self):
+        """
+        当前案件可直接恢复的会话快照路径；不存在或已过期时返回空字符串。
+        快照只在离开阶段/关闭时写，崩溃后清单里的掩码/标定可能比快照新：
+        代号不符时不用快照，由调用方走 编辑文件 + 掩码 的常规恢复。
+        """
+        if not getattr(self.mw, 'scan_dir', None) or not getattr(self.mw, 'scan_name', None):
+            return ""
+        if not self._autosave_dir():
+            return ""
+        paths = self._paths()
+        manifest = self._read_manifest(paths)
+        path = self._component_path(paths, manifest, "session")
+        if not os.path.exists(path):
+            return ""
+        if manifest is not None:
+            try:
+                saved = read_header(path).get("meta", {}).get("generations")
+            except Exception as e:
+                print(f"[AUTOSAVE] session header unreadable: {e}", flush=True)
+                return ""
+            current = {comp: manifest.get("generations", {}).get(comp) for comp in SESSION_GEOMETRY}
+            if saved != current:
+                print(f"[AUTOSAVE] session is older than the autosave ({saved} != {current}), not resuming from it",
+                      flush=True)
+                return ""
+        return path
 
-        # Calibration transform (ground + north)
-        try:
-            mat = getattr(self.mw.tool_calibration, 'accumulated_matrix', None)
-            if mat is not None:
-                state["calibration_matrix"] = np.array(mat, dtype=float).tolist()
-        except Exception:
-            pass
+    def _diff(self, comp, old, new):
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        ops = []
+        for uid, data in new.items():
+            if uid not in old:
+                op = "add"
+            elif old[uid] != data:
+                op = "update"
+            else:
+                continue
+            self._journal_seq += 1
+            ops.append({"seq": self._journal_seq, "t": now, "op": op, "comp": comp, "uid": uid, "data": data})
+        for uid in old:
+            if uid not in new:
+                self._journal_seq += 1
+                ops.append({"seq": self._journal_seq, "t": now, "op": "delete", "comp": comp, "uid": uid})
+        return ops
 
-        with open(state_path, 'w', encoding='utf-8') as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
+    def _compact(self, files, generation, annotations):
+        """重写标注基础快照 (带本批代号)；序号不回退，日志保留为操作记录，截断时换新代号的日志文件。"""
+        for comp in ANNOTATIONS:
+            items = [dict(data, _uid=uid) for uid, data in annotations[comp].items()]
+            self._stage_file(files, comp, generation, {"generation": generation, "seq": self._journal_seq, "items": items})
+        mark = {"seq": self._journal_seq, "t": time.strftime("%Y-%m-%d %H:%M:%S"), "op": "compact"}
+        reset = not self._journal_ready or "journal" not in self._files
+        if reset:
+            path = self._gen_path("journal", generation)
+            self._files["journal"] = os.path.basename(path)
+        else:
+            path = os.path.join(self._autosave_dir(), self._files["journal"])
+        files[path] = ("journal", {"reset": reset, "lines": [mark]})
+        self._journal_ready = True
+        self._journal_ops = 0
 
     def clear_autosave(self):
         """Delete autosave files to prevent resuming."""
@@ -119,13 +606,24 @@ class AutosaveManager:
         autosave_dir = self._autosave_dir()
         if not autosave_dir:
             return
-        mask_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_mask.npz")
-        state_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_state.json")
-        edit_ply = os.path.join(autosave_dir, f"{self.mw.scan_name}_edit.ply")
-        for p in [mask_path, state_path, edit_ply]:
+        self._writer.cancel()
+        paths = self._paths()
+        manifest = self._read_manifest(paths)
+        # 先删清单，残留的代号文件不会再被恢复
+        targets = [paths["state"]] + [self._component_path(paths, manifest, c) for c in COMPONENTS + ("journal", "session")]
+        targets += list(paths.values())
+        for p in dict.fromkeys(targets):
             if os.path.exists(p):
                 try: os.remove(p)
-                except Exception: pass
+                except Exception as e: print(f"[AUTOSAVE] remove {os.path.basename(p)} failed: {e}", flush=True)
+        self._signatures = {}
+        self._dirty.update(COMPONENTS)
+        self._files = {}
+        self._file_gens = {}
+        self._manifest_dirty = True
+        self._session_sig = None
+        self._journal_ready = False
+        self._journal_seq = 0
 
     def has_autosave(self):
         if not getattr(self.mw, 'scan_dir', None) or not getattr(self.mw, 'scan_name', None):
@@ -133,117 +631,192 @@ class AutosaveManager:
         autosave_dir = self._autosave_dir()
         if not autosave_dir:
             return False
-        mask_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_mask.npz")
-        state_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_state.json")
-        return os.path.exists(mask_path) and os.path.exists(state_path)
+        paths = self._paths()
+        manifest = self._read_manifest(paths)
+        if manifest is not None and os.path.exists(self._component_path(paths, manifest, "mask")):
+            return True
+        return os.path.exists(self._component_path(paths, manifest, "session"))
+
+    def _load_state(self, paths, manifest):
+        """读取状态；兼容 1.0 的单文件格式，只有会话快照时从快照头读取。
+        2.1 的标注基础快照须与清单记录的代号一致，日志只重放清单提交过的序号。"""
+        if manifest is None:
+            meta = read_header(self._component_path(paths, manifest, "session")).get("meta", {})
+            state = {
+                "camera": meta.get("camera", {}),
+                "calibration_matrix": meta.get("calibration_matrix", []),
+            }
+            for comp in ANNOTATIONS:
+                state[comp] = [{k: v for k, v in d.items() if k != "_uid"} for d in meta.get("annotations", {}).get(comp, [])]
+            return state
+        if manifest.get("version") == "1.0":
+            return manifest
+        gens = manifest.get("generations", {}) if manifest.get("version") == STATE_VERSION else {}
+        merged = {}
+        keys = {"calibration": "calibration_matrix"}
+        bases = {}
+        for comp in COMPONENTS[1:]:
+            path = self._component_path(paths, manifest, comp)
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Failed to load autosave component {comp}: {e}")
+                continue
+            if comp in ANNOTATIONS:
+                if comp in gens and not (isinstance(data, dict) and data.get("generation") == gens[comp]):
+                    print(f"[AUTOSAVE] {comp} generation mismatch, skipped", flush=True)
+                    continue
+                bases[comp] = data
+            else:
+                merged[keys.get(comp, comp)] = data
+        max_seq = manifest.get("journal_seq") if gens else None
+        journal = self._component_path(paths, manifest, "journal")
+        for comp, items in self._replay_journal(journal, bases, max_seq).items():
+            merged[comp] = list(items.values())
+        return merged
+
+    def _replay_journal(self, journal_path, bases, max_seq=None):
+        """在基础快照上重放日志中序号更新的条目，返回 {组件: {uid: 数据}}。
+        max_seq 为清单提交过的最大序号；之后的条目属于未完成的批次，丢弃。"""
+        result = {}
+        seqs = {}
+        for comp in ANNOTATIONS:
+            base = bases.get(comp, [])
+            if isinstance(base, list):
+                # 早期 2.0 快照是不带 uid 的纯列表
+                base = {"seq": 0, "items": [dict(d, _uid=f"legacy-{i}") for i, d in enumerate(base)]}
+            items = {}
+            for d in base.get("items", []):
+                d = dict(d)
+                items[d.pop("_uid")] = d
+            result[comp] = items
+            seqs[comp] = int(base.get("seq", 0))
+        last_seq = max(seqs.values()) if seqs else 0
+        n_applied = 0
+        uncommitted = False
+        for op in _read_journal(journal_path):
+            seq = int(op.get("seq", 0))
+            if max_seq is not None and seq > int(max_seq):
+                uncommitted = True
+                continue
+            last_seq = max(last_seq, seq)
+            comp = op.get("comp")
+            if comp not in result or seq <= seqs[comp]:
+                continue
+            if op.get("op") == "delete":
+                result[comp].pop(op.get("uid"), None)
+            elif op.get("op") in ("add", "update"):
+                result[comp][op.get("uid")] = op.get("data", {})
+            n_applied += 1
+        self._journal_seq = last_seq
+        # 日志尾部有未提交条目时换新日志文件，免得它们被之后的清单序号覆盖进来
+        self._journal_ready = not uncommitted
+        if n_applied:
+            print(f"[AUTOSAVE] replayed {n_applied} journal ops", flush=True)
+        return result
+
+    def _load_keep_mask(self, mask_path, current_idx, generation=None):
+        """读取掩码并散射成按原始序号索引的 bool 数组，O(N) 得到当前点的保留掩码。
+        generation 为清单记录的代号，与文件内的不符时返回 None。"""
+        data = np.load(mask_path)
+        current_idx = np.asarray(current_idx, dtype=np.int64)
+        if generation is not None and ('generation' not in data or int(data['generation']) != int(generation)):
+            print(f"[AUTOSAVE] mask generation mismatch, skipped", flush=True)
+            return None
+        if 'bits' in data:
+            n = int(data['n'])
+            alive = np.unpackbits(data['bits'], count=n).view(bool)
+        elif 'orig_idx' in data:
+            saved_idx = np.asarray(data['orig_idx'], dtype=np.int64)
+            n = int(saved_idx.max()) + 1 if len(saved_idx) else 0
+            alive = np.zeros(n, dtype=bool)
+            alive[saved_idx] = True
+        else:
+            return None
+        keep = np.zeros(len(current_idx), dtype=bool)
+        valid = current_idx < n
+        keep[valid] = alive[current_idx[valid]]
+        return keep
 
     def restore(self):
         """Restore tool state and point mask."""
+        self._writer.wait_idle()
         if not self.has_autosave(): return False
         
-        autosave_dir = self._autosave_dir()
-        mask_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_mask.npz")
-        state_path = os.path.join(autosave_dir, f"{self.mw.scan_name}_state.json")
+        paths = self._paths()
+        manifest = self._read_manifest(paths)
+        mask_path = self._component_path(paths, manifest, "mask")
+        mask_gen = None
+        if manifest is not None and manifest.get("version") == STATE_VERSION:
+            mask_gen = manifest.get("generations", {}).get("mask")
 
         # 1. Restore mask
         mesh = self.mw.data_manager.mesh
-        if mesh is not None and '_orig_idx' in mesh.point_data:
+        if mesh is not None and '_orig_idx' in mesh.point_data and os.path.exists(mask_path):
             try:
-                data = np.load(mask_path)
-                if 'orig_idx' in data:
-                    saved_idx = data['orig_idx']
-                    current_idx = mesh.point_data['_orig_idx']
-                    keep = np.isin(current_idx, saved_idx)
-                    self.mw.data_manager.mesh = mesh.extract_points(keep)
+                t0 = time.time()
+                keep = self._load_keep_mask(mask_path, mesh.point_data['_orig_idx'], mask_gen)
+                if keep is not None and not keep.all():
+                    self.mw.data_manager.mesh = compact_polydata(mesh, keep)
                     self.mw.canvas.render_mesh(self.mw.data_manager)
+                print(f"[TIME][AUTOSAVE] restore_mask={time.time() - t0:.3f}s", flush=True)
             except Exception as e:
                 print(f"Failed to load mask: {e}")
 
         # 2. Restore Tool States
-        original_render = None
         try:
             self.mw._suspend_autosave = True
             self.mw._bulk_ui_update = True
-            plotter = self.mw.canvas.plotter
-            original_render = plotter.render
-            plotter.render = lambda *args, **kwargs: None
+            t0 = time.time()
+            # 恢复期间连隐式渲染也抑制，结束后由调度器只渲染一帧
+            with self.mw.canvas.render_scheduler.batch():
+                state = self._load_state(paths, manifest)
 
-            with open(state_path, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+                # Restore calibration transform before rebuilding overlays when restoring from Stage 1 raw load.
+                # In Stage 2 restore paths mesh is typically already transformed, so skip to avoid double-apply.
+                try:
+                    calib = state.get('calibration_matrix', [])
+                    if calib and getattr(self.mw, 'current_stage', '') == 'PREPARE' and self.mw.data_manager.mesh is not None:
+                        mat = np.array(calib, dtype=float)
+                        if mat.shape == (4, 4):
+                            self.mw.data_manager.transform(mat)
+                            if hasattr(self.mw, 'tool_calibration'):
+                                self.mw.tool_calibration.accumulated_matrix = mat
+                            self.mw.canvas.render_mesh(self.mw.data_manager)
+                except Exception as e:
+                    print(f"Restore calibration matrix failed: {e}")
 
-            # Restore calibration transform before rebuilding overlays when restoring from Stage 1 raw load.
-            # In Stage 2 restore paths mesh is typically already transformed, so skip to avoid double-apply.
-            try:
-                calib = state.get('calibration_matrix', [])
-                if calib and getattr(self.mw, 'current_stage', '') == 'PREPARE' and self.mw.data_manager.mesh is not None:
-                    mat = np.array(calib, dtype=float)
-                    if mat.shape == (4, 4):
-                        self.mw.data_manager.mesh.transform(mat, inplace=True)
-                        if hasattr(self.mw, 'tool_calibration'):
-                            self.mw.tool_calibration.accumulated_matrix = mat
-                        self.mw.canvas.render_mesh(self.mw.data_manager)
-            except Exception as e:
-                print(f"Restore calibration matrix failed: {e}")
-
-            # ref
-            for ref_data in state.get('ref', []):
-                if ref_data.get('type') == 'line':
-                    self.mw.tool_ref.active_points = [np.array(ref_data['p1']), np.array(ref_data['p2'])]
-                    self.mw.tool_ref._create_ref_line(np.array(ref_data['p1']), np.array(ref_data['p2']))
-                    self.mw.tool_ref.active_points = []
-                elif ref_data.get('type') == 'point':
-                    self.mw.tool_ref._create_ref_point(np.array(ref_data['pt']))
-
-            # marker
-            for mk in state.get('marker', []):
-                self.mw.tool_marker.add_marker(mk['pos'], mk['label'], mk.get('desc',''), mk.get('image',''))
-
-            # measure
-            for seg in state.get('measure', []):
-                mtype = seg.get('type', 'poly')
-                color = seg.get('color', '#ffff00')
-                old_color = self.mw.tool_measure.style_color
-                self.mw.tool_measure.style_color = color
-                
-                if mtype == 'poly':
-                    pts = [np.array(p) for p in seg.get('points', [])]
-                    if len(pts) > 1:
-                        self.mw.tool_measure._create_segment_visuals(pts, is_new=True)
-                elif mtype == 'perp':
-                    if 'pt' in seg and 'h' in seg:
-                        self.mw.tool_measure._restore_perp(np.array(seg['pt']), np.array(seg['h']), seg.get('dist', 0), color)
-                elif mtype == 'direct':
-                    if 'p1' in seg and 'p2' in seg:
-                        self.mw.tool_measure._restore_direct(np.array(seg['p1']), np.array(seg['p2']), seg.get('dist', 0), color)
-                elif mtype == 'two_point':
-                    if 'p1' in seg and 'p2' in seg:
-                        self.mw.tool_measure._restore_two_point(np.array(seg['p1']), np.array(seg['p2']), seg.get('dist', 0), color)
-                
-                self.mw.tool_measure.style_color = old_color
-
-            # camera
-            cam_data = state.get('camera', {})
-            if cam_data and self.mw.canvas.plotter.camera:
-                cam = self.mw.canvas.plotter.camera
-                cam.SetPosition(cam_data['position'])
-                cam.SetFocalPoint(cam_data['focal_point'])
-                cam.SetViewUp(cam_data['view_up'])
-                cam.SetParallelScale(cam_data['parallel_scale'])
-            
-            # Single final render after all restore operations are completed.
-            plotter.render = original_render
-            self.mw.canvas.plotter.render()
-            
+                # ref
+                for ref_data in state.get('ref', []):
+                    if ref_data.get('type') == 'line':
+                        self.mw.tool_ref.active_points = [np.array(ref_data['p1']), np.array(ref_data['p2'])]
+                        self.mw.tool_ref._create_ref_line(np.array(ref_data['p1']), np.array(ref_data['p2']))
+                        self.mw.tool_ref.active_points = []
+                    elif ref_data.get('type') == 'point':
+                        self.mw.tool_ref._create_ref_point(np.array(ref_data['pt']))
+
+                # marker / measure: 几何向量化合并成少量 actor，只有文字标签逐个创建
+                self.mw.tool_marker.restore_batch(state.get('marker', []))
+                self.mw.tool_measure.restore_batch(state.get('measure', []))
+                print(f"[TIME][AUTOSAVE] restore_overlays={time.time() - t0:.3f}s", flush=True)
+
+                # camera
+                cam_data = state.get('camera', {})
+                if cam_data and self.mw.canvas.plotter.camera:
+                    cam = self.mw.canvas.plotter.camera
+                    cam.SetPosition(cam_data['position'])
+                    cam.SetFocalPoint(cam_data['focal_point'])
+                    cam.SetViewUp(cam_data['view_up'])
+                    cam.SetParallelScale(cam_data['parallel_scale'])
         except Exception as e:
             print(f"Restore state failed: {e}")
             return False
         finally:
-            try:
-                if original_render is not None:
-                    self.mw.canvas.plotter.render = original_render
-            except Exception:
-                pass
             self.mw._bulk_ui_update = False
             self.mw._suspend_autosave = False
-            
+
+        self._remember_current()
         return True
@@ -1,28 +1,195 @@
+import threading
+import time
+
 import pyvista as pv
 import numpy as np
 
+from core.outliers import radius_outliers, statistical_outliers
+from core.spatial import VoxelIndex, box_planes, planes_mask
+
+
+def point_cloud(points):
+    """无单元格的点云 PolyData：只存坐标，不生成逐点的顶点单元 (connectivity + offsets，约 16 字节/点)。
+    画布用 vtkPointGaussianMapper 直接按坐标绘制。"""
+    cloud = pv.PolyData()
+    cloud.points = points
+    return cloud
+
+
+def has_surface(mesh):
+    """是否带面片/线；只有散点 (或只有顶点单元) 时为 False。"""
+    if isinstance(mesh, pv.PolyData):
+        return any(
+            cells is not None and cells.GetNumberOfCells() > 0
+            for cells in (mesh.GetPolys(), mesh.GetStrips(), mesh.GetLines())
+        )
+    if isinstance(mesh, pv.UnstructuredGrid):
+        return bool(np.any(~np.isin(mesh.celltypes, (pv.CellType.VERTEX, pv.CellType.POLY_VERTEX))))
+    return mesh.n_cells > 0
+
+
+def as_point_cloud(mesh):
+    """散点数据去掉顶点单元，返回无单元格的 PolyData；带面片的网格原样返回。"""
+    if has_surface(mesh):
+        return mesh
+    if isinstance(mesh, pv.PolyData):
+        verts = mesh.GetVerts()
+        if verts is not None and verts.GetNumberOfCells() > 0:
+            mesh.SetVerts(pv.CellArray())
+        return mesh
+    cloud = point_cloud(mesh.points)
+    for name in mesh.point_data.keys():
+        cloud.point_data[name] = mesh.point_data[name]
+    tcoords = mesh.GetPointData().GetTCoords()
+    if tcoords is not None and tcoords.GetName() in cloud.point_data:
+        cloud.GetPointData().SetActiveTCoords(tcoords.GetName())
+    return cloud
+
+
+def _poly_arrays(mesh):
+    """面片的 (offsets, connectivity)，没有面片时返回 None。"""
+    polys = mesh.GetPolys() if isinstance(mesh, pv.PolyData) else None
+    if polys is None or polys.GetNumberOfCells() == 0:
+        return None
+    offsets = np.asarray(pv.convert_array(polys.GetOffsetsArray()), dtype=np.int64)
+    conn = np.asarray(pv.convert_array(polys.GetConnectivityArray()), dtype=np.int64)
+    return offsets, conn
+
+
+def _faces_alive(offsets, conn, keep):
+    """每个面的顶点是否全部存活，返回 (face_ok, sizes)。"""
+    sizes = np.diff(offsets)
+    alive = keep[conn]
+    # 每个面的存活顶点数 == 面的顶点数 才保留
+    alive_count = np.add.reduceat(alive.astype(np.int64), offsets[:-1]) if len(conn) else np.zeros(0, dtype=np.int64)
+    alive_count[sizes == 0] = 0
+    return (alive_count == sizes) & (sizes > 0), sizes
+
+
+def surface_keep_mask(mesh, keep):
+    """
+    网格删点的保留掩码：删掉的顶点连同相邻面一起去掉后，只被这些面引用的顶点成了孤立点
+    (看不见却仍会被套索选中、被拾取)，一并去掉；原本就不属于任何面的顶点保持不变。
+    """
+    arrays = _poly_arrays(mesh)
+    if arrays is None:
+        return keep
+    offsets, conn = arrays
+    face_ok, sizes = _faces_alive(offsets, conn, keep)
+    n = len(keep)
+    was_used = np.bincount(conn, minlength=n)[:n] > 0
+    still_used = np.bincount(conn[np.repeat(face_ok, sizes)], minlength=n)[:n] > 0
+    return keep & (still_used | ~was_used)
+
+
+def _compact_faces(mesh, keep):
+    """保留全部顶点都存活的面，并把顶点序号重映射到压缩后的编号。"""
+    arrays = _poly_arrays(mesh)
+    if arrays is None:
+        return None
+    offsets, conn = arrays
+    face_ok, sizes = _faces_alive(offsets, conn, keep)
+    if not np.any(face_ok):
+        return np.empty(0, dtype=np.int64)
+    new_id = np.cumsum(keep, dtype=np.int64) - 1
+    kept_sizes = sizes[face_ok]
+    kept_conn = new_id[conn[np.repeat(face_ok, sizes)]]
+    # 拼回 [n, i0, i1, ..., n, ...] 的 padded 格式
+    faces = np.empty(len(kept_conn) + len(kept_sizes), dtype=np.int64)
+    heads = np.cumsum(kept_sizes + 1) - (kept_sizes + 1)
+    is_head = np.zeros(len(faces), dtype=bool)
+    is_head[heads] = True
+    faces[heads] = kept_sizes
+    faces[~is_head] = kept_conn
+    return faces
+
+
+def compact_polydata(mesh, keep):
+    """按布尔掩码直接压缩点数组，返回 PolyData (不走 extract_points / UnstructuredGrid)。
+
+    所有 point_data 数组 (RGB、UV、_orig_idx ...) 同步压缩，
+    面片只保留顶点全部存活的那些并重映射序号；没有面片时返回无单元格点云。
+    """
+    keep = np.asarray(keep, dtype=bool)
+    # take 比 bool 下标快约一倍，且所有数组共用一份行号
+    rows = np.flatnonzero(keep)
+    points = np.asarray(mesh.points).take(rows, axis=0)
+    faces = _compact_faces(mesh, keep) if isinstance(mesh, pv.PolyData) else None
+    if faces is not None and len(faces) > 0:
+        out = pv.PolyData(points, faces)
+    else:
+        out = point_cloud(points)
+
+    for name in mesh.point_data.keys():
+        out.point_data[name] = np.asarray(mesh.point_data[name]).take(rows, axis=0)
+    # 纹理坐标保持为活动 TCoords，纹理网格压缩后仍按原纹理绑定显示
+    tcoords = mesh.GetPointData().GetTCoords()
+    if tcoords is not None:
+        if tcoords.GetName() in out.point_data:
+            out.GetPointData().SetActiveTCoords(tcoords.GetName())
+        else:
+            out.active_texture_coordinates = np.asarray(pv.convert_array(tcoords)).take(rows, axis=0)
+    return out
+
+
 class DataManager:
     def __init__(self):
+        # 保护 (mesh, 代数, _frame, 索引同步) 的一致性：工作线程 (区域生长/离群点) 与 GUI 线程同时取索引
+        self._index_lock = threading.RLock()
+        self._mesh_generation = 0
         self.mesh = None            # 当前显示的 PyVista PolyData
         self.original_mesh = None   # 原始备份 (用于重置)
         self.current_texture = None # 纹理
-        
+
         # 撤回栈
         self.history = []
         self.max_history = 1 # 默认限制，会在 main_window 动态调整
 
+        # 空间索引 (后台线程构建)；_frame 为加载后累计的刚体变换
+        self._frame = np.eye(4)
+        self._index_version = 0
+        self.spatial_index = None
+
+    @property
+    def mesh(self):
+        return self._mesh
+
+    @mesh.setter
+    def mesh(self, value):
+        # 任何替换 mesh 的操作 (删除/撤回/恢复) 都会使索引在下次查询时重新同步 id
+        with self._index_lock:
+            self._mesh = value
+            self._mesh_generation += 1
+
+    @property
+    def mesh_generation(self):
+        """mesh 每被替换一次加一，供索引同步与自动保存判断是否变化。"""
+        return self._mesh_generation
+
+    @property
+    def frame(self):
+        """加载后累计的刚体变换 (4x4)。"""
+        return self._frame
+
     def clear_all(self):
         self.mesh = None
         self.original_mesh = None
         self.current_texture = None
         self.history = []
+        with self._index_lock:
+            self._frame = np.eye(4)
+            self._drop_spatial_index()
 
-    def load_data(self, mesh_or_points, colors=None, texture=None, faces=None, uvs=None):
+    def load_data(self, mesh_or_points, colors=None, texture=None, faces=None, uvs=None, intensity=None):
         """加载数据并清空历史。
         mesh_or_points: pv.DataSet (PolyData/UnstructuredGrid) 或 numpy array 格式的点云
+        intensity: 可选的逐点强度 (LAS)，存为 uint16 的 'Intensity'，供强度着色
         texture: pv.Texture 对象或 None（已在后台线程读好，不再是路径）
         """
         self.history = []
+        with self._index_lock:
+            self._frame = np.eye(4)
+            self._drop_spatial_index()
 
         if mesh_or_points is None or (not isinstance(mesh_or_points, pv.DataSet) and len(mesh_or_points) == 0):
             self.clear_all()
@@ -35,7 +202,7 @@ class DataManager:
             if faces is not None and len(faces) > 0:
                 cloud = pv.PolyData(mesh_or_points, faces)
             else:
-                cloud = pv.PolyData(mesh_or_points)
+                cloud = point_cloud(mesh_or_points)
 
             if colors is not None and len(colors) > 0:
                 cloud.point_data['RGB'] = colors
@@ -43,6 +210,12 @@ class DataManager:
             if uvs is not None and len(uvs) > 0:
                 cloud.active_t_coords = uvs
 
+            if intensity is not None and len(intensity) == cloud.n_points:
+                cloud.point_data['Intensity'] = np.asarray(intensity, dtype=np.uint16)
+
+        # 点云不保留顶点单元 (读入的 PLY 等会带)，只留坐标和点属性
+        cloud = as_point_cloud(cloud)
+
         # 为存活点记录初始序号，用于自动保存时的状态掩码 (Stage 2)
         if '_orig_idx' not in cloud.point_data:
             cloud.point_data['_orig_idx'] = np.arange(cloud.n_points)
@@ -52,7 +225,7 @@ class DataManager:
         # 点云 n_faces_strict==0，带面片网格 >0
         has_faces = cloud.n_faces_strict > 0 if hasattr(cloud, 'n_faces_strict') else cloud.n_cells > 0
         if has_faces:
-            self.original_mesh = cloud  # 带面片网格直接引用，不拷贝
+            self.original_mesh = cloud  # 带面片网格直接引用，不拷贝 (delete_points 生成新对象，不改动它)
         else:
             self.original_mesh = cloud.copy()
 
@@ -62,26 +235,70 @@ class DataManager:
         else:
             self.current_texture = None
 
+        self.build_spatial_index_async()
+
+    def transform(self, matrix):
+        """对当前 mesh 施加 4x4 刚体变换；空间索引只累积矩阵，不重建。"""
+        if self.mesh is None:
+            return
+        matrix = np.asarray(matrix, dtype=np.float64)
+        with self._index_lock:
+            self.mesh.transform(matrix, inplace=True)
+            self._frame = matrix @ self._frame
+
     def push_history(self):
         """保存当前状态到历史栈"""
         if self.mesh is None: return
-        
-        # 深拷贝当前 mesh
-        snapshot = self.mesh.copy()
-        self.history.append(snapshot)
-        
+
+        # 深拷贝当前 mesh (连同当时的坐标系，撤回后索引无需重建)
+        self._record_history(self.mesh.copy())
+
+    def _record_history(self, snapshot):
+        self.history.append((snapshot, self._frame.copy()))
+
         # 限制长度
         if len(self.history) > self.max_history:
             self.history.pop(0) # 移除最旧的
 
+    def delete_points(self, rows, record_history=True):
+        """
+        删除当前 mesh 中行号为 rows 的点：保留掩码直接按下标写入 (不排序、不 np.isin)，
+        compact_polydata 一次压缩坐标/颜色/UV/_orig_idx，面片重映射，结果仍是 PolyData。
+        带面片的网格同时去掉相邻面和因此孤立的顶点 (surface_keep_mask)，纹理坐标保持绑定。
+        旧 mesh 不被修改，撤回快照直接保存旧对象，省掉 push_history 的整份深拷贝。
+        返回删除的点数。
+        """
+        mesh = self.mesh
+        if mesh is None:
+            return 0
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        if len(rows) == 0:
+            return 0
+        t0 = time.time()
+        keep = np.ones(mesh.n_points, dtype=bool)
+        keep[rows] = False
+        if has_surface(mesh):
+            keep = surface_keep_mask(mesh, keep)
+        n_before = mesh.n_points
+        new_mesh = compact_polydata(mesh, keep)
+        if record_history:
+            self._record_history(mesh)
+        self.mesh = new_mesh
+        removed = n_before - new_mesh.n_points
+        print(f"[TIME][DATA] delete_points={time.time() - t0:.3f}s, removed={removed}, left={new_mesh.n_points}",
+              flush=True)
+        return removed
+
     def undo(self):
         """执行撤回"""
         if not self.history:
             return False
-            
+
         # 恢复上一步
-        prev_mesh = self.history.pop()
-        self.mesh = prev_mesh
+        prev_mesh, prev_frame = self.history.pop()
+        with self._index_lock:
+            self.mesh = prev_mesh
+            self._frame = prev_frame
         return True
 
     def set_max_history(self, limit):
@@ -89,3 +306,111 @@ class DataManager:
         # 如果当前超出，裁剪
         while len(self.history) > limit:
             self.history.pop(0)
+
+    def find_outliers(self, method="statistical", k=16, std_ratio=2.0, radius=0.1, min_neighbors=5):
+        """
+        离群点的行号 (只计算，不修改 mesh；删除走 delete_points，一次撤回)。
+        method='statistical'：k 近邻平均距离超过 均值 + std_ratio × 标准差；
+        method='radius'：radius 内邻居少于 min_neighbors。
+        """
+        mesh = self.mesh
+        if mesh is None or mesh.n_points == 0:
+            return np.empty(0, dtype=np.int64)
+        t0 = time.time()
+        points = mesh.points
+        if method == "radius":
+            rows = radius_outliers(points, radius, min_neighbors)
+        else:
+            rows = statistical_outliers(points, k, std_ratio)
+        print(f"[TIME][DATA] outliers={time.time() - t0:.3f}s, method={method}, found={len(rows)}/{mesh.n_points}",
+              flush=True)
+        return rows
+
+    # --- 空间索引 ---
+    def _drop_spatial_index(self):
+        with self._index_lock:
+            self._index_version += 1
+            self.spatial_index = None
+
+    def build_spatial_index_async(self):
+        """在后台线程为当前 mesh 构建体素索引；构建期间的查询走暴力回退。"""
+        mesh = self.mesh
+        if mesh is None or mesh.n_points == 0 or '_orig_idx' not in mesh.point_data:
+            return
+        with self._index_lock:
+            self._index_version += 1
+            version = self._index_version
+        points = np.array(mesh.points, dtype=np.float32)
+        ids = np.array(mesh.point_data['_orig_idx'], dtype=np.int64)
+        frame = self._frame.copy()
+
+        def work():
+            t0 = time.time()
+            try:
+                index = VoxelIndex(points, ids)
+            except Exception as e:
+                print(f"[INDEX] build failed: {e}", flush=True)
+                return
+            index.base_frame = frame
+            with self._index_lock:
+                if version != self._index_version:
+                    return
+                self.spatial_index = index
+            print(
+                f"[TIME][INDEX] build={time.time() - t0:.2f}s, points={len(points)}, "
+                f"cells={len(index.cell_start)}, cell={index.cell_size:.4f}",
+                flush=True,
+            )
+
+        threading.Thread(target=work, name="spatial-index", daemon=True).start()
+
+    def get_spatial_index(self):
+        """
+        返回与当前 mesh 同步的索引快照；尚未构建完成时返回 None。
+        同步与取快照都在锁内完成，快照自带坐标变换，之后的查询不再受其它线程的同步/变换影响。
+        """
+        with self._index_lock:
+            mesh = self.mesh
+            index = self.spatial_index
+            if index is None or mesh is None or '_orig_idx' not in mesh.point_data:
+                return None
+            if index.synced_generation != self._mesh_generation:
+                index.sync(mesh.point_data['_orig_idx'])
+                index.synced_generation = self._mesh_generation
+            return index.snapshot(self._frame @ np.linalg.inv(index.base_frame))
+
+    def query_frustum(self, planes):
+        """返回位于所有平面 (a,b,c,d) 内侧的点序号。"""
+        if self.mesh is None or self.mesh.n_points == 0:
+            return np.empty(0, dtype=np.int64)
+        index = self.get_spatial_index()
+        if index is not None:
+            return index.query_planes(planes)
+        return np.flatnonzero(planes_mask(self.mesh.points, planes))
+
+    def query_box(self, lo, hi):
+        return self.query_frustum(box_planes(lo, hi))
+
+    def query_radius(self, center, radius):
+        if self.mesh is None or self.mesh.n_points == 0:
+            return np.empty(0, dtype=np.int64)
+        index = self.get_spatial_index()
+        if index is not None:
+            return index.query_radius(center, radius)
+        d = np.asarray(self.mesh.points, dtype=np.float32) - np.asarray(center, dtype=np.float32)
+        return np.flatnonzero(np.einsum("ij,ij->i", d, d) <= np.float32(radius) ** 2)
+
+    def query_nearest(self, point, max_dist=None):
+        """返回 (序号, 距离)；没有点时返回 (None, inf)。"""
+        if self.mesh is None or self.mesh.n_points == 0:
+            return None, float("inf")
+        index = self.get_spatial_index()
+        if index is not None:
+            return index.query_nearest(point, max_dist)
+        d = np.asarray(self.mesh.points, dtype=np.float32) - np.asarray(point, dtype=np.float32)
+        dist2 = np.einsum("ij,ij->i", d, d)
+        k = int(np.argmin(dist2))
+        dist = float(np.sqrt(dist2[k]))
+        if max_dist is not None and dist > max_dist:
+            return None, float("inf")
+        return k, dist
@@ -2,7 +2,8 @@ import os
 import numpy as np
 
 
-def safe_load_point_cloud(file_path, temp_dir=None):
+def safe_load_point_cloud(file_path, temp_dir=None, extra=None):
+    """extra: 可选 dict，open3d 点云装不下的逐点属性 (如 LAS 强度) 放在这里。"""
     import open3d as o3d
     import shutil
     import tempfile
@@ -22,7 +23,7 @@ def safe_load_point_cloud(file_path, temp_dir=None):
             return parse_colmap_points3d(file_path)
 
         if suffix in [".las", ".laz"]:
-            return parse_las_file(file_path)
+            return parse_las_file(file_path, extra)
 
         # Fast path: direct read original path (no copy).
         t0 = time.time()
@@ -63,7 +64,7 @@ def safe_load_point_cloud(file_path, temp_dir=None):
                 pass
 
 
-def parse_las_file(filepath):
+def parse_las_file(filepath, extra=None):
     import laspy
     import open3d as o3d
     import time
@@ -91,6 +92,9 @@ def parse_las_file(filepath):
             pcd.colors = o3d.utility.Vector3dVector(colors)
             color_s = time.time() - t_color
 
+        if extra is not None and hasattr(las, "intensity"):
+            extra["intensity"] = np.asarray(las.intensity, dtype=np.uint16)
+
         total_s = time.time() - t0
         print(
             f"[TIME][LAS] read={read_s:.2f}s, xyz={xyz_s:.2f}s, to_o3d={o3d_s:.2f}s, "
@@ -8,6 +8,7 @@ import numpy as np
 from PySide6.QtCore import QThread, Signal
 
 from core.io import safe_load_point_cloud
+from core.session import SESSION_EXT, load_session
 
 
 class ModelLoader(QThread):
@@ -19,6 +20,8 @@ class ModelLoader(QThread):
         super().__init__()
         self.file_path = file_path
         self.texture_path = texture_path
+        # LAS 强度 (uint16)，与 loaded 信号中的 points 同序；没有时为 None
+        self.intensity = None
 
     def run(self):
         total_t0 = time.time()
@@ -38,6 +41,10 @@ class ModelLoader(QThread):
             )
             self.loaded.emit(mesh, points, colors, texture, orig_count, final_count)
 
+        if suffix == SESSION_EXT:
+            self._run_session(mark, emit_with_summary)
+            return
+
         try:
             t0 = time.time()
             temp_dir = tempfile.mkdtemp()
@@ -146,7 +153,8 @@ class ModelLoader(QThread):
                 print("[LOAD] 纹理存在但未找到可用UV，回退到点云读取流程", flush=True)
 
             t0 = time.time()
-            pcd = safe_load_point_cloud(self.file_path, temp_dir)
+            extra = {}
+            pcd = safe_load_point_cloud(self.file_path, temp_dir, extra)
             mark("read_point_cloud", t0)
 
             if pcd.is_empty():
@@ -163,7 +171,13 @@ class ModelLoader(QThread):
                 ratio = min(1.0, random_target / float(orig_count))
                 target_mode = f"config({random_target})"
                 t0 = time.time()
-                pcd = pcd.random_down_sample(sampling_ratio=ratio)
+                if "intensity" in extra:
+                    # 强度不在 open3d 点云里，用同一组行号抽样以保持对应
+                    idx = np.sort(np.random.default_rng().choice(orig_count, size=random_target, replace=False))
+                    pcd = pcd.select_by_index(idx.tolist())
+                    extra["intensity"] = extra["intensity"][idx]
+                else:
+                    pcd = pcd.random_down_sample(sampling_ratio=ratio)
                 mark("random_downsample", t0)
                 final_count = len(pcd.points)
                 random_count = final_count
@@ -193,6 +207,7 @@ class ModelLoader(QThread):
                 f"points_total={orig_count}, points_random={random_count}",
                 flush=True,
             )
+            self.intensity = extra.get("intensity")
             self.loaded.emit(None, points, colors, None, orig_count, final_count)
 
         except Exception as e:
@@ -205,6 +220,35 @@ class ModelLoader(QThread):
             except Exception:
                 pass
 
+    def _run_session(self, mark, emit_with_summary):
+        """会话快照：数组直接 mmap，只有纹理图片需要解码。"""
+        try:
+            t0 = time.time()
+            mesh, meta = load_session(self.file_path)
+            mark("mmap_session", t0)
+
+            texture_obj = None
+            texture_real_path = self.texture_path or meta.get("texture_path", "")
+            if texture_real_path and os.path.exists(texture_real_path) and mesh.GetPointData().GetTCoords() is not None:
+                from PIL import Image
+
+                t0 = time.time()
+                with open(texture_real_path, "rb") as f:
+                    img = Image.open(io.BytesIO(f.read()))
+                    img.load()
+                max_dim = 4096
+                if max(img.size) > max_dim:
+                    img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
+                texture_obj = self._create_transparent_texture_from_pil(img.convert("RGB"))
+                mark("read_texture", t0)
+
+            points = np.asarray(mesh.points)
+            emit_with_summary("session", mesh, points, np.array([]), texture_obj, len(points), len(points))
+        except Exception as e:
+            import traceback
+
+            self.error.emit(f"{e}\n{traceback.format_exc()}")
+
     def _bake_with_open3d_optimized(self, ply_path, pil_img):
         try:
             import open3d as o3d
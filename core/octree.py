@@ -0,0 +1,272 @@
+import hashlib
+import heapq
+import os
+import time
+
+import numpy as np
+
+from core.session import load_arrays, write_session
+
+# 分层八叉树：每个点只属于一个节点。根节点存整体的空间均匀采样，
+# 子节点存补充的细节点 (Potree 式)，因此任意一组“连通到根”的节点
+# 合起来都是一份均匀的点云，细节随选中的深度增加。
+#
+# 缓存文件沿用会话快照容器 (core.session)，节点数据直接 mmap，
+# 只有被选中的节点才会真正读入内存 / 上传 GPU。
+OCTREE_VERSION = 1
+OCTREE_EXT = ".3dvs"
+
+
+def content_signature(points):
+    """点数 + 包围盒 + 等距抽样点的哈希，用于匹配磁盘缓存 (不读全部数据)。"""
+    pts = np.asarray(points)
+    n = len(pts)
+    h = hashlib.blake2b(digest_size=12)
+    h.update(str(n).encode())
+    if n:
+        step = max(1, n // 4096)
+        sample = np.ascontiguousarray(pts[::step], dtype=np.float32)
+        h.update(sample.tobytes())
+        h.update(np.ascontiguousarray(pts[-1], dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def _scatter_pick(keys, table_bits):
+    """每个 key 取一个代表行 (后写者胜)；key 先散列到 2**table_bits 个槽。"""
+    size = 1 << table_bits
+    # 乘法散列取高位
+    slots = (keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - table_bits)
+    owner = np.full(size, -1, dtype=np.int32 if len(keys) < 2**31 else np.int64)
+    owner[slots] = np.arange(len(keys), dtype=owner.dtype)
+    return owner[owner >= 0].astype(np.int64)
+
+
+class Octree:
+    """
+    arrays:
+      points (N,3) float32      按 (层级, 节点) 排好序
+      point_data/<name>         与 points 同序 (RGB、_orig_idx ...)
+      node_level (M,) int8, node_ijk (M,3) int32, node_start / node_count (M,) int64
+    meta: origin, size, signature
+    """
+
+    def __init__(self, arrays, meta):
+        self.points = arrays["points"]
+        self.point_data = {k[len("point_data/"):]: v for k, v in arrays.items() if k.startswith("point_data/")}
+        self.node_level = np.asarray(arrays["node_level"], dtype=np.int64)
+        self.node_ijk = np.asarray(arrays["node_ijk"], dtype=np.int64)
+        self.node_start = np.asarray(arrays["node_start"], dtype=np.int64)
+        self.node_count = np.asarray(arrays["node_count"], dtype=np.int64)
+        self.meta = meta
+        self.origin = np.asarray(meta["origin"], dtype=np.float64)
+        self.size = float(meta["size"])
+
+        edge = self.size / (2.0 ** self.node_level)
+        self.node_lo = self.origin + self.node_ijk * edge[:, None]
+        self.node_hi = self.node_lo + edge[:, None]
+        self.node_center = (self.node_lo + self.node_hi) * 0.5
+        self.node_radius = edge * (np.sqrt(3.0) * 0.5)
+
+        # 子节点表
+        lookup = {(int(l), *map(int, ijk)): i for i, (l, ijk) in enumerate(zip(self.node_level, self.node_ijk))}
+        self.children = [[] for _ in range(len(self.node_level))]
+        self.roots = []
+        for i, (l, ijk) in enumerate(zip(self.node_level, self.node_ijk)):
+            parent = lookup.get((int(l) - 1, *map(int, ijk // 2))) if l > 0 else None
+            if parent is None:
+                self.roots.append(i)
+            else:
+                self.children[parent].append(i)
+
+    @property
+    def n_points(self):
+        return len(self.points)
+
+    @property
+    def n_nodes(self):
+        return len(self.node_level)
+
+    def node_rows(self, node):
+        s = int(self.node_start[node])
+        return s, s + int(self.node_count[node])
+
+    @classmethod
+    def build(cls, points, point_data=None, grid_res=128, max_depth=12, leaf_points=20000):
+        """
+        逐层采样：第 L 层每个节点按 grid_res^3 网格每格取一点，
+        剩余点留给下一层；剩余不多于 leaf_points 的节点或到达 max_depth 时全部收下。
+        """
+        t0 = time.time()
+        pts = np.asarray(points, dtype=np.float32)
+        n = len(pts)
+        lo = pts.min(axis=0).astype(np.float64)
+        lo32 = lo.astype(np.float32)
+        size = float(np.max(pts.max(axis=0) - lo)) * 1.0001 + 1e-6
+
+        level_of = np.full(n, -1, dtype=np.int8)
+        remaining = np.arange(n, dtype=np.int64)
+        table_bits = int(np.clip(np.ceil(np.log2(max(n, 1) * 2)), 10, 26))
+        for level in range(max_depth + 1):
+            if len(remaining) == 0:
+                break
+            edge = size / (2.0 ** level)
+            rp = pts[remaining] - lo32
+            node_key = _linear_key((rp * np.float32(1.0 / edge)).astype(np.int64), level)
+            if level == max_depth:
+                picked = np.arange(len(remaining))
+            else:
+                # 剩余点已很少的节点整体收下 (叶子)
+                uniq, inv, counts = np.unique(node_key, return_inverse=True, return_counts=True)
+                small = counts[inv] <= leaf_points
+                cell = edge / grid_res
+                cell_key = _linear_key((rp * np.float32(1.0 / cell)).astype(np.int64), level + int(np.log2(grid_res)))
+                sampled = np.zeros(len(remaining), dtype=bool)
+                sampled[_scatter_pick(cell_key, table_bits)] = True
+                picked = np.flatnonzero(small | sampled)
+            level_of[remaining[picked]] = level
+            keep = np.ones(len(remaining), dtype=bool)
+            keep[picked] = False
+            remaining = remaining[keep]
+
+        # 按 (层级, 节点) 排序，节点内连续存放
+        edge_per_point = size / (2.0 ** level_of.astype(np.float64))
+        ijk = ((pts - lo) / edge_per_point[:, None]).astype(np.int64)
+        node_key = _linear_key_per_point(ijk, level_of)
+        # 节点编号最多 3*max_depth 位，层级放在高位合成一个排序键
+        order = np.argsort((level_of.astype(np.int64) << np.int64(3 * max_depth + 1)) | node_key, kind="stable")
+        sorted_level = level_of[order]
+        sorted_key = node_key[order]
+        change = np.flatnonzero((np.diff(sorted_level) != 0) | (np.diff(sorted_key) != 0)) + 1
+        starts = np.concatenate(([0], change)).astype(np.int64)
+        counts = np.diff(np.concatenate((starts, [n]))).astype(np.int64)
+        node_level = sorted_level[starts].astype(np.int8)
+        node_ijk = ijk[order[starts]].astype(np.int32)
+
+        arrays = {
+            "points": pts[order],
+            "node_level": node_level,
+            "node_ijk": node_ijk,
+            "node_start": starts,
+            "node_count": counts,
+        }
+        for name, arr in (point_data or {}).items():
+            arrays[f"point_data/{name}"] = np.asarray(arr)[order]
+        meta = {"version": OCTREE_VERSION, "origin": lo.tolist(), "size": size}
+        print(
+            f"[TIME][OCTREE] build={time.time() - t0:.2f}s, points={n}, nodes={len(starts)}, "
+            f"depth={int(node_level.max()) if len(node_level) else 0}",
+            flush=True,
+        )
+        return cls(arrays, meta)
+
+    def save(self, path):
+        arrays = {
+            "points": self.points,
+            "node_level": self.node_level.astype(np.int8),
+            "node_ijk": self.node_ijk.astype(np.int32),
+            "node_start": self.node_start,
+            "node_count": self.node_count,
+        }
+        for name, arr in self.point_data.items():
+            arrays[f"point_data/{name}"] = arr
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            write_session(f, arrays, self.meta)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        arrays, meta = load_arrays(path)
+        if meta.get("version") != OCTREE_VERSION:
+            raise ValueError(f"unsupported octree version: {meta.get('version')}")
+        return cls(arrays, meta)
+
+
+def _linear_key(ijk, level):
+    """同一层内节点 (或网格格子) 的线性编号；每轴 2**level 格。"""
+    dim = np.int64(1) << np.int64(level)
+    ijk = np.clip(ijk, 0, dim - 1)
+    return (ijk[:, 0] * dim + ijk[:, 1]) * dim + ijk[:, 2]
+
+
+def _linear_key_per_point(ijk, levels):
+    dim = np.int64(1) << levels.astype(np.int64)
+    ijk = np.minimum(ijk, (dim - 1)[:, None])
+    return (ijk[:, 0] * dim + ijk[:, 1]) * dim + ijk[:, 2]
+
+
+def load_or_build(mesh, cache_dir, signature=None):
+    """按内容签名读取磁盘缓存，没有则构建并写盘；返回 mmap 的 Octree。"""
+    signature = signature or content_signature(mesh.points)
+    path = os.path.join(cache_dir, f"octree_{signature}{OCTREE_EXT}") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            t0 = time.time()
+            tree = Octree.load(path)
+            print(f"[TIME][OCTREE] load_cache={time.time() - t0:.2f}s, nodes={tree.n_nodes}", flush=True)
+            return tree
+        except Exception as e:
+            print(f"[OCTREE] cache unreadable, rebuilding: {e}", flush=True)
+
+    point_data = {}
+    for name in ("RGB", "Intensity", "_orig_idx"):
+        if name in mesh.point_data:
+            point_data[name] = np.asarray(mesh.point_data[name])
+    tree = Octree.build(mesh.points, point_data)
+    tree.meta["signature"] = signature
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tree.save(path)
+            # 换成 mmap 版本，构建时的内存数组可以释放
+            tree = Octree.load(path)
+        except Exception as e:
+            print(f"[OCTREE] cache write failed: {e}", flush=True)
+    return tree
+
+
+def select_nodes(tree, planes, cam_pos, pixels_per_unit, point_budget, min_node_px=4.0, parallel=False):
+    """
+    按投影尺寸从大到小贪心选节点：只展开视锥内、且父节点已选中的节点，
+    直到点预算用完或节点投影小于 min_node_px。
+    pixels_per_unit: 透视投影时为 “距离 1 处每单位长度的像素数”，平行投影时为每单位像素数。
+    返回节点序号列表。
+    """
+    planes = np.asarray(planes, dtype=np.float64)
+    normals, offsets = planes[:, :3], planes[:, 3]
+    # 包围盒相对每个平面的 “最内侧” 顶点；在外侧则整个盒子不可见
+    pv = np.where(normals[None, :, :] >= 0, tree.node_hi[:, None, :], tree.node_lo[:, None, :])
+    visible = np.all(np.einsum("mpk,pk->mp", pv, normals) + offsets >= 0, axis=1)
+
+    if parallel:
+        proj = tree.node_radius * pixels_per_unit
+    else:
+        cam_pos = np.asarray(cam_pos, dtype=np.float64)
+        dist = np.linalg.norm(tree.node_center - cam_pos, axis=1)
+        dist = np.maximum(dist - tree.node_radius, 1e-6)
+        proj = tree.node_radius / dist * pixels_per_unit
+        # 相机在节点包围盒内时该节点必须展开
+        inside = np.all((tree.node_lo <= cam_pos) & (cam_pos <= tree.node_hi), axis=1)
+        proj[inside] = np.inf
+
+    heap = [(-proj[i], i) for i in tree.roots]
+    heapq.heapify(heap)
+    selected = []
+    used = 0
+    while heap:
+        neg, i = heapq.heappop(heap)
+        if not visible[i] or -neg < min_node_px:
+            continue
+        count = int(tree.node_count[i])
+        if used + count > point_budget:
+            if used == 0:
+                selected.append(i)
+            break
+        selected.append(i)
+        used += count
+        for c in tree.children[i]:
+            heapq.heappush(heap, (-proj[c], c))
+    return selected
+
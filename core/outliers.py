@@ -0,0 +1,297 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.spatial import concat_ranges
+
+# 离群点检测 (不依赖 Open3D)：点按均匀网格排序，每个查询点只查离它最近的 2x2x2 个格子 (不是 27 格)，
+# 这 8 格组成的块到查询点的最近边界距离 (margin) 至少半格，块外的点一定比 margin 远。
+# 离同一个格点最近的查询点共用一个块 (候选完全相同)，按块分组后 查询 × 候选 的距离平方
+# 用批量矩阵乘法一次算出，不逐对取坐标；查询点分块交给线程池 (numpy 运算期间释放 GIL)。
+# 网格边长跟着搜索半径/k 走 (半径滤波 = 2 × 半径，统计滤波按密度估算)，
+# 与 DataManager 的 VoxelIndex (为视锥/拾取查询定的格长、按 _orig_idx 延迟同步删除) 不共用，
+# 每次检测在当前行上现建 (统计滤波补查稀疏点时按更粗的格长重建)。
+
+_CORNERS = np.array([(i, j, k) for i in (0, 1) for j in (0, 1) for k in (0, 1)], dtype=np.int64)
+_PAIR_BUDGET = 4_000_000   # 每批 查询 × 候选 矩阵 (含补齐) 的元素上限 (约 100MB 临时内存)
+_QUERY_ROWS = 65536        # 每个线程任务的查询点数
+_STEP = np.sqrt(2.0)       # 统计滤波补查时格长的放大倍数
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="outlier")
+    return _pool
+
+
+def _octant(q, lo, cell):
+    """查询点在格长 cell 的网格中的 (格号, 各轴是否在下半格, 到所在 2x2x2 块边界的最近距离)。"""
+    g = (np.asarray(q, dtype=np.float32) - lo) * np.float32(1.0 / cell)
+    ijk = np.floor(g).astype(np.int64)
+    frac = g - ijk
+    half = frac < 0.5
+    return ijk, half, np.where(half, 1.0 - frac, frac).min(axis=1) * np.float32(cell)
+
+
+def _padded(counts, width):
+    """按组连续排列的元素在 (组数, width) 补齐布局中的位置。"""
+    return concat_ranges(np.arange(len(counts), dtype=np.int64) * width, counts)
+
+
+class _OctantGrid:
+    """按网格键排序的点；locate/block 给出查询点所在的 2x2x2 块及块内各格在排序数组中的范围。"""
+
+    def __init__(self, points, cell, bounds=None):
+        pts = np.asarray(points, dtype=np.float32)
+        # 同一点云换格长重建时传入上次的 (lo, hi)，省去整列求最值
+        self.lo, self.hi = bounds if bounds is not None else (pts.min(axis=0), pts.max(axis=0))
+        self.inv = np.float32(1.0 / cell)
+        ijk = ((pts - self.lo) * self.inv).astype(np.int64) + 1
+        self.dims = ((self.hi - self.lo) * self.inv).astype(np.int64) + 3
+        self.cell = float(cell)
+        keys = self._keys(ijk)
+        del ijk
+        self.order = np.argsort(keys)
+        keys = keys[self.order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        self.cell_keys = keys[starts]
+        self.cell_start = starts.astype(np.int64)
+        self.cell_count = np.diff(np.append(starts, len(keys))).astype(np.int64)
+        self.points = pts[self.order]
+        self.n = len(keys)
+        # 全部点落在同一格时，任何查询点的块都覆盖全部点
+        self.covers_all = bool(np.all(self.dims - 2 <= 1))
+
+    def _keys(self, ijk):
+        return (ijk[..., 0] * self.dims[1] + ijk[..., 1]) * self.dims[2] + ijk[..., 2]
+
+    def sorted_points(self):
+        return self.points
+
+    def locate(self, q):
+        """查询点 (m,3) -> (块的起始格, 到块边界的最近距离)。在格内靠下半部分的轴，块从前一格开始。"""
+        ijk, half, margin = _octant(q, self.lo, self.cell)
+        return ijk + 1 - half, margin
+
+    def block(self, base):
+        """每个块 8 个格子在排序数组中的 (起点, 点数)，各为 (m,8)。"""
+        keys = self._keys(base[:, None, :] + _CORNERS[None, :, :])
+        pos = np.searchsorted(self.cell_keys, keys)
+        pos[pos >= len(self.cell_keys)] = 0
+        hit = self.cell_keys[pos] == keys
+        return np.where(hit, self.cell_start[pos], 0), np.where(hit, self.cell_count[pos], 0)
+
+    def center(self, base):
+        """块的中心 (块内 8 格的公共格点)。"""
+        return self.lo + base.astype(np.float32) * np.float32(self.cell)
+
+
+def _scan(grid, q, fn, width=1):
+    """
+    q (m,3) 的查询点按 _QUERY_ROWS 分块交给线程池。块内按所在的 2x2x2 块分组，
+    候选数相近的组合成一批、按最大 查询数 × 候选数 补齐，距离平方用批量矩阵乘法算出
+    (坐标以块中心为原点，减小 float32 相消误差)。对每批调用 fn(idx, d2, margin)：
+    idx 为查询点下标，d2 为 (len(idx), 宽) 矩阵 (宽至少为 width)，补齐的位置为 inf。
+    查询点本身若在网格中也包含在候选内。
+    """
+    m = len(q)
+    pts = grid.points
+
+    def work(s0, e0):
+        base, margin = grid.locate(q[s0:e0])
+        key = grid._keys(base)
+        by_block = np.argsort(key)
+        key = key[by_block]
+        first = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        n_q = np.diff(np.append(first, len(key)))
+        block_base = base[by_block[first]]
+        starts, counts = grid.block(block_base)
+        n_c = counts.sum(axis=1)
+        center = grid.center(block_base)
+        order = np.lexsort((n_q, n_c))
+        s = 0
+        while s < len(order):
+            # 批内 组数 × 最大查询数 × 最大候选数 不超过预算 (候选数升序，乘积单调)
+            rest = order[s:]
+            area = (np.arange(1, len(rest) + 1, dtype=np.int64) * np.maximum.accumulate(n_q[rest])
+                    * np.maximum(n_c[rest], width))
+            e = s + max(int(np.searchsorted(area, _PAIR_BUDGET, side="right")), 1)
+            sel = order[s:e]
+            s = e
+            nq, nc = n_q[sel], n_c[sel]
+            wq, wc = int(nq.max()), max(int(nc.max()), width)
+            # |q-c|² = -2 q·c + |c|² + |q|²，一次矩阵乘法算出：查询行 [-2q, 1, |q|²]，候选行 [c, |c|², 1]；
+            # 补齐的候选 |c|² 置 inf，距离自然为 inf
+            cpos = _padded(nc, wc)
+            c = pts.take(concat_ranges(starts[sel].ravel(), counts[sel].ravel()), axis=0)
+            c -= np.repeat(center[sel], nc, axis=0)
+            cand = np.zeros((len(sel) * wc, 5), dtype=np.float32)
+            cand[:, 3] = np.inf
+            cand[:, 4] = 1.0
+            cand[cpos, :3] = c
+            cand[cpos, 3] = np.einsum("ij,ij->i", c, c)
+            qpos = _padded(nq, wq)
+            idx = by_block[concat_ranges(first[sel], nq)]
+            qc = q[s0 + idx] - np.repeat(center[sel], nq, axis=0)
+            qry = np.zeros((len(sel) * wq, 5), dtype=np.float32)
+            qry[:, 3] = 1.0
+            qry[qpos, :3] = qc * np.float32(-2.0)
+            qry[qpos, 4] = np.einsum("ij,ij->i", qc, qc)
+            with np.errstate(invalid="ignore"):   # BLAS 内部补零的行列会出现 0 × inf，结果不取用
+                d2 = np.matmul(qry.reshape(len(sel), wq, 5), cand.reshape(len(sel), wc, 5).transpose(0, 2, 1))
+            d2 = d2.reshape(-1, wc)[qpos]
+            np.maximum(d2, 0.0, out=d2)
+            fn(s0 + idx, d2, margin[idx])
+
+    spans = [(s, min(m, s + _QUERY_ROWS)) for s in range(0, m, _QUERY_ROWS)]
+    if len(spans) <= 1:
+        for s, e in spans:
+            work(s, e)
+        return
+    list(_executor().map(lambda se: work(*se), spans))
+
+
+def radius_outliers(points, radius, min_neighbors):
+    """
+    半径 radius 内邻居 (不含自身) 少于 min_neighbors 的点，返回行号 (升序)。网格边长 2r，块外的点都在 r 以外，结果精确。
+    边长 r/√3 的小格对角线为 r，格内任意两点相距不超过 r：小格内点数超过 min_neighbors 的点不必查询
+    (近处密集区的点几乎都这样跳过，查询量只剩稀疏处)。
+    """
+    n = len(points)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    grid = _OctantGrid(points, 2.0 * float(radius))
+    pts = grid.sorted_points()
+    fine = ((pts - grid.lo) * np.float32(np.sqrt(3.0) / radius)).astype(np.int64)
+    dims = fine.max(axis=0) + 1
+    _, inverse, counts = np.unique((fine[:, 0] * dims[1] + fine[:, 1]) * dims[2] + fine[:, 2],
+                                   return_inverse=True, return_counts=True)
+    del fine
+    todo = np.flatnonzero(counts[inverse.ravel()] <= min_neighbors)
+    r2 = np.float32(radius) ** 2
+    flag = np.zeros(n, dtype=bool)
+
+    def fn(idx, d2, margin):
+        flag[todo[idx]] = np.count_nonzero(d2 <= r2, axis=1) - 1 < min_neighbors
+
+    _scan(grid, pts[todo], fn)
+    return np.sort(grid.order[flag])
+
+
+def _knn_cell(points, k):
+    """
+    统计滤波的初始网格：目标是密集处每格约 4 × 1.6(k+1)/π 个点 (半格半径内约 1.6(k+1) 个)。
+    先按包围盒最大两边估算表面积定格长，再按实际格内点数缩放 (扫描密度近密远疏，按平均密度定的格子
+    在近处候选过多；体状点云按表面估算则格子过小)，缩放幅度按局部维数 d (1~3) 开 d 次方，最多调整 3 次。
+    稀疏处的点在 statistical_outliers 里加大格长补查。返回 (格长, 网格)。
+    """
+    pts = np.asarray(points, dtype=np.float32)
+    bounds = (pts.min(axis=0), pts.max(axis=0))
+    ext = np.sort(np.maximum(bounds[1].astype(np.float64) - bounds[0], 1e-6))
+    per_cell = 4.0 * 1.6 * (k + 1) / np.pi
+    cell = float(np.sqrt(ext[1] * ext[2] * per_cell / len(pts)))
+    grid = _OctantGrid(pts, cell, bounds)
+    for _ in range(3):
+        occ = grid.cell_count
+        # 按点加权的平均格内点数 (近处密集格权重大，不会被远处大量稀疏格拉低)
+        dense = float(np.dot(occ, occ)) / grid.n
+        # 局部维数：格长加倍后同格点对数的增长倍数 = 2^d (点对数不受格内只有 1 个点的稀疏格影响)
+        key = grid.cell_keys
+        ijk = np.column_stack((key // (grid.dims[1] * grid.dims[2]), key // grid.dims[2] % grid.dims[1],
+                               key % grid.dims[2])) >> 1
+        _, coarse = np.unique((ijk[:, 0] * grid.dims[1] + ijk[:, 1]) * grid.dims[2] + ijk[:, 2],
+                              return_inverse=True)
+        occ2 = np.bincount(coarse.ravel(), occ).astype(np.float64)
+        pairs = float(np.dot(occ, occ - 1))
+        pairs2 = float(np.dot(occ2, occ2 - 1))
+        dim = float(np.clip(np.log2(pairs2 / pairs), 1.0, 3.0)) if pairs > 0 else 3.0
+        scale = float(np.clip((per_cell / dense) ** (1.0 / dim), 1.0 / 32.0, 32.0))
+        if 0.8 < scale < 1.25:
+            break
+        cell *= scale
+        grid = _OctantGrid(pts, cell, bounds)
+    return cell, grid
+
+
+def _knn_mean(grid, q, k):
+    """
+    q 中每点到 k 个最近邻 (不含自身) 的平均距离。返回 (平均距离, 第 k 近邻距离, 是否精确)：
+    块内不足 k+1 个点 (含自身) 时第 k 近邻距离为 inf；第 k 近邻不超过块边界距离的为精确。
+    """
+    m = len(q)
+    mean_d = np.empty(m, dtype=np.float32)
+    kth_d = np.empty(m, dtype=np.float32)
+    exact = np.empty(m, dtype=bool)
+
+    def fn(idx, d2, margin):
+        # 整行排序比 np.partition 快 (numpy 的 float32 排序走 SIMD，按行 introselect 不走)
+        dist = np.sqrt(np.sort(d2, axis=1)[:, :k + 1])
+        # 第 k+1 小的是第 k 近邻 (最小的是点自身)；块外的点都比 margin 远，kth <= margin 时结果精确
+        kth = dist[:, k]
+        kth_d[idx] = kth
+        exact[idx] = grid.covers_all | (kth <= margin)
+        with np.errstate(invalid="ignore"):
+            mean_d[idx] = (dist.sum(axis=1) - dist[:, 0]) / k
+
+    _scan(grid, q, fn, width=k + 1)
+    return mean_d, kth_d, exact
+
+
+def statistical_outliers(points, k=16, std_ratio=2.0):
+    """
+    统计滤波：每点到 k 个最近邻 (不含自身) 的平均距离，超过 全局均值 + std_ratio × 标准差 的为离群点，
+    返回行号 (升序)。近邻是精确的：第 k 近邻超出 2x2x2 块边界距离的稀疏点，
+    换成更粗的网格 (格长按 √2 逐级放大) 重新查询，直到所有点的 k 近邻都落在块内。
+    """
+    n = len(points)
+    if n <= k:
+        return np.empty(0, dtype=np.int64)
+    cell, grid = _knn_cell(points, k)
+    q = grid.sorted_points()
+    order = grid.order
+    mean_d, kth_d, exact = _knn_mean(grid, q, k)
+
+    todo = np.flatnonzero(~exact)
+    tried = np.zeros(len(todo), dtype=np.int64)   # todo 中每点上次查询所用的级别
+    lo = grid.lo
+    rounds = 1
+    while len(todo):
+        # 格长按 √2 逐级放大。块内已有 k 个近邻的点，真实第 k 近邻不超过估计值 est：
+        # 格长 >= 2 × est 时块边界距离 (至少半格) 一定够，在那之前逐级算点到块边界的实际距离，
+        # 取第一个够 est 的级别；块内不足 k 个的把格长加倍
+        est = kth_d[todo]
+        fin = np.isfinite(est)
+        want = tried + 2
+        with np.errstate(divide="ignore"):
+            want[fin] = tried[fin] + 1 + np.ceil(2.0 * np.log2(np.maximum(
+                2.0 * est[fin] / (cell * _STEP ** (tried[fin] + 1)), 1.0))).astype(np.int64)
+        for lvl in range(int(tried.min()) + 1, int(want.max())):
+            sel = np.flatnonzero(fin & (want > lvl) & (tried < lvl))
+            if not len(sel):
+                continue
+            ok = _octant(q[todo[sel]], lo, cell * _STEP ** lvl)[2] >= est[sel]
+            want[sel[ok]] = lvl
+            fin[sel[ok]] = False
+        # 每轮只建一个网格，处理想要最低级别的那批点
+        level = int(want.min())
+        go = want == level
+        rows = todo[go]
+        grid = _OctantGrid(points, cell * _STEP ** level, (grid.lo, grid.hi))
+        sub_mean, sub_kth, sub_exact = _knn_mean(grid, q[rows], k)
+        mean_d[rows] = sub_mean
+        kth_d[rows] = sub_kth
+        todo = np.concatenate((todo[~go], rows[~sub_exact]))
+        tried = np.concatenate((tried[~go], np.full(int((~sub_exact).sum()), level, dtype=np.int64)))
+        rounds += 1
+    print(f"[OUTLIER] statistical knn rounds={rounds}", flush=True)
+
+    mu = float(mean_d.mean(dtype=np.float64))
+    sigma = float(mean_d.std(dtype=np.float64))
+    return np.sort(order[mean_d > mu + std_ratio * sigma])
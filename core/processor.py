@@ -2,6 +2,29 @@ import os
 import numpy as np
 from PySide6.QtCore import QThread, Signal
 
+from core.spatial import OrientedBox
+
+
+class OutlierWorker(QThread):
+    """后台查找离群点 (DataManager.find_outliers)，结果为当时 mesh 的行号。"""
+    found = Signal(object)
+    error = Signal(str)
+
+    def __init__(self, data_manager, method="statistical", **params):
+        super().__init__()
+        self.data_manager = data_manager
+        self.generation = data_manager.mesh_generation
+        self.method = method
+        self.params = params
+
+    def run(self):
+        try:
+            rows = self.data_manager.find_outliers(self.method, **self.params)
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        self.found.emit(rows)
+
 
 class GeometryProcessor(QThread):
     progress = Signal(int, str)
@@ -99,7 +122,10 @@ class GeometryProcessor(QThread):
 
             self.progress.emit(40, "正在进行粗裁剪 (BBox)...")
             t0 = time.time()
-            if self.crop_bbox is not None:
+            if isinstance(self.crop_bbox, OrientedBox):
+                inside = self.crop_bbox.contains(np.asarray(pcd.points))
+                pcd = pcd.select_by_index(np.flatnonzero(inside))
+            elif self.crop_bbox is not None:
                 pcd = pcd.crop(self.crop_bbox)
             mark("crop_bbox", t0)
 
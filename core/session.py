@@ -0,0 +1,113 @@
+import json
+import struct
+
+import numpy as np
+import pyvista as pv
+
+from core.data import point_cloud
+
+# 会话快照: 单文件，头部为 JSON，几何数组按 64 字节对齐原样存放，
+# 读取时直接 np.memmap，不解析任何点云格式。
+#
+#   MAGIC | uint64 头长度 | JSON 头 | 对齐填充 | 数组 0 | 填充 | 数组 1 ...
+SESSION_EXT = ".3dvs"
+SESSION_VERSION = 1
+MAGIC = b"3DVSESS\x01"
+ALIGN = 64
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def mesh_to_arrays(mesh):
+    """把 PolyData 拆成可直接写盘的数组 (点、面、全部 point_data)。"""
+    arrays = {"points": np.ascontiguousarray(mesh.points)}
+    meta = {"active_tcoords": None}
+    if isinstance(mesh, pv.PolyData) and mesh.GetPolys() is not None and mesh.GetPolys().GetNumberOfCells() > 0:
+        arrays["faces"] = np.ascontiguousarray(mesh.faces, dtype=np.int64)
+    for name in mesh.point_data.keys():
+        arrays[f"point_data/{name}"] = np.ascontiguousarray(mesh.point_data[name])
+    tcoords = mesh.GetPointData().GetTCoords()
+    if tcoords is not None:
+        meta["active_tcoords"] = tcoords.GetName()
+    return arrays, meta
+
+
+def arrays_to_mesh(arrays, meta):
+    points = arrays["points"]
+    faces = arrays.get("faces")
+    if faces is not None and len(faces) > 0:
+        mesh = pv.PolyData(points, faces)
+    else:
+        mesh = point_cloud(points)
+    for key, arr in arrays.items():
+        if key.startswith("point_data/"):
+            mesh.point_data[key[len("point_data/"):]] = arr
+    name = meta.get("active_tcoords")
+    if name and name in mesh.point_data:
+        mesh.GetPointData().SetActiveTCoords(name)
+    return mesh
+
+
+def write_session(f, arrays, meta):
+    """写入已打开的二进制文件；meta 必须可 JSON 序列化。"""
+    entries = {}
+    offset = 0
+    contiguous = {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        offset = _align(offset)
+        entries[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        contiguous[name] = arr
+        offset += arr.nbytes
+    header = json.dumps(
+        {"version": SESSION_VERSION, "arrays": entries, "meta": meta}, ensure_ascii=False
+    ).encode("utf-8")
+
+    f.write(MAGIC)
+    f.write(struct.pack("<Q", len(header)))
+    f.write(header)
+    pos = len(MAGIC) + 8 + len(header)
+    data_start = _align(pos)
+    f.write(b"\0" * (data_start - pos))
+    pos = 0
+    for name, arr in contiguous.items():
+        start = entries[name]["offset"]
+        f.write(b"\0" * (start - pos))
+        if arr.nbytes:
+            f.write(arr.reshape(-1).view(np.uint8).data)
+        pos = start + arr.nbytes
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a session file: {path}")
+        (n,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(n).decode("utf-8"))
+    header["data_start"] = _align(len(MAGIC) + 8 + n)
+    return header
+
+
+def load_arrays(path):
+    """返回 (arrays, meta)。数组以写时复制方式 mmap，修改不会写回文件。"""
+    header = read_header(path)
+    if header.get("version") != SESSION_VERSION:
+        raise ValueError(f"unsupported session version: {header.get('version')}")
+    base = header["data_start"]
+    arrays = {}
+    for name, e in header["arrays"].items():
+        dtype = np.dtype(e["dtype"])
+        shape = tuple(e["shape"])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+        arrays[name] = np.memmap(path, dtype=dtype, mode="c", offset=base + e["offset"], shape=shape)
+    return arrays, header.get("meta", {})
+
+
+def load_session(path):
+    """返回 (mesh, meta)。"""
+    arrays, meta = load_arrays(path)
+    return arrays_to_mesh(arrays, meta), meta
@@ -0,0 +1,361 @@
+import copy
+
+import numpy as np
+
+
+def concat_ranges(starts, counts):
+    """Concatenate the half-open ranges [s, s+c) into one int64 index array."""
+    starts = np.asarray(starts, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    first = np.cumsum(counts) - counts
+    return np.repeat(starts - first, counts) + np.arange(total, dtype=np.int64)
+
+
+def planes_mask(points, planes):
+    """Boolean mask of points on the inner side (a*x+b*y+c*z+d >= 0) of every plane."""
+    pts = np.asarray(points, dtype=np.float32)
+    mask = np.ones(len(pts), dtype=bool)
+    for a, b, c, d in np.asarray(planes, dtype=np.float64):
+        mask &= (pts[:, 0] * np.float32(a) + pts[:, 1] * np.float32(b)
+                 + pts[:, 2] * np.float32(c) + np.float32(d)) >= 0
+    return mask
+
+
+def box_planes(lo, hi):
+    """Six inward-facing planes of the axis-aligned box [lo, hi]."""
+    lo = np.asarray(lo, dtype=np.float64)
+    hi = np.asarray(hi, dtype=np.float64)
+    planes = []
+    for axis in range(3):
+        n = np.zeros(3)
+        n[axis] = 1.0
+        planes.append([*n, -lo[axis]])
+        planes.append([*(-n), hi[axis]])
+    return np.array(planes, dtype=np.float64)
+
+
+def frustum_planes(composite_matrix, x0, y0, x1, y1, width, height):
+    """Side planes of the view frustum restricted to a display rectangle.
+
+    composite_matrix: camera world->clip matrix (GetCompositeProjectionTransformMatrix).
+    The rectangle is in VTK display pixels (origin bottom-left). Points in front
+    of the camera with clip coordinates inside the rectangle are "inside".
+    """
+    m = np.asarray(composite_matrix, dtype=np.float64)
+    nx0 = 2.0 * float(x0) / float(width) - 1.0
+    nx1 = 2.0 * float(x1) / float(width) - 1.0
+    ny0 = 2.0 * float(y0) / float(height) - 1.0
+    ny1 = 2.0 * float(y1) / float(height) - 1.0
+    return np.array([
+        m[0] - nx0 * m[3],   # clip_x >= nx0 * w
+        nx1 * m[3] - m[0],   # clip_x <= nx1 * w
+        m[1] - ny0 * m[3],
+        ny1 * m[3] - m[1],
+        m[3],                # w > 0 (in front of the camera)
+    ], dtype=np.float64)
+
+
+def _hash_slots(flat, table_bits):
+    """Multiplicative (Fibonacci) hash of int64 keys into 2**table_bits slots.
+
+    Takes the high bits of the 64-bit product (as ``core.octree`` does); the
+    low bits would only be ``flat mod 2**table_bits`` in a different order.
+    """
+    prod = flat.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    return (prod >> np.uint64(64 - table_bits)).astype(np.int64)
+
+
+def _voxel_first(points, cell, table_bits):
+    """One row per occupied voxel of size ``cell`` (last writer wins).
+
+    Voxel keys are scattered into a table of 2**table_bits slots; when the
+    grid is larger than the table the keys are hashed, and the rare
+    collisions merge voxels, which is harmless for sampling.
+    """
+    lo = points.min(axis=0)
+    keys = ((points - lo) / np.float32(cell)).astype(np.int64)
+    dims = keys.max(axis=0) + 1
+    flat = (keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2]
+    size = 1 << table_bits
+    if int(dims[0]) * int(dims[1]) * int(dims[2]) > size:
+        flat = _hash_slots(flat, table_bits)
+    owner = np.full(size, -1, dtype=np.int64)
+    owner[flat] = np.arange(len(points), dtype=np.int64)
+    return owner[owner >= 0]
+
+
+def uniform_sample(points, target, seed=0):
+    """Spatially uniform subset of about ``target`` rows: one point per voxel.
+
+    Point clouds are surface-like, so the occupied voxel count scales with
+    1/cell^2; the voxel size is refined a few times from the bounding box
+    estimate. Overshoot is trimmed randomly. Returns sorted row indices.
+    """
+    pts = np.asarray(points, dtype=np.float32)
+    n = len(pts)
+    target = int(target)
+    if target <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if target >= n:
+        return np.arange(n, dtype=np.int64)
+
+    ext = np.sort(np.maximum(pts.max(axis=0) - pts.min(axis=0), 1e-6))
+    cell = float(np.sqrt(ext[1] * ext[2] / target))
+    table_bits = int(np.ceil(np.log2(target * 8)))
+    rows = None
+    for _ in range(4):
+        rows = _voxel_first(pts, cell, table_bits)
+        ratio = len(rows) / target
+        if 1.0 <= ratio <= 1.3:
+            break
+        # 略偏细，保证最后只需随机裁掉少量
+        cell *= float(np.sqrt(ratio / 1.15))
+
+    if len(rows) > target:
+        rows = np.random.default_rng(seed).choice(rows, target, replace=False)
+    rows.sort()
+    return rows.astype(np.int64)
+
+
+def voxel_density(points, points_per_cell=16):
+    """Local density per point: how many points share its voxel (uint16).
+
+    The voxel size is chosen from the bounding box so that a typical
+    occupied voxel of a surface-like cloud holds about ``points_per_cell``
+    points. Keys are hashed into a table like ``_voxel_first``.
+    """
+    pts = np.asarray(points, dtype=np.float32)
+    n = len(pts)
+    if n == 0:
+        return np.empty(0, dtype=np.uint16)
+    lo = pts.min(axis=0)
+    ext = np.sort(np.maximum(pts.max(axis=0) - lo, 1e-6))
+    cell = float(np.sqrt(ext[1] * ext[2] * points_per_cell / n))
+    keys = ((pts - lo) / np.float32(cell)).astype(np.int64)
+    dims = keys.max(axis=0) + 1
+    flat = (keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2]
+    table_bits = int(np.clip(np.ceil(np.log2(n * 2)), 10, 28))
+    size = 1 << table_bits
+    if int(dims[0]) * int(dims[1]) * int(dims[2]) > size:
+        flat = _hash_slots(flat, table_bits)
+    counts = np.bincount(flat)
+    return np.minimum(counts[flat], 65535).astype(np.uint16)
+
+
+class OrientedBox:
+    """Oriented bounding box: ``center``, column ``axes`` (3x3 rotation) and
+    full side lengths ``extent``. Replaces open3d's OrientedBoundingBox for
+    cropping; ``contains`` is a chunked vectorized test.
+    """
+
+    def __init__(self, center, axes, extent):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.axes = np.asarray(axes, dtype=np.float64)
+        self.extent = np.asarray(extent, dtype=np.float64)
+
+    def scale(self, factor):
+        """Grow the box about its center (like open3d ``scale(f, center)``)."""
+        self.extent = self.extent * float(factor)
+        return self
+
+    def contains(self, points, chunk=1 << 20):
+        """Boolean mask of points inside the box."""
+        pts = np.asarray(points)
+        out = np.empty(len(pts), dtype=bool)
+        # small slack so points that defined the extents stay inside despite rounding
+        half = self.extent * 0.5 + 1e-9 * (1.0 + float(np.abs(self.center).max()) + float(self.extent.max()))
+        for s in range(0, len(pts), chunk):
+            local = np.abs((np.asarray(pts[s:s + chunk], dtype=np.float64) - self.center) @ self.axes)
+            out[s:s + chunk] = np.all(local <= half, axis=1)
+        return out
+
+
+def oriented_box(points, rows=None, sample=100_000, seed=0, chunk=1 << 20):
+    """PCA oriented bounding box of ``points[rows]`` (all points if rows is None).
+
+    The axes come from a PCA on a bounded random sample; the extents are then
+    taken over every selected point in one chunked pass, so no sub-mesh is
+    extracted. Returns None for fewer than 4 points.
+    """
+    n = len(rows) if rows is not None else len(points)
+    if n < 4:
+        return None
+    pick = np.arange(n) if n <= sample else np.sort(np.random.default_rng(seed).choice(n, sample, replace=False))
+    src = pick if rows is None else np.asarray(rows, dtype=np.int64)[pick]
+    pts = np.asarray(points[src], dtype=np.float64)
+    mean = pts.mean(axis=0)
+    _, axes = np.linalg.eigh(np.cov((pts - mean).T))
+    axes = axes[:, ::-1]
+    if np.linalg.det(axes) < 0:
+        axes[:, 2] = -axes[:, 2]
+
+    lo = np.full(3, np.inf)
+    hi = np.full(3, -np.inf)
+    for s in range(0, n, chunk):
+        sel = slice(s, s + chunk) if rows is None else np.asarray(rows[s:s + chunk], dtype=np.int64)
+        local = (np.asarray(points[sel], dtype=np.float64) - mean) @ axes
+        lo = np.minimum(lo, local.min(axis=0))
+        hi = np.maximum(hi, local.max(axis=0))
+    return OrientedBox(mean + axes @ ((lo + hi) * 0.5), axes, hi - lo)
+
+
+class VoxelIndex:
+    """Voxel-hash spatial index over float32 positions.
+
+    Points are bucketed into a regular grid and stored sorted by cell key, so
+    every occupied cell is one contiguous slice. Entries are keyed by the
+    ``_orig_idx`` ids of the mesh the index was built from: deleting points
+    only refreshes the id -> row lookup (``sync``), and rigid transforms are
+    folded into ``matrix`` instead of moving the stored points.
+
+    All public queries take and return current-frame data and yield row
+    indices into the mesh that was last passed to ``sync``. Callers on other
+    threads should query a ``snapshot`` rather than the shared instance.
+    """
+
+    def __init__(self, points, ids, points_per_cell=32):
+        pts = np.ascontiguousarray(points, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        n = len(pts)
+        if n == 0:
+            raise ValueError("cannot index an empty point set")
+
+        lo = pts.min(axis=0).astype(np.float64)
+        hi = pts.max(axis=0).astype(np.float64)
+        ext = np.maximum(hi - lo, 1e-6)
+        # Scans are mostly surfaces, so occupied cells scale with the area of
+        # the two largest extents rather than the bounding volume.
+        e = np.sort(ext)
+        cell = float(np.sqrt(e[1] * e[2] * points_per_cell / float(n)))
+        cell = max(cell, float(e[2]) / float(1 << 20), 1e-6)
+        dims = (np.floor(ext / cell).astype(np.int64) + 1)
+
+        inv = np.float32(1.0 / cell)
+        ijk = ((pts - lo.astype(np.float32)) * inv).astype(np.int64)
+        np.clip(ijk, 0, dims - 1, out=ijk)
+        keys = (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2]
+        del ijk
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+
+        self.points = pts[order]
+        self.ids = ids[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        cell_keys = keys[starts]
+        self.cell_start = starts.astype(np.int64)
+        self.cell_count = np.diff(np.concatenate((starts, [n]))).astype(np.int64)
+
+        ci = cell_keys // (dims[1] * dims[2])
+        cj = (cell_keys // dims[2]) % dims[1]
+        ck = cell_keys % dims[2]
+        self.cell_center = (lo + (np.column_stack((ci, cj, ck)) + 0.5) * cell).astype(np.float32)
+        self.cell_size = cell
+        self.bounds_lo = lo
+        self.bounds_hi = hi
+
+        self.n_ids = int(ids.max()) + 1
+        self.matrix = np.eye(4)           # index frame -> current frame
+        self.base_frame = np.eye(4)       # DataManager frame at build time
+        self.synced_generation = None
+        self._id_to_row = None
+        self.sync(ids)
+
+    # --- bookkeeping ---
+    def sync(self, current_ids):
+        """Refresh the id -> current row lookup after points were removed."""
+        current_ids = np.asarray(current_ids, dtype=np.int64)
+        lookup = np.full(self.n_ids, -1, dtype=np.int32 if len(current_ids) < 2**31 else np.int64)
+        valid = current_ids < self.n_ids
+        lookup[current_ids[valid]] = np.flatnonzero(valid)
+        self._id_to_row = lookup
+
+    def snapshot(self, matrix):
+        """A copy that shares the immutable cell arrays but owns ``matrix``.
+
+        ``sync`` always installs a new lookup array instead of writing into
+        the old one, so the snapshot keeps a consistent id -> row mapping even
+        if the shared index is re-synced while the snapshot is being queried.
+        """
+        view = copy.copy(self)
+        view.matrix = np.array(matrix, dtype=np.float64)
+        return view
+
+    def _to_current(self, rows):
+        cur = self._id_to_row[self.ids[rows]]
+        return cur[cur >= 0].astype(np.int64)
+
+    def _to_local(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        inv = np.linalg.inv(self.matrix)
+        return inv[:3, :3] @ p + inv[:3, 3]
+
+    # --- local-frame kernels ---
+    def _rows_in_planes(self, planes):
+        planes = np.asarray(planes, dtype=np.float64)
+        centers = self.cell_center
+        half = 0.5 * self.cell_size
+        inside_all = np.ones(len(centers), dtype=bool)
+        outside_any = np.zeros(len(centers), dtype=bool)
+        for a, b, c, d in planes:
+            f = centers[:, 0] * a + centers[:, 1] * b + centers[:, 2] * c + d
+            r = half * (abs(a) + abs(b) + abs(c))
+            outside_any |= f + r < 0
+            inside_all &= f - r >= 0
+        full = inside_all & ~outside_any
+        partial = ~inside_all & ~outside_any
+
+        rows_full = concat_ranges(self.cell_start[full], self.cell_count[full])
+        rows_part = concat_ranges(self.cell_start[partial], self.cell_count[partial])
+        if len(rows_part):
+            rows_part = rows_part[planes_mask(self.points[rows_part], planes)]
+        if len(rows_full) == 0:
+            return rows_part
+        if len(rows_part) == 0:
+            return rows_full
+        return np.concatenate((rows_full, rows_part))
+
+    def _rows_in_sphere(self, center_local, radius):
+        r = float(radius)
+        rows = self._rows_in_planes(box_planes(center_local - r, center_local + r))
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        d = self.points[rows] - center_local.astype(np.float32)
+        dist2 = np.einsum("ij,ij->i", d, d)
+        keep = dist2 <= np.float32(r * r)
+        return rows[keep], dist2[keep]
+
+    # --- public queries (current frame) ---
+    def query_planes(self, planes):
+        """Rows inside all planes (a, b, c, d) given in the current frame."""
+        local = np.asarray(planes, dtype=np.float64) @ self.matrix
+        return self._to_current(self._rows_in_planes(local))
+
+    def query_box(self, lo, hi):
+        return self.query_planes(box_planes(lo, hi))
+
+    def query_radius(self, center, radius):
+        rows, _ = self._rows_in_sphere(self._to_local(center), radius)
+        return self._to_current(rows)
+
+    def query_nearest(self, point, max_dist=None):
+        """(row, distance) of the closest live point, or (None, inf)."""
+        local = self._to_local(point)
+        span = float(np.linalg.norm(self.bounds_hi - self.bounds_lo)) + self.cell_size
+        d_to_box = float(np.linalg.norm(np.maximum(0.0, np.maximum(self.bounds_lo - local, local - self.bounds_hi))))
+        limit = span + d_to_box if max_dist is None else float(max_dist)
+        r = max(self.cell_size, d_to_box + self.cell_size)
+        while True:
+            r = min(r, limit)
+            rows, dist2 = self._rows_in_sphere(local, r)
+            if len(rows):
+                cur = self._id_to_row[self.ids[rows]]
+                alive = cur >= 0
+                if np.any(alive):
+                    k = int(np.argmin(np.where(alive, dist2, np.inf)))
+                    return int(cur[k]), float(np.sqrt(dist2[k]))
+            if r >= limit:
+                return None, float("inf")
+            r *= 2.0
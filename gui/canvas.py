@@ -1,8 +1,24 @@
 # -*- coding: utf-8 -*-
 from PySide6.QtWidgets import QFrame, QVBoxLayout
-from PySide6.QtCore import Qt, QEvent, QObject
+from PySide6.QtCore import Qt, QEvent, QObject, QTimer, Signal
 from pyvistaqt import QtInteractor
+import vtk
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pyvista as pv
+
+from core.data import compact_polydata, has_surface
+from core.octree import content_signature, load_or_build
+from core.spatial import uniform_sample, voxel_density
+from gui.octree_view import OctreeView
+from tools.pick_utils import composite_matrix
+
+# 标量着色模式 (其余为原始 RGB/纹理)
+SCALAR_MODES = ('height', 'intensity', 'density')
 
 # Find a Chinese-capable font once at import time (used by save_side_view and vtk labels)
 _FONT_PATH = None
@@ -29,11 +45,73 @@ if not _FONT_PATH:
     print("[FONT] WARNING: No suitable Chinese-capable font found. Labels might not render correctly on Linux.")
 
 
+# --- 渲染调度 ---
+class RenderScheduler(QObject):
+    """
+    工具只标记场景需要重绘 (request)，调度器在下一帧统一渲染一次：
+    同一次用户操作里的多次 request 合并成一次 render，连续请求不超过每 frame_ms 一帧。
+    截图等需要立即得到画面时用 render_now / flush。
+    """
+
+    def __init__(self, plotter, frame_ms=16, parent=None):
+        super().__init__(parent)
+        self.plotter = plotter
+        self.frame_ms = frame_ms
+        self.requests = 0
+        self.renders = 0
+        self._dirty = False
+        self._batch_depth = 0
+        self._last_render = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timeout)
+
+    def request(self):
+        self.requests += 1
+        self._dirty = True
+        if self._batch_depth or self._timer.isActive():
+            return
+        # 距上一帧已超过一帧时间就在下一轮事件循环渲染，否则等到下一帧
+        wait = self.frame_ms - (time.perf_counter() - self._last_render) * 1000.0
+        self._timer.start(max(0, int(wait)))
+
+    def flush(self):
+        """有待渲染的请求时立即同步渲染。"""
+        if self._dirty:
+            self.render_now()
+
+    def render_now(self):
+        self._timer.stop()
+        self._dirty = False
+        self._last_render = time.perf_counter()
+        self.renders += 1
+        self.plotter.render()
+
+    @contextmanager
+    def batch(self):
+        """批量操作期间连 add_mesh 等隐式渲染也抑制，结束后只渲染一帧。"""
+        self._batch_depth += 1
+        prev = self.plotter.suppress_rendering
+        self.plotter.suppress_rendering = True
+        try:
+            yield self
+        finally:
+            self.plotter.suppress_rendering = prev
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.request()
+
+    def _on_timeout(self):
+        if self._dirty:
+            self.render_now()
+
+
 # --- 手势过滤器 ---
 class ZoomEventFilter(QObject):
-    def __init__(self, plotter):
+    def __init__(self, plotter, request_render):
         super().__init__()
         self.plotter = plotter
+        self.request_render = request_render
         self.last_scale = 1.0
 
     def eventFilter(self, obj, event):
@@ -50,13 +128,17 @@ class ZoomEventFilter(QObject):
             if abs(change_factor - 1.0) < 0.005: return True
             self.plotter.camera.Dolly(change_factor)
             self.plotter.renderer.ResetCameraClippingRange()
-            self.plotter.render()
+            self.request_render()
             return True
         return False
 
 
 # --- 主画布类 ---
 class PointCloudCanvas(QFrame):
+    # 后台线程算好降采样行号后回到主线程建 LOD actor
+    _lod_ready = Signal(object, object)
+    _octree_ready = Signal(object, object)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAttribute(Qt.WA_AcceptTouchEvents, True)
@@ -84,48 +166,657 @@ class PointCloudCanvas(QFrame):
         vtk_widget.setAttribute(Qt.WA_AcceptTouchEvents, True)
         vtk_widget.grabGesture(Qt.PinchGesture)
 
-        self.zoom_filter = ZoomEventFilter(self.plotter)
+        self.render_scheduler = RenderScheduler(self.plotter, parent=self)
+        self.zoom_filter = ZoomEventFilter(self.plotter, self.request_render)
         vtk_widget.installEventFilter(self.zoom_filter)
         self.main_actor = None
+        self._main_mode = None
+        self._source_mesh = None
+
+        # --- 标量着色 ---
+        # 高程/强度/密度只生成一个标量数组 (float32/uint16)，经色表映射，
+        # 不生成 N×3 颜色数组；标量挂在共享几何数组的浅拷贝上，切换时不重新上传点坐标。
+        self.color_mode = 'rgb'
+        self._scalar_cache = {}
+        self._scalar_range = (0.0, 1.0)
+        self._scalar_fraction = (0.0, 1.0)
+        self._lut = vtk.vtkLookupTable()
+        self._lut.SetHueRange(0.667, 0.0)   # 蓝 -> 红
+        self._lut.SetNumberOfTableValues(256)
+        self._lut.Build()
+
+        # --- 选区掩码 ---
+        # 选中状态混进主 actor 的颜色，不另加 actor：主 mapper 的输入换成共享几何/属性数组的浅拷贝，
+        # 挂一个选区着色数组 —— RGB 着色时是 RGB 的副本 (选中行写红色)，标量着色时是标量的副本
+        # (选中行写 NaN，色表的 NanColor 为红色)，纯色时就是 uint8 掩码本身，经两色色表 (0 青，1 红)。
+        # 副本每个 mesh 只在第一次选择时分配，之后只原地改写变化的行；要清除的行从掩码里找，不另记。
+        self._sel_source = None
+        self._sel_view = None
+        self._sel_kind = None
+        self._sel_mask = None
+        self._sel_base = None     # 未选中时的颜色/标量，取消选中时按行恢复
+        self._sel_values = None   # 主 mapper 实际着色的数组
+        self._sel_array = None
+        self._lut.SetNanColor(1.0, 0.0, 0.0, 1.0)
+        self._sel_lut = vtk.vtkLookupTable()
+        self._sel_lut.SetNumberOfTableValues(2)
+        self._sel_lut.SetTableRange(0, 1)
+        self._sel_lut.SetTableValue(0, 0.0, 1.0, 1.0, 1.0)
+        self._sel_lut.SetTableValue(1, 1.0, 0.0, 0.0, 1.0)
+
+        # --- 交互期 LOD ---
+        # 相机运动时 (轨迹球/perform_pan/捏合) 只画空间均匀的降采样子集，
+        # 静止 lod_idle_ms 后换回全分辨率。只有全分辨率帧超过目标帧时间才启用。
+        self.lod_enabled = True
+        self.lod_fraction = 0.15
+        self.lod_min_points = 500_000
+        self.lod_target_frame_ms = 33.0
+        self.lod_idle_ms = 250
+        self.lod_actor = None
+        self._lod_mesh = None
+        self._lod_rows = None
+        self._lod_version = 0
+        self._lod_active = False
+        self._lod_suspended = False
+        self._full_frame_ms = None
+        self._frame_t0 = None
+        self._last_cam_state = None
+        self._lod_idle_timer = QTimer(self)
+        self._lod_idle_timer.setSingleShot(True)
+        self._lod_idle_timer.timeout.connect(self._on_lod_idle)
+        self._lod_ready.connect(self._on_lod_ready)
+
+        # --- 八叉树点预算渲染 (超大点云) ---
+        # 点数超过 octree_min_points 的点云不整体上传 GPU，按视锥/投影尺寸
+        # 在 point_budget 内选八叉树节点显示；八叉树按内容签名缓存到磁盘。
+        self.octree_min_points = 20_000_000
+        self.point_budget = 3_000_000
+        self.octree_cache_dir = None
+        self.octree_view = None
+        self._octree_mode = False
+        self._octree_version = 0
+        self._octree_base_frame = np.eye(4)
+        self._octree_refine_timer = QTimer(self)
+        self._octree_refine_timer.setSingleShot(True)
+        self._octree_refine_timer.timeout.connect(self.request_render)
+        self._octree_ready.connect(self._on_octree_ready)
+
+        rw = self.plotter.render_window
+        rw.AddObserver("StartEvent", self._on_render_start)
+        rw.AddObserver("EndEvent", self._on_render_end)
 
         layout.addWidget(vtk_widget)
 
-    def render_mesh(self, data_manager):
-        self.plotter.clear()
-        self.main_actor = None
-        # Invalidate VTK compass actors (cleared by plotter.clear) so they get recreated
-        self._invalidate_compass_hint = True
-        self.plotter.add_axes(
-            xlabel='E', ylabel='N', zlabel='Z',
-            color='white',
-            viewport=(0.8, 0.0, 1.0, 0.2)
-        )
+    def request_render(self):
+        self.render_scheduler.request()
+
+    def flush_render(self):
+        self.render_scheduler.flush()
+
+    def render_now(self):
+        self.render_scheduler.render_now()
+
+    def render_mesh(self, data_manager, reset_scene=False):
+        """
+        显示 data_manager.mesh。
+        主 actor 已存在且着色方式不变时只替换 mapper 的输入数据 (一次 GPU 上传)，
+        不清空场景，测量/标注等叠加层保持不动。
+        reset_scene=True 用于加载新数据：清空整个场景后重建 (旧行为)。
+        """
+        self._drop_lod()
+        if reset_scene:
+            self._drop_octree()
+            self.plotter.clear()
+            self.main_actor = None
+            self._main_mode = None
+            self._scalar_cache = {}
+            self._drop_selection()
+            self.plotter.add_axes(
+                xlabel='E', ylabel='N', zlabel='Z',
+                color='white',
+                viewport=(0.8, 0.0, 1.0, 0.2)
+            )
+
+        mesh = data_manager.mesh
+        if not mesh or mesh.n_points == 0:
+            self._drop_octree()
+            self._remove_main_actor()
+            return
+
+        mode = self._color_mode(data_manager)
+        if reset_scene:
+            self._octree_mode = (mode[0] != 'texture' and mesh.n_points >= self.octree_min_points
+                                 and not (mesh.GetPolys() is not None and mesh.GetPolys().GetNumberOfCells() > 0))
+            if self._octree_mode:
+                self._build_octree_async(data_manager)
+        if self._octree_mode:
+            mesh = self._octree_preview(data_manager)
+        self._source_mesh = mesh
+        if self._sel_source is not None and self._sel_source is not mesh:
+            # 行号已失效 (删除/撤回)，选区由工具重新设置
+            self._drop_selection()
+        if mode[0] != 'texture':
+            mesh = self._display_mesh(mesh)
+        if self.main_actor is not None and mode == self._main_mode:
+            t0 = time.time()
+            mapper = self.main_actor.GetMapper()
+            if mode[0] != 'texture':
+                # 新 mesh 的活动标量未必是 RGB (压缩/撤回产生的副本)，按名字取色
+                self._apply_color(mapper, mesh)
+            mapper.SetInputData(mesh)
+            mapper.Modified()
+            print(f"[TIME][CANVAS] swap_input={time.time() - t0:.3f}s, points={mesh.n_points}", flush=True)
+            self._refresh_selection()
+            self._build_lod_async(mesh)
+            self._sync_octree(data_manager)
+            return
+
+        self._remove_main_actor()
+        if mode[0] == 'texture':
+            self.main_actor = self.plotter.add_mesh(
+                mesh,
+                texture=data_manager.current_texture,
+                show_scalar_bar=False,
+                lighting=False,
+                render_points_as_spheres=False,
+                opacity="linear",
+            )
+        elif mode[-1] == 'cloud':
+            self.main_actor = self._add_point_actor(mesh, rgb=(mode[0] == 'rgb'))
+        elif mode[0] == 'rgb':
+            self.main_actor = self.plotter.add_mesh(
+                mesh,
+                scalars='RGB',
+                rgb=True,
+                point_size=2,
+                lighting=False,
+                render_points_as_spheres=False,
+            )
+        else:
+            self.main_actor = self.plotter.add_mesh(
+                mesh,
+                color="cyan",
+                point_size=2,
+                lighting=False,
+            )
+        if mode[0] != 'texture':
+            self._apply_color(self.main_actor.GetMapper(), mesh)
+        self._main_mode = mode
+        self._full_frame_ms = None
+        self._refresh_selection()
+        self._build_lod_async(mesh)
+        self._sync_octree(data_manager)
+
+    @staticmethod
+    def _color_mode(data_manager):
+        """主 actor 的着色方式；相同时可直接替换输入数据而不重建 actor。"""
+        mesh = data_manager.mesh
+        has_uv = (mesh.GetPointData().GetTCoords() is not None
+                  or 'TCoords' in mesh.point_data or 'texture_u' in mesh.point_data)
+        if data_manager.current_texture and has_uv:
+            return ('texture', id(data_manager.current_texture))
+        # 散点走无单元格的点 mapper，带面片的网格仍用 add_mesh
+        kind = 'mesh' if has_surface(mesh) else 'cloud'
+        if 'RGB' in mesh.point_data:
+            return ('rgb', kind)
+        return ('plain', kind)
+
+    def _add_point_actor(self, mesh, rgb):
+        """
+        点云主 actor：vtkPointGaussianMapper 直接按点坐标绘制，不需要顶点单元格
+        (省下每点 16 字节的 connectivity/offsets 以及对应的 GPU 索引缓冲)。
+        ScaleFactor=0 时画成普通的 point_size 像素点，与原来的外观一致。
+        """
+        mapper = vtk.vtkPointGaussianMapper()
+        mapper.SetScaleFactor(0.0)
+        mapper.EmissiveOff()
+        mapper.SetInputData(mesh)
+        if rgb:
+            mapper.ScalarVisibilityOn()
+            mapper.SetScalarModeToUsePointFieldData()
+            mapper.SelectColorArray('RGB')
+            mapper.SetColorModeToDirectScalars()
+        else:
+            mapper.ScalarVisibilityOff()
+        actor = vtk.vtkActor()
+        actor.SetMapper(mapper)
+        prop = actor.GetProperty()
+        prop.SetPointSize(2)
+        prop.LightingOff()
+        if not rgb:
+            prop.SetColor(0.0, 1.0, 1.0)
+        self.plotter.add_actor(actor, reset_camera=not self.plotter.camera_set, render=False)
+        return actor
+
+    # --- 标量着色 ---
+    def set_color_mode(self, mode, data_manager):
+        """
+        'rgb' 为原始颜色，其余为 SCALAR_MODES 之一。
+        只替换 mapper 的颜色数组与色表，点坐标数组共享，不重新上传几何。
+        """
+        self.color_mode = mode if mode in SCALAR_MODES else 'rgb'
+        self._scalar_fraction = (0.0, 1.0)
+        if self.octree_view is not None:
+            self.octree_view.set_scalar(self.color_mode if self.color_mode != 'rgb' else None, self._lut)
+        source = self._source_mesh
+        if self.main_actor is None or source is None or self._main_mode is None or self._main_mode[0] == 'texture':
+            return
+        t0 = time.time()
+        view = self._display_mesh(source)
+        mapper = self.main_actor.GetMapper()
+        self._apply_color(mapper, view)
+        mapper.SetInputData(view)
+        if self.lod_actor is not None and self._lod_rows is not None:
+            # LOD 同样只换颜色数组
+            lod_view = pv.PolyData()
+            lod_view.ShallowCopy(self._lod_mesh)
+            if '_scalar' in view.point_data:
+                lod_view.point_data['_scalar'] = np.asarray(view.point_data['_scalar'])[self._lod_rows]
+            elif '_scalar' in lod_view.point_data:
+                lod_view.point_data.remove('_scalar')
+            lod_mapper = self.lod_actor.GetMapper()
+            self._apply_color(lod_mapper, lod_view)
+            lod_mapper.SetInputData(lod_view)
+        self._refresh_selection()
+        print(f"[TIME][CANVAS] color_mode={self.color_mode}, {time.time() - t0:.3f}s", flush=True)
+
+    def set_scalar_range(self, lo_frac, hi_frac):
+        """色表范围：取当前标量 1%~99% 分位区间内的比例 (0~1)；只改色表，不动数据。"""
+        lo_frac, hi_frac = sorted((min(max(float(lo_frac), 0.0), 1.0), min(max(float(hi_frac), 0.0), 1.0)))
+        self._scalar_fraction = (lo_frac, hi_frac)
+        lo, hi = self._scalar_range
+        span = hi - lo
+        a, b = lo + span * lo_frac, lo + span * hi_frac
+        if b <= a:
+            b = a + max(span, 1.0) * 1e-3
+        self._lut.SetTableRange(a, b)
+        self.request_render()
 
-        if data_manager.mesh and data_manager.mesh.n_points > 0:
-            mesh = data_manager.mesh
-            has_uv = 'TCoords' in mesh.point_data or 'texture_u' in mesh.point_data
-            if data_manager.current_texture and has_uv:
-                self.main_actor = self.plotter.add_mesh(
-                    mesh,
-                    texture=data_manager.current_texture,
-                    show_scalar_bar=False,
-                    lighting=False,
-                    render_points_as_spheres=False,
-                    opacity="linear",
-                )
-            elif 'RGB' in mesh.point_data:
-                self.main_actor = self.plotter.add_mesh(
-                    mesh,
-                    scalars='RGB',
-                    rgb=True,
-                    point_size=2,
-                    lighting=False,
-                    render_points_as_spheres=False,
-                )
-            else:
-                self.main_actor = self.plotter.add_mesh(
-                    mesh,
-                    color="cyan",
-                    point_size=2,
-                    lighting=False,
-                )
+    def _scalar_values(self, mesh, mode):
+        """按模式返回单个标量数组及其稳健范围；按 mesh 与坐标修改时间缓存。"""
+        key = (id(mesh), mesh.n_points, mesh.GetPoints().GetMTime() if mesh.GetPoints() is not None else 0)
+        cached = self._scalar_cache.get(mode)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+        t0 = time.time()
+        if mode == 'height':
+            values = np.asarray(mesh.points[:, 2], dtype=np.float32)
+        elif mode == 'intensity':
+            if 'Intensity' not in mesh.point_data:
+                return None, None
+            values = np.asarray(mesh.point_data['Intensity'])
+        else:
+            # 密度 = 所在体素的点数
+            values = voxel_density(mesh.points)
+        step = max(1, len(values) // 200_000)
+        sample = np.asarray(values[::step], dtype=np.float64)
+        rng = (float(np.percentile(sample, 1)), float(np.percentile(sample, 99))) if len(sample) else (0.0, 1.0)
+        self._scalar_cache[mode] = (key, values, rng)
+        print(f"[TIME][CANVAS] scalar={mode}, {time.time() - t0:.3f}s, range={rng[0]:.3f}~{rng[1]:.3f}", flush=True)
+        return values, rng
+
+    def _display_mesh(self, mesh):
+        """RGB 模式直接显示 mesh；标量模式返回共享点/属性数组的浅拷贝，附加 _scalar。"""
+        if self.color_mode not in SCALAR_MODES:
+            return mesh
+        values, rng = self._scalar_values(mesh, self.color_mode)
+        if values is None:
+            print(f"[CANVAS] no scalar for color mode {self.color_mode}, showing RGB", flush=True)
+            return mesh
+        view = pv.PolyData()
+        view.ShallowCopy(mesh)
+        view.point_data['_scalar'] = values
+        self._scalar_range = rng
+        self.set_scalar_range(*self._scalar_fraction)
+        return view
+
+    def _apply_color(self, mapper, mesh):
+        """
+        按 mesh 上的数组设置 mapper 着色：_scalar 走色表，RGB 直接取色，否则纯色。
+        带选区着色数组 (_sel_color / _sel) 的浅拷贝改用该数组，颜色方式不变。
+        """
+        if '_scalar' in mesh.point_data:
+            mapper.SetLookupTable(self._lut)
+            mapper.UseLookupTableScalarRangeOn()
+            mapper.ScalarVisibilityOn()
+            mapper.SetScalarModeToUsePointFieldData()
+            mapper.SelectColorArray('_sel_color' if '_sel_color' in mesh.point_data else '_scalar')
+            mapper.SetColorModeToMapScalars()
+        elif 'RGB' in mesh.point_data:
+            mapper.ScalarVisibilityOn()
+            mapper.SetScalarModeToUsePointFieldData()
+            mapper.SelectColorArray('_sel_color' if '_sel_color' in mesh.point_data else 'RGB')
+            mapper.SetColorModeToDirectScalars()
+        elif '_sel' in mesh.point_data:
+            mapper.SetLookupTable(self._sel_lut)
+            mapper.UseLookupTableScalarRangeOn()
+            mapper.ScalarVisibilityOn()
+            mapper.SetScalarModeToUsePointFieldData()
+            mapper.SelectColorArray('_sel')
+            mapper.SetColorModeToMapScalars()
+        else:
+            mapper.ScalarVisibilityOff()
+
+    # --- 选区掩码 ---
+    def set_selection_mask(self, rows):
+        """
+        用逐点掩码显示选区 (rows 为 data_manager.mesh 的行号)。
+        只恢复上次选中的行、写入本次的行，不复制点。八叉树/纹理模式下返回 False，由调用方退回子集高亮。
+        """
+        if not self._ensure_selection():
+            return False
+        t0 = time.perf_counter()
+        rows = np.asarray(rows, dtype=np.int64)
+        self._paint_selection(np.flatnonzero(self._sel_mask), False)
+        self._paint_selection(rows, True)
+        self._sel_array.Modified()
+        print(f"[TIME][CANVAS] selection_mask={1000 * (time.perf_counter() - t0):.1f}ms, points={len(rows)}", flush=True)
+        return True
+
+    def mark_selection(self, rows, selected=True):
+        """
+        增量改写选区掩码 (笔刷每帧只改本次命中的行，代价与命中点数成正比)。
+        选区着色尚未建立或在八叉树模式下返回 False，由调用方整体刷新。
+        """
+        if not self._selection_ready():
+            return False
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows):
+            self._paint_selection(rows, selected)
+            self._sel_array.Modified()
+        return True
+
+    def clear_selection_mask(self):
+        if not self._selection_ready():
+            return
+        rows = np.flatnonzero(self._sel_mask)
+        if len(rows):
+            self._paint_selection(rows, False)
+            self._sel_array.Modified()
+
+    def _selection_ready(self):
+        """选区着色数组仍挂在主 mapper 当前的输入上。"""
+        return (self._sel_view is not None and not self._octree_mode and self.main_actor is not None
+                and self._sel_source is self._source_mesh
+                and self.main_actor.GetMapper().GetInput() is self._sel_view)
+
+    def _ensure_selection(self):
+        """需要时把主 mapper 的输入换成带选区着色数组的浅拷贝；八叉树/纹理模式下返回 False。"""
+        if self._selection_ready():
+            return True
+        source = self._source_mesh
+        if (self._octree_mode or self.main_actor is None or source is None
+                or self._main_mode is None or self._main_mode[0] == 'texture'):
+            return False
+        mapper = self.main_actor.GetMapper()
+        shown = pv.wrap(mapper.GetInput())
+        view = pv.PolyData()
+        view.ShallowCopy(shown)
+        view.point_data['_sel'] = np.zeros(source.n_points, dtype=np.uint8)
+        if '_scalar' in shown.point_data:
+            kind, base = 'scalar', shown.point_data['_scalar']
+        elif 'RGB' in shown.point_data:
+            kind, base = 'rgb', shown.point_data['RGB']
+        else:
+            kind, base = 'plain', None
+        name = '_sel'
+        if base is not None:
+            name = '_sel_color'
+            view.point_data[name] = np.array(base, dtype=np.float32 if kind == 'scalar' else np.uint8)
+        self._sel_source = source
+        self._sel_view = view
+        self._sel_kind = kind
+        self._sel_base = base
+        # 写入 VTK 数组内存本身 (pyvista 的数组是对它的视图)，改写后只需 Modified
+        self._sel_mask = np.asarray(view.point_data['_sel'])
+        self._sel_values = np.asarray(view.point_data[name])
+        self._sel_array = view.GetPointData().GetArray(name)
+        self._apply_color(mapper, view)
+        mapper.SetInputData(view)
+        return True
+
+    def _paint_selection(self, rows, selected):
+        self._sel_mask[rows] = 1 if selected else 0
+        if self._sel_kind == 'rgb':
+            self._sel_values[rows] = (255, 0, 0) if selected else self._sel_base[rows]
+        elif self._sel_kind == 'scalar':
+            self._sel_values[rows] = np.nan if selected else self._sel_base[rows]
+
+    def _refresh_selection(self):
+        """主 mapper 的输入被替换 (换着色/同一 mesh 重新显示) 后，把仍有效的选区混进新的输入。"""
+        if self._sel_mask is None or self._sel_source is not self._source_mesh or self._selection_ready():
+            return
+        rows = np.flatnonzero(self._sel_mask)
+        self._sel_view = None
+        if len(rows) and self._ensure_selection():
+            self._paint_selection(rows, True)
+            self._sel_array.Modified()
+        elif not len(rows):
+            self._drop_selection()
+
+    def _drop_selection(self):
+        """丢弃选区着色 (主 mapper 随后换成新的输入，或 actor 已移除)。"""
+        self._sel_source = None
+        self._sel_view = None
+        self._sel_kind = None
+        self._sel_mask = None
+        self._sel_base = None
+        self._sel_values = None
+        self._sel_array = None
+
+    # --- LOD ---
+    def set_lod_params(self, target_frame_ms=None, fraction=None):
+        """目标帧时间 (毫秒) 与降采样比例 (0.1~0.2 为宜)；来自参数文件。"""
+        if target_frame_ms is not None:
+            self.lod_target_frame_ms = max(1.0, float(target_frame_ms))
+        if fraction is not None:
+            self.lod_fraction = min(max(float(fraction), 0.01), 1.0)
+
+    def set_lod_suspended(self, suspended):
+        """截图等需要全分辨率画面时暂停 LOD (八叉树一帧内读完所选节点)。"""
+        self._lod_suspended = bool(suspended)
+        if suspended:
+            self._show_full()
+
+    def _camera_state(self):
+        cam = self.plotter.camera
+        return (cam.GetPosition(), cam.GetFocalPoint(), cam.GetViewUp(),
+                cam.GetViewAngle(), cam.GetParallelScale())
+
+    def _on_render_start(self, obj, event):
+        self._frame_t0 = time.perf_counter()
+        if self.octree_view is not None:
+            self._update_octree()
+            return
+        if self.lod_actor is None or self._lod_suspended:
+            return
+        state = self._camera_state()
+        moving = self._last_cam_state is not None and state != self._last_cam_state
+        self._last_cam_state = state
+        if not moving:
+            return
+        slow = self._full_frame_ms is not None and self._full_frame_ms > self.lod_target_frame_ms
+        if slow and not self._lod_active:
+            self._show_lod()
+        if self._lod_active:
+            self._lod_idle_timer.start(self.lod_idle_ms)
+
+    def _on_render_end(self, obj, event):
+        if self._frame_t0 is None or self._lod_active:
+            return
+        ms = (time.perf_counter() - self._frame_t0) * 1000.0
+        # 全分辨率帧耗时的平滑估计，决定是否需要 LOD
+        self._full_frame_ms = ms if self._full_frame_ms is None else 0.7 * self._full_frame_ms + 0.3 * ms
+
+    def _show_lod(self):
+        if self.lod_actor is None or self.main_actor is None:
+            return
+        self.lod_actor.SetUserMatrix(self.main_actor.GetUserMatrix())
+        self.lod_actor.SetVisibility(self.main_actor.GetVisibility())
+        self.main_actor.SetVisibility(False)
+        self._lod_active = True
+
+    def _show_full(self):
+        self._lod_idle_timer.stop()
+        if not self._lod_active:
+            return
+        self._lod_active = False
+        if self.main_actor is not None and self.lod_actor is not None:
+            self.main_actor.SetVisibility(self.lod_actor.GetVisibility())
+        if self.lod_actor is not None:
+            self.lod_actor.SetVisibility(False)
+
+    def _on_lod_idle(self):
+        if not self._lod_active:
+            return
+        self._show_full()
+        self._last_cam_state = self._camera_state()
+        self.request_render()
+
+    def _build_lod_async(self, mesh):
+        """在后台线程为当前点云选出空间均匀的子集；带面片的网格不做 LOD。"""
+        if not self.lod_enabled or self._octree_mode or mesh.n_points < self.lod_min_points:
+            return
+        if mesh.GetPolys() is not None and mesh.GetPolys().GetNumberOfCells() > 0:
+            return
+        self._lod_version += 1
+        version = self._lod_version
+        points = mesh.points
+        target = int(mesh.n_points * self.lod_fraction)
+
+        def work():
+            t0 = time.time()
+            try:
+                rows = uniform_sample(points, target)
+            except Exception as e:
+                print(f"[LOD] build failed: {e}", flush=True)
+                return
+            print(f"[TIME][LOD] sample={time.time() - t0:.2f}s, points={len(rows)}/{len(points)}", flush=True)
+            self._lod_ready.emit((version, mesh), rows)
+
+        threading.Thread(target=work, name="lod-sample", daemon=True).start()
+
+    def _on_lod_ready(self, key, rows):
+        version, mesh = key
+        if version != self._lod_version or self.main_actor is None:
+            return
+        keep = np.zeros(mesh.n_points, dtype=bool)
+        keep[rows] = True
+        self._lod_rows = np.flatnonzero(keep)
+        self._lod_mesh = compact_polydata(mesh, keep)
+        active = mesh.point_data.active_scalars_name
+        if active is not None and active in self._lod_mesh.point_data:
+            self._lod_mesh.point_data.active_scalars_name = active
+        main_mapper = self.main_actor.GetMapper()
+        # 复制主 mapper 的着色设置 (颜色数组/LUT/标量模式)，只换输入
+        mapper = main_mapper.NewInstance()
+        mapper.ShallowCopy(main_mapper)
+        if isinstance(main_mapper, vtk.vtkPointGaussianMapper):
+            # ShallowCopy 不带点精灵参数
+            mapper.SetScaleFactor(main_mapper.GetScaleFactor())
+            mapper.SetEmissive(main_mapper.GetEmissive())
+        # 主 mapper 可能正用选区着色数组，LOD 子集按自己的数组重设 (相机运动时不显示选区)
+        self._apply_color(mapper, self._lod_mesh)
+        mapper.SetInputData(self._lod_mesh)
+        actor = vtk.vtkActor()
+        actor.SetMapper(mapper)
+        actor.SetProperty(self.main_actor.GetProperty())
+        if self.main_actor.GetTexture() is not None:
+            actor.SetTexture(self.main_actor.GetTexture())
+        actor.SetVisibility(False)
+        actor.SetPickable(False)
+        self.plotter.renderer.AddActor(actor)
+        self.lod_actor = actor
+
+    def _drop_lod(self):
+        self._lod_version += 1
+        self._show_full()
+        if self.lod_actor is not None:
+            try:
+                self.plotter.renderer.RemoveActor(self.lod_actor)
+            except Exception:
+                pass
+        self.lod_actor = None
+        self._lod_mesh = None
+        self._lod_rows = None
+
+    # --- 八叉树 ---
+    def set_octree_params(self, point_budget=None, min_points=None):
+        if point_budget is not None:
+            self.point_budget = max(100_000, int(point_budget))
+        if min_points is not None:
+            self.octree_min_points = max(1, int(min_points))
+
+    def _octree_preview(self, data_manager):
+        """八叉树就绪前 (以及作为占位) 主 actor 只显示预算内的等距抽样。"""
+        mesh = data_manager.mesh
+        step = max(1, int(np.ceil(mesh.n_points / self.point_budget)))
+        if step == 1:
+            return mesh
+        keep = np.zeros(mesh.n_points, dtype=bool)
+        keep[::step] = True
+        return compact_polydata(mesh, keep)
+
+    def _build_octree_async(self, data_manager):
+        mesh = data_manager.mesh
+        self._octree_version += 1
+        version = self._octree_version
+        self._octree_base_frame = data_manager.frame.copy()
+        cache_dir = self.octree_cache_dir
+
+        def work():
+            t0 = time.time()
+            try:
+                tree = load_or_build(mesh, cache_dir, content_signature(mesh.points))
+            except Exception as e:
+                print(f"[OCTREE] build failed: {e}", flush=True)
+                return
+            print(f"[TIME][OCTREE] ready={time.time() - t0:.2f}s", flush=True)
+            self._octree_ready.emit((version, data_manager), tree)
+
+        threading.Thread(target=work, name="octree-build", daemon=True).start()
+
+    def _on_octree_ready(self, key, tree):
+        version, data_manager = key
+        if version != self._octree_version or not self._octree_mode:
+            return
+        self.octree_view = OctreeView(self.plotter, tree, point_budget=self.point_budget)
+        if self.color_mode != 'rgb':
+            self.octree_view.set_scalar(self.color_mode, self._lut)
+        self._sync_octree(data_manager)
+        self.request_render()
+
+    def _sync_octree(self, data_manager):
+        """mesh 变化 (删除/撤回/变换) 后同步存活点与坐标系；占位 actor 在八叉树就绪后隐藏。"""
+        view = self.octree_view
+        if view is None:
+            return
+        mesh = data_manager.mesh
+        view.set_alive(mesh.point_data['_orig_idx'] if '_orig_idx' in mesh.point_data else None)
+        view.set_frame(data_manager.frame @ np.linalg.inv(self._octree_base_frame))
+        if self.main_actor is not None:
+            self.main_actor.SetVisibility(False)
+        self._last_cam_state = None
+
+    def _update_octree(self):
+        state = self._camera_state()
+        if state == self._last_cam_state and not self.octree_view.pending:
+            return
+        self._last_cam_state = state
+        if self.octree_view.update(composite_matrix(self.plotter), load_all=self._lod_suspended):
+            # 还有节点没读完：稍后再渲染一帧继续细化
+            self._octree_refine_timer.start(30)
+
+    def _drop_octree(self):
+        self._octree_version += 1
+        self._octree_mode = False
+        self._octree_refine_timer.stop()
+        if self.octree_view is not None:
+            self.octree_view.clear()
+        self.octree_view = None
+
+    def _remove_main_actor(self):
+        if self.main_actor is not None:
+            self.plotter.remove_actor(self.main_actor, render=False)
+        self.main_actor = None
+        self._main_mode = None
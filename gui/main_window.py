@@ -19,7 +19,8 @@ from PySide6.QtCore import Qt, QTimer
 from core.autosave import AutosaveManager
 from core.data import DataManager
 from core.loader import ModelLoader
-from core.processor import GeometryProcessor
+from core.processor import GeometryProcessor, OutlierWorker
+from core.session import SESSION_EXT
 from gui.canvas import PointCloudCanvas
 from gui.dialogs import MarkerDialog, MarkerDetailsDialog
 from gui.panels import ActionPanel, ObjectListPanel
@@ -51,6 +52,20 @@ class MainWindow(QMainWindow):
         self.random_target_points = 4_000_000
         self.initial_font_size = 20
         self.initial_linewidth = 3
+        self.lod_target_frame_ms = 33.0
+        self.lod_fraction = 0.15
+        self.point_budget = 3_000_000
+        self.octree_min_points = 20_000_000
+        self.occlusion_tolerance = 0.05
+        self.brush_radius_px = 40.0
+        self.grow_gap = 0.15
+        self.grow_clearance = 0.15
+        self.grow_normal_angle = 0.0
+        self.outlier_k = 16
+        self.outlier_std_ratio = 2.0
+        self.outlier_radius = 0.1
+        self.outlier_min_neighbors = 5
+        self._outlier_worker = None
         self._load_downsample_params()
 
         self._ground_calib_locked = False
@@ -80,11 +95,18 @@ class MainWindow(QMainWindow):
         self._style_apply_timer.setSingleShot(True)
         self._style_apply_timer.timeout.connect(self._flush_pending_style_change)
         self._init_ui()
+        self.canvas.set_lod_params(self.lod_target_frame_ms, self.lod_fraction)
+        self.canvas.set_octree_params(self.point_budget, self.octree_min_points)
         if hasattr(self.panel_action, "set_mesh_output_visible"):
             self.panel_action.set_mesh_output_visible(False)
 
         self.tool_measure = MeasureTool(self.canvas, self.data_manager)
         self.tool_select = SelectTool(self.canvas, self.data_manager)
+        self.tool_select.occlusion_tolerance = self.occlusion_tolerance
+        self.tool_select.brush_radius_px = self.brush_radius_px
+        self.tool_select.grow_gap = self.grow_gap
+        self.tool_select.grow_clearance = self.grow_clearance
+        self.tool_select.grow_normal_angle = self.grow_normal_angle
         self.tool_calibration = CalibrationTool(self.canvas, self.data_manager)
         self.tool_ref = ReferenceTool(self.canvas, self.data_manager)
         self.tool_marker = MarkerTool(self.canvas, self.data_manager)
@@ -137,6 +159,32 @@ class MainWindow(QMainWindow):
                         self.initial_font_size = max(1, int(val))
                     elif "初始线宽" in key:
                         self.initial_linewidth = max(1, int(val))
+                    elif "点预算" in key:
+                        self.point_budget = max(1, int(val))
+                    elif "八叉树" in key:
+                        self.octree_min_points = max(1, int(val))
+                    elif "目标帧时间" in key:
+                        self.lod_target_frame_ms = max(1.0, val)
+                    elif "离群邻居数" in key:
+                        self.outlier_k = max(1, int(val))
+                    elif "离群标准差" in key:
+                        self.outlier_std_ratio = max(0.0, val)
+                    elif "离群半径" in key:
+                        self.outlier_radius = max(1e-4, val)
+                    elif "离群最少邻居" in key:
+                        self.outlier_min_neighbors = max(1, int(val))
+                    elif "生长间距" in key:
+                        self.grow_gap = max(0.01, val)
+                    elif "离地高度" in key:
+                        self.grow_clearance = max(0.0, val)
+                    elif "生长法向角" in key:
+                        self.grow_normal_angle = min(90.0, max(0.0, val))
+                    elif "笔刷半径" in key:
+                        self.brush_radius_px = max(1.0, val)
+                    elif "遮挡容差" in key:
+                        self.occlusion_tolerance = max(0.0, val)
+                    elif "LOD" in key.upper():
+                        self.lod_fraction = val / 100.0 if val > 1 else val
                     else:
                         values.append(val)
             if len(values) >= 1:
@@ -150,6 +198,12 @@ class MainWindow(QMainWindow):
                 f"Stage1={self.stage1_div}, Stage2={self.stage2_div}, "
                 f"RandomTarget={self.random_target_points}, "
                 f"InitFont={self.initial_font_size}, InitLineWidth={self.initial_linewidth}, "
+                f"LodFrameMs={self.lod_target_frame_ms}, LodFraction={self.lod_fraction}, "
+                f"PointBudget={self.point_budget}, OctreeMin={self.octree_min_points}, "
+                f"OcclusionTol={self.occlusion_tolerance}, BrushRadius={self.brush_radius_px}, "
+                f"GrowGap={self.grow_gap}, GrowClearance={self.grow_clearance}, GrowAngle={self.grow_normal_angle}, "
+                f"OutlierK={self.outlier_k}, OutlierStd={self.outlier_std_ratio}, "
+                f"OutlierRadius={self.outlier_radius}, OutlierMinNb={self.outlier_min_neighbors}, "
                 f"File={param_path}"
             )
         except Exception as e:
@@ -279,7 +333,13 @@ class MainWindow(QMainWindow):
         self.panel_action.style_edit_lock_changed.connect(self._set_style_view_lock)
         self.panel_action.marker_label_changed.connect(self.tool_marker.set_label_prefix)
         self.panel_action.xray_toggled.connect(self.tool_measure.set_xray_enabled)
+        self.panel_action.visible_only_toggled.connect(self.tool_select.set_visible_only)
+        self.panel_action.select_combine_changed.connect(self.tool_select.set_combine_mode)
+        self.panel_action.select_shape_changed.connect(self.tool_select.set_select_shape)
+        self.panel_action.slab_select_requested.connect(self.on_slab_select)
         self.panel_action.view_change_triggered.connect(self.on_view_change)
+        self.panel_action.color_mode_changed.connect(self.on_color_mode_changed)
+        self.panel_action.color_range_changed.connect(self.canvas.set_scalar_range)
         self.btn_view_front.clicked.connect(lambda: self.on_view_change("front"))
         self.btn_view_side.clicked.connect(lambda: self.on_view_change("side"))
         self.btn_view_top.clicked.connect(lambda: self.on_view_change("top"))
@@ -330,7 +390,7 @@ class MainWindow(QMainWindow):
         cam.SetViewUp(0.0, 0.0, 1.0)
         cam.SetParallelProjection(0)
         self.canvas.plotter.renderer.ResetCameraClippingRange()
-        self.canvas.plotter.render()
+        self.canvas.request_render()
 
     def _restore_camera_state(self, state):
         if not state:
@@ -342,7 +402,7 @@ class MainWindow(QMainWindow):
         cam.SetParallelProjection(state["parallel_projection"])
         cam.SetParallelScale(state["parallel_scale"])
         self.canvas.plotter.renderer.ResetCameraClippingRange()
-        self.canvas.plotter.render()
+        self.canvas.request_render()
 
     def _apply_stage1_lock_ui(self):
         pa = self.panel_action
@@ -513,7 +573,7 @@ class MainWindow(QMainWindow):
                 self.tool_marker.delete_by_data(real_data, render=False)
             elif cat == "ref":
                 self.tool_ref.delete_by_data(real_data, render=False)
-        self.canvas.plotter.render()
+        self.canvas.request_render()
         self._autosave_now()
 
     def set_stage_prepare(self):
@@ -586,6 +646,10 @@ class MainWindow(QMainWindow):
             return True
         return False
 
+    def _set_octree_cache_dir(self):
+        root = self._get_project_root_dir()
+        self.canvas.octree_cache_dir = os.path.join(root, "octree_cache") if root else None
+
     def _get_project_root_dir(self):
         base = self.scan_dir if self.scan_dir else os.path.dirname(self.raw_file_path or "")
         if not base:
@@ -610,6 +674,14 @@ class MainWindow(QMainWindow):
         self.has_texture_input = bool(texture_path)
         if hasattr(self.panel_action, "set_mesh_output_visible"):
             self.panel_action.set_mesh_output_visible(self.has_texture_input)
+        # 已进入过精修阶段的案件：直接从会话快照恢复，跳过原始扫描解析；
+        # 快照比自动保存的掩码/标定旧 (崩溃) 时不用，走 原始扫描 -> 编辑文件 + 掩码 的常规恢复
+        session_path = self.autosave.session_path()
+        if session_path:
+            print(f"[LOAD] resume from session: {session_path}", flush=True)
+            self._restore_after_work_load = True
+            self.set_stage_editor(session_path)
+            return
         self._start_loading_raw(texture_path=texture_path, loading_text=loading_text)
 
     def _start_loading_raw(self, texture_path=None, loading_text="正在加载原始模型..."):
@@ -639,8 +711,10 @@ class MainWindow(QMainWindow):
             self._restore_after_work_load = True
             self.set_stage_editor(edit_path)
             return
-        self.data_manager.load_data(mesh if mesh is not None else points, colors, texture)
-        self.canvas.render_mesh(self.data_manager)
+        self.data_manager.load_data(mesh if mesh is not None else points, colors, texture,
+                                    intensity=getattr(self.loader, "intensity", None))
+        self._set_octree_cache_dir()
+        self.canvas.render_mesh(self.data_manager, reset_scene=True)
         self._apply_dynamic_initial_view()
         try:
             if self.autosave.has_autosave():
@@ -657,15 +731,32 @@ class MainWindow(QMainWindow):
         QApplication.processEvents()
         self.loader = ModelLoader(path, texture_path=texture_path)
         self.loader.loaded.connect(self.on_work_loaded)
+        self.loader.error.connect(self.on_work_load_error)
         self.loader.start()
 
+    def on_work_load_error(self, msg):
+        if self.progress_dialog:
+            self.progress_dialog.close()
+            self.progress_dialog = None
+        self.setEnabled(True)
+        path = getattr(self.loader, "file_path", "") or ""
+        if path.endswith(SESSION_EXT) and self.raw_file_path:
+            # 会话快照损坏或版本不符：回到原始扫描 + 编辑文件的常规恢复流程
+            print(f"[LOAD] session restore failed, falling back to raw scan: {msg}", flush=True)
+            self.set_stage_prepare()
+            tex = self.texture_path if self.has_texture_input else None
+            self._start_loading_raw(texture_path=tex)
+            return
+        QMessageBox.critical(self, "错误", msg)
+
     def on_work_loaded(self, mesh, points, colors, texture, orig, final):
         if self.progress_dialog:
             self.progress_dialog.close()
             self.progress_dialog = None
         self.setEnabled(True)
         self.data_manager.load_data(mesh if mesh is not None else points, colors, texture)
-        self.canvas.render_mesh(self.data_manager)
+        self._set_octree_cache_dir()
+        self.canvas.render_mesh(self.data_manager, reset_scene=True)
         self._apply_dynamic_initial_view()
         if self.current_tool == self.tool_calibration:
             self.tool_calibration.deactivate()
@@ -839,7 +930,7 @@ class MainWindow(QMainWindow):
             if self._ground_calib_locked or self._north_locked:
                 return
             self.tool_select.clear_selection()
-            self.canvas.plotter.render()
+            self.canvas.request_render()
             self.panel_action.set_stage1_mode_selection("view")
             self.tool_select.set_interaction_mode("view")
             self._enter_north_calibration()
@@ -866,7 +957,46 @@ class MainWindow(QMainWindow):
             self._autosave_now()
         elif action == "invert":
             self.tool_select.invert_selection()
-            self.canvas.plotter.render()
+            self.canvas.request_render()
+        elif action in ("outliers_stat", "outliers_radius"):
+            self.start_outlier_scan("radius" if action == "outliers_radius" else "statistical")
+
+    def start_outlier_scan(self, method):
+        """后台查找离群点，结果作为选区 (红色) 预览；确认用“删除红色区域”，整批一次删除、一次撤回。"""
+        if self.data_manager.mesh is None:
+            return
+        if self._outlier_worker is not None and self._outlier_worker.isRunning():
+            return
+        self._outlier_worker = OutlierWorker(
+            self.data_manager,
+            method,
+            k=self.outlier_k,
+            std_ratio=self.outlier_std_ratio,
+            radius=self.outlier_radius,
+            min_neighbors=self.outlier_min_neighbors,
+        )
+        self._outlier_worker.found.connect(self.on_outliers_found)
+        self._outlier_worker.error.connect(self.on_outliers_error)
+        self.setCursor(Qt.BusyCursor)
+        self._outlier_worker.start()
+
+    def on_outliers_found(self, rows):
+        self.unsetCursor()
+        worker = self._outlier_worker
+        if worker is None or worker.generation != self.data_manager.mesh_generation:
+            return  # 检测期间 mesh 已改变，行号失效
+        self.tool_select.select_rows(rows)
+        if len(rows) == 0:
+            QMessageBox.information(self, "提示", "未发现离群点")
+        self.canvas.request_render()
+
+    def on_outliers_error(self, msg):
+        self.unsetCursor()
+        QMessageBox.critical(self, "错误", f"离群点检测失败: {msg}")
+
+    def on_slab_select(self, z_lo, z_hi):
+        self.tool_select.select_slab(z_lo, z_hi)
+        self.canvas.request_render()
 
     def on_select_mode_changed(self, mode):
         self._stage1_select_mode = mode
@@ -886,23 +1016,14 @@ class MainWindow(QMainWindow):
         self.tool_select.set_interaction_mode(mode)
 
     def _render_scene_with_overlays(self):
+        # 画布原地替换主 actor 的数据，叠加层 actor 不受影响，无需各工具 redraw_all
         self.canvas.render_mesh(self.data_manager)
-        try:
-            if hasattr(self.tool_ref, "redraw_all"):
-                self.tool_ref.redraw_all()
-        except Exception:
-            pass
-        try:
-            if hasattr(self.tool_measure, "redraw_all"):
-                self.tool_measure.redraw_all()
-        except Exception:
-            pass
-        try:
-            if hasattr(self.tool_marker, "redraw_all"):
-                self.tool_marker.redraw_all()
-        except Exception:
-            pass
-        self.canvas.plotter.render()
+        self.canvas.request_render()
+
+    def on_color_mode_changed(self, mode):
+        """原色 / 高程 / 强度 / 密度 着色切换；只换颜色数组，不重建场景。"""
+        self.canvas.set_color_mode(mode, self.data_manager)
+        self.canvas.request_render()
 
     def on_view_change(self, mode):
         cam = self.canvas.plotter.camera
@@ -916,7 +1037,7 @@ class MainWindow(QMainWindow):
             cam.SetViewUp(0, 0, 1)
         elif mode == "ortho_toggle":
             cam.SetParallelProjection(1 if self.panel_action.chk_ortho.isChecked() else 0)
-            self.canvas.plotter.render()
+            self.canvas.request_render()
 
     def undo_action(self):
         if self.data_manager.undo():
@@ -980,7 +1101,7 @@ class MainWindow(QMainWindow):
             self.tool_ref.apply_style(key, value, real_data, render=False)
         for real_data in marker_targets:
             self.tool_marker.apply_style(key, value, real_data, render=False)
-        self.canvas.plotter.render()
+        self.canvas.request_render()
 
     def _flush_pending_style_change(self):
         if not self._pending_style_change:
@@ -999,7 +1120,7 @@ class MainWindow(QMainWindow):
         except Exception:
             pass
         self.btn_toggle_objects.setText("显示所有元素" if checked else "隐藏所有元素")
-        self.canvas.plotter.render()
+        self.canvas.request_render()
 
     def _set_style_view_lock(self, locked):
         iren = getattr(self.canvas.plotter, "interactor", None)
@@ -1060,7 +1181,7 @@ class MainWindow(QMainWindow):
         cam = self.canvas.plotter.camera
         cam.SetViewUp(*up)
         self.canvas.plotter.renderer.ResetCameraClippingRange()
-        self.canvas.plotter.render()
+        self.canvas.request_render()
         self._refresh_top_direction_hint()
 
     def _dir_label(self, key):
@@ -1076,7 +1197,7 @@ class MainWindow(QMainWindow):
             return
         try:
             actor.SetInput(f"↑ {self._dir_label(self._top_dir_key)}")
-            self.canvas.plotter.render()
+            self.canvas.request_render()
         except Exception:
             pass
 
@@ -1093,14 +1214,14 @@ class MainWindow(QMainWindow):
                 color="yellow",
                 name="top_dir_hint",
             )
-            self.canvas.plotter.render()
+            self.canvas.request_render()
         except Exception:
             pass
 
     def _hide_top_direction_hint(self):
         try:
             self.canvas.plotter.remove_actor("top_dir_hint")
-            self.canvas.plotter.render()
+            self.canvas.request_render()
         except Exception:
             pass
 
@@ -1122,6 +1243,7 @@ class MainWindow(QMainWindow):
         toggled = []
         axes_hidden = False
         ann_hidden = False
+        self.canvas.set_lod_suspended(True)
         try:
             if hide_axes:
                 try:
@@ -1156,7 +1278,7 @@ class MainWindow(QMainWindow):
                     toggled.append((actor, prev))
                     self._set_actor_visible(actor, False)
 
-            self.canvas.plotter.render()
+            self.canvas.render_now()
             img = self.canvas.plotter.screenshot(return_img=True)
             return np.asarray(img)
         finally:
@@ -1166,12 +1288,13 @@ class MainWindow(QMainWindow):
                 for tool in (self.tool_measure, self.tool_ref, self.tool_marker):
                     if hasattr(tool, "set_visible"):
                         tool.set_visible(True)
+            self.canvas.set_lod_suspended(False)
             if axes_hidden:
                 try:
                     self.canvas.plotter.show_axes()
                 except Exception:
                     pass
-            self.canvas.plotter.render()
+            self.canvas.request_render()
 
     def _crop_black_margins(self, img, threshold=8, pad=4):
         if img is None or getattr(img, "size", 0) == 0:
@@ -1301,6 +1424,8 @@ class MainWindow(QMainWindow):
         self.lbl_stage.setText("阶段 3: 输出")
         self.panel_action.switch_stage(2)
         self.btn_toggle_objects.show()
+        # 离开精修阶段：写会话快照，重开案件时直接 mmap 恢复
+        self._autosave_now(session=True)
 
     def _back_to_stage2(self):
         self._hide_top_direction_hint()
@@ -1372,26 +1497,28 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"保存失败: {e}")
 
-    def _autosave_flush(self):
+    def _autosave_flush(self, session=False):
         if self._bulk_ui_update:
             return
         try:
-            self.autosave.save()
+            self.autosave.save(session=session)
         except Exception:
             pass
 
-    def _autosave_now(self, force=False):
+    def _autosave_now(self, force=False, session=False):
+        """session=True 时立即保存并写会话快照 (离开精修阶段/关闭窗口)。"""
         if self._bulk_ui_update:
             return
-        if force:
+        if force or session:
             if self._autosave_timer.isActive():
                 self._autosave_timer.stop()
-            self._autosave_flush()
+            self._autosave_flush(session=session)
             return
         self._autosave_timer.start(self._autosave_delay_ms)
 
     def closeEvent(self, event):
-        self._autosave_now(force=True)
+        self._autosave_now(force=True, session=True)
+        self.autosave.flush(timeout=10.0)
         self._is_closing = True
         if self.current_tool:
             self.current_tool.deactivate()
@@ -0,0 +1,242 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pyvista as pv
+import vtk
+
+from core.data import point_cloud
+from core.octree import select_nodes
+from core.spatial import frustum_planes
+
+
+class OctreeView:
+    """
+    按点预算显示八叉树节点：每帧根据视锥与投影尺寸选节点，
+    每个节点一个 actor (数据从 mmap 按需读取)。未选中的节点隐藏，
+    GPU 上常驻的节点总点数超过 cache_points 时按最久未用淘汰，
+    因此帧率和显存只取决于预算，与数据集大小无关。
+    """
+
+    def __init__(self, plotter, tree, point_budget=3_000_000, min_node_px=4.0,
+                 max_load_points=600_000, cache_factor=2.0, point_size=2):
+        self.plotter = plotter
+        self.tree = tree
+        self.point_budget = int(point_budget)
+        self.min_node_px = float(min_node_px)
+        # 每帧最多新读入的点数；剩余的下一帧继续 (渐进细化)
+        self.max_load_points = int(max_load_points)
+        self.cache_points = int(self.point_budget * cache_factor)
+        self.point_size = point_size
+        self._actors = OrderedDict()   # node -> (actor, n_points)，按最近使用排序
+        self._resident = 0
+        self._shown = set()
+        self._alive = None
+        self._id_space = None
+        self._user_matrix = None
+        self._frame = np.eye(4)
+        self._visible = True
+        self._scalar = None
+        self._lut = None
+        self.pending = False
+
+    # --- 外部状态 ---
+    def set_alive(self, orig_idx):
+        """当前 mesh 的 _orig_idx；被删除的点在节点读入时过滤掉。None 表示全部存活。"""
+        orig = self.tree.point_data.get("_orig_idx")
+        if orig_idx is None or orig is None or len(orig_idx) == self.tree.n_points:
+            alive = None
+        else:
+            # 八叉树可能由已压缩的 mesh 构建 (会话恢复/先删点再建树)，_orig_idx 稀疏且可大于 n_points，
+            # 位表按 id 空间而不是点数分配
+            orig_idx = np.asarray(orig_idx, dtype=np.int64)
+            if self._id_space is None:
+                self._id_space = int(np.asarray(orig).max()) + 1 if self.tree.n_points else 0
+            size = self._id_space
+            if len(orig_idx):
+                size = max(size, int(orig_idx.max()) + 1)
+            alive = np.zeros(size, dtype=bool)
+            alive[orig_idx] = True
+        self._alive = alive
+        self._drop_all()
+
+    def set_frame(self, frame):
+        """八叉树坐标 -> 世界坐标的刚体矩阵 (DataManager.frame)。"""
+        self._frame = np.asarray(frame, dtype=np.float64)
+        m = vtk.vtkMatrix4x4()
+        for r in range(4):
+            for c in range(4):
+                m.SetElement(r, c, float(self._frame[r, c]))
+        self._user_matrix = m
+        for actor, _ in self._actors.values():
+            actor.SetUserMatrix(m)
+        if self._scalar == "height":
+            self._recolor_all()
+
+    def set_scalar(self, name, lut):
+        """标量着色 ('height' / 'intensity')，None 为 RGB；已读入的节点只换颜色数组。
+        密度需要整体统计，八叉树节点上退回 RGB。"""
+        self._scalar = name if name in ("height", "intensity") else None
+        self._lut = lut
+        self._recolor_all()
+
+    def _recolor_all(self):
+        for node, (actor, _) in self._actors.items():
+            mapper = actor.GetMapper()
+            self._color_node(node, mapper, pv.wrap(mapper.GetInput()))
+
+    def set_visible(self, visible):
+        self._visible = bool(visible)
+        for node in self._shown:
+            self._actors[node][0].SetVisibility(self._visible)
+
+    # --- 每帧 ---
+    def update(self, composite, load_all=False):
+        """composite: 世界 -> 裁剪空间矩阵；load_all 时不限制本帧读入量 (截图)。返回是否还有节点待读入。"""
+        t0 = time.perf_counter()
+        w, h = self.plotter.window_size
+        if w <= 0 or h <= 0:
+            return False
+        # 把视锥变换到八叉树坐标系
+        local = np.asarray(composite, dtype=np.float64) @ self._frame
+        planes = frustum_planes(local, 0, 0, w, h, w, h)
+        cam = self.plotter.camera
+        parallel = bool(cam.GetParallelProjection())
+        if parallel:
+            ppu = h / (2.0 * max(cam.GetParallelScale(), 1e-9))
+        else:
+            ppu = h / (2.0 * np.tan(np.deg2rad(cam.GetViewAngle()) * 0.5))
+        inv = np.linalg.inv(self._frame)
+        cam_pos = (inv @ np.append(cam.GetPosition(), 1.0))[:3]
+
+        wanted = select_nodes(self.tree, planes, cam_pos, ppu, self.point_budget,
+                              self.min_node_px, parallel=parallel)
+        loaded = 0
+        shown = set()
+        pending = False
+        for node in wanted:
+            if node in self._actors:
+                self._actors.move_to_end(node)
+            else:
+                if loaded >= self.max_load_points and not load_all:
+                    pending = True
+                    continue
+                loaded += self._load(node)
+            shown.add(node)
+
+        for node in self._shown - shown:
+            if node in self._actors:
+                self._actors[node][0].SetVisibility(False)
+        for node in shown:
+            self._actors[node][0].SetVisibility(self._visible)
+        self._shown = shown
+        self._evict()
+        self.pending = pending
+        if loaded:
+            print(
+                f"[TIME][OCTREE] select={1000 * (time.perf_counter() - t0):.1f}ms, nodes={len(shown)}, "
+                f"loaded={loaded}, resident={self._resident}",
+                flush=True,
+            )
+        return pending
+
+    def _node_rows(self, node):
+        s, e = self.tree.node_rows(node)
+        rows = slice(s, e)
+        keep = None
+        if self._alive is not None:
+            ids = np.asarray(self.tree.point_data["_orig_idx"][rows], dtype=np.int64)
+            # 超出位表范围的 id 不在当前 mesh 中
+            keep = np.zeros(len(ids), dtype=bool)
+            inside = ids < len(self._alive)
+            keep[inside] = self._alive[ids[inside]]
+        return rows, keep
+
+    def _color_node(self, node, mapper, poly):
+        scalar = None
+        if self._scalar == "height":
+            # 节点坐标在八叉树坐标系，高程取变换后的 z
+            pts = np.asarray(poly.points, dtype=np.float64)
+            scalar = (pts @ self._frame[2, :3] + self._frame[2, 3]).astype(np.float32)
+        elif self._scalar == "intensity" and "Intensity" in self.tree.point_data:
+            rows, keep = self._node_rows(node)
+            scalar = np.asarray(self.tree.point_data["Intensity"][rows])
+            if keep is not None:
+                scalar = scalar[keep]
+        if scalar is not None:
+            poly.point_data["_scalar"] = scalar
+            mapper.SetLookupTable(self._lut)
+            mapper.UseLookupTableScalarRangeOn()
+            mapper.ScalarVisibilityOn()
+            mapper.SetScalarModeToUsePointFieldData()
+            mapper.SelectColorArray("_scalar")
+            mapper.SetColorModeToMapScalars()
+        elif "RGB" in poly.point_data:
+            mapper.ScalarVisibilityOn()
+            mapper.SetScalarModeToUsePointFieldData()
+            mapper.SelectColorArray("RGB")
+            mapper.SetColorModeToDirectScalars()
+        else:
+            mapper.ScalarVisibilityOff()
+
+    def _load(self, node):
+        rows, keep = self._node_rows(node)
+        pts = np.asarray(self.tree.points[rows], dtype=np.float32)
+        if keep is not None:
+            pts = pts[keep]
+        poly = point_cloud(pts)
+        # 节点不建顶点单元，按坐标直接画点 (同主 actor)
+        mapper = vtk.vtkPointGaussianMapper()
+        mapper.SetScaleFactor(0.0)
+        mapper.EmissiveOff()
+        rgb = self.tree.point_data.get("RGB")
+        if rgb is not None:
+            colors = np.asarray(rgb[rows])
+            if keep is not None:
+                colors = colors[keep]
+            poly.point_data["RGB"] = colors
+        self._color_node(node, mapper, poly)
+        mapper.SetInputData(poly)
+        actor = vtk.vtkActor()
+        actor.SetMapper(mapper)
+        prop = actor.GetProperty()
+        prop.SetPointSize(self.point_size)
+        prop.LightingOff()
+        if rgb is None:
+            prop.SetColor(0.0, 1.0, 1.0)
+        actor.SetPickable(False)
+        if self._user_matrix is not None:
+            actor.SetUserMatrix(self._user_matrix)
+        self.plotter.renderer.AddActor(actor)
+        self._actors[node] = (actor, len(pts))
+        self._resident += len(pts)
+        return len(pts)
+
+    def _evict(self):
+        rw = self.plotter.render_window
+        for node in list(self._actors.keys()):
+            if self._resident <= self.cache_points:
+                break
+            if node in self._shown:
+                continue
+            actor, n = self._actors.pop(node)
+            actor.GetMapper().ReleaseGraphicsResources(rw)
+            self.plotter.renderer.RemoveActor(actor)
+            self._resident -= n
+
+    def _drop_all(self):
+        rw = self.plotter.render_window
+        for actor, _ in self._actors.values():
+            try:
+                actor.GetMapper().ReleaseGraphicsResources(rw)
+                self.plotter.renderer.RemoveActor(actor)
+            except Exception:
+                pass
+        self._actors.clear()
+        self._shown = set()
+        self._resident = 0
+        self.pending = True
+
+    def clear(self):
+        self._drop_all()
+        self.pending = False
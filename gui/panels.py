@@ -1,7 +1,8 @@
 ﻿from PySide6.QtWidgets import (QWidget, QVBoxLayout, QTreeWidget, QTreeWidgetItem, 
                                QPushButton, QLabel, QStackedWidget, QCheckBox, 
                                QButtonGroup, QHBoxLayout, QFrame, QTabWidget, 
-                               QLineEdit, QFormLayout, QSlider, QScrollArea, QGridLayout)
+                               QLineEdit, QFormLayout, QSlider, QScrollArea, QGridLayout,
+                               QDoubleSpinBox)
 from PySide6.QtCore import Signal, Qt
 import os
 import sys
@@ -226,6 +227,12 @@ class ActionPanel(QWidget):
     tool_selected = Signal(str, str)  
     action_triggered = Signal(str)    
     xray_toggled = Signal(bool)
+    visible_only_toggled = Signal(bool)         # 区域选择只选可见面
+    select_combine_changed = Signal(str)        # replace / union / subtract / intersect
+    select_shape_changed = Signal(str)          # lasso / box / brush / grow
+    slab_select_requested = Signal(float, float)  # 高度区间 (下限, 上限)
+    color_mode_changed = Signal(str)            # rgb / height / intensity / density
+    color_range_changed = Signal(float, float)  # 色表范围 (0~1 比例)
     marker_label_changed = Signal(str)
     measure_style_changed = Signal(str, str, str)  # key, value, extra
     style_edit_lock_changed = Signal(bool)
@@ -272,8 +279,62 @@ class ActionPanel(QWidget):
         for b in [self.btn_s1_view, self.btn_s1_pan, self.btn_s1_draw]: 
             b.setStyleSheet(STYLE_TOUCH_BTN_BIG)
             l.addWidget(b)
+
+        self.btn_s1_visible_only = QPushButton("👁️ 仅选可见面")
+        self.btn_s1_visible_only.setCheckable(True)
+        self.btn_s1_visible_only.setStyleSheet(STYLE_TOUCH_BTN_NORMAL)
+        self.btn_s1_visible_only.toggled.connect(self.visible_only_toggled.emit)
+        l.addWidget(self.btn_s1_visible_only)
+
+        # 多次套索的合并方式 (键盘 Shift=加选、Ctrl=减选、Shift+Ctrl=交集 临时覆盖)
+        h_combine = QHBoxLayout()
+        self.grp_select_combine = QButtonGroup(self)
+        for text, mode in [("新选", "replace"), ("加选", "union"), ("减选", "subtract"), ("交集", "intersect")]:
+            b = QPushButton(text)
+            b.setCheckable(True)
+            b.setStyleSheet("QPushButton{height:50px;font-size:18px;border:2px solid #ccc;border-radius:6px;margin:2px;color:black;}"
+                            "QPushButton:checked{background-color:#0275d8;color:white;}")
+            b.setChecked(mode == "replace")
+            b.clicked.connect(lambda _checked=False, m=mode: self.select_combine_changed.emit(m))
+            self.grp_select_combine.addButton(b)
+            h_combine.addWidget(b)
+        l.addLayout(h_combine)
+
+        # 区域选择的形状
+        h_shape = QHBoxLayout()
+        self.grp_select_shape = QButtonGroup(self)
+        for text, shape in [("套索", "lasso"), ("框选", "box"), ("笔刷", "brush"), ("点选物体", "grow")]:
+            b = QPushButton(text)
+            b.setCheckable(True)
+            b.setStyleSheet("QPushButton{height:50px;font-size:18px;border:2px solid #ccc;border-radius:6px;margin:2px;color:black;}"
+                            "QPushButton:checked{background-color:#0275d8;color:white;}")
+            b.setChecked(shape == "lasso")
+            b.clicked.connect(lambda _checked=False, m=shape: self.select_shape_changed.emit(m))
+            self.grp_select_shape.addButton(b)
+            h_shape.addWidget(b)
+        l.addLayout(h_shape)
+
+        # 高度区间：一键选中某高度以上/之间的点 (树木、电线等)
+        h_slab = QHBoxLayout()
+        self.spin_slab_lo = QDoubleSpinBox()
+        self.spin_slab_hi = QDoubleSpinBox()
+        for sp, val in ((self.spin_slab_lo, 3.0), (self.spin_slab_hi, 100.0)):
+            sp.setRange(-1000.0, 10000.0)
+            sp.setDecimals(2)
+            sp.setSingleStep(0.5)
+            sp.setSuffix(" m")
+            sp.setValue(val)
+            sp.setStyleSheet("font-size:16px; min-height:40px;")
+        h_slab.addWidget(self.spin_slab_lo)
+        h_slab.addWidget(QLabel("~"))
+        h_slab.addWidget(self.spin_slab_hi)
+        l.addLayout(h_slab)
+        self._add_btn(l, "📏 选中高度区间",
+                      lambda: self.slab_select_requested.emit(self.spin_slab_lo.value(), self.spin_slab_hi.value()))
             
         l.addWidget(self._line())
+        self._init_color_mode(l)
+        l.addWidget(self._line())
 
         lbl2 = QLabel("📐 空间校准"); lbl2.setStyleSheet("font-size: 18px; font-weight: bold;")
         l.addWidget(lbl2)
@@ -326,6 +387,15 @@ class ActionPanel(QWidget):
 
         self.btn_s1_delete_inner = self._add_btn(l, "删除红色区域", lambda: self.select_triggered.emit("delete_inner"), "#d9534f")
         self.btn_s1_invert = self._add_btn(l, "↔️ 反选", lambda: self.select_triggered.emit("invert"))
+        # 离群点检测结果作为选区预览，确认后用上面的“删除红色区域”删除
+        h_outlier = QHBoxLayout()
+        self.btn_s1_outlier_stat = QPushButton("🧹 统计去噪")
+        self.btn_s1_outlier_radius = QPushButton("🧹 半径去噪")
+        for b, act in ((self.btn_s1_outlier_stat, "outliers_stat"), (self.btn_s1_outlier_radius, "outliers_radius")):
+            b.setStyleSheet(STYLE_TOUCH_BTN_NORMAL)
+            b.clicked.connect(lambda _checked=False, a=act: self.select_triggered.emit(a))
+            h_outlier.addWidget(b)
+        l.addLayout(h_outlier)
         self.btn_s1_undo = self._add_btn(l, "↩️ 撤回", lambda: self.action_triggered.emit('undo'))
         l.addStretch()
 
@@ -841,6 +911,49 @@ class ActionPanel(QWidget):
             bg.addButton(b)
             b.clicked.connect(lambda c, m=modes[i]: signal.emit(m))
 
+    def _init_color_mode(self, l):
+        """点云着色：原色 / 高程 / 强度 / 密度，标量模式下可拖动色表范围。"""
+        lbl = QLabel("🎨 着色"); lbl.setStyleSheet("font-size: 18px; font-weight: bold;")
+        l.addWidget(lbl)
+        h = QHBoxLayout()
+        self.grp_color_mode = QButtonGroup(self)
+        for text, mode in [("原色", "rgb"), ("高程", "height"), ("强度", "intensity"), ("密度", "density")]:
+            b = QPushButton(text)
+            b.setCheckable(True)
+            b.setStyleSheet("QPushButton{height:50px;font-size:18px;border:2px solid #ccc;border-radius:6px;margin:2px;color:black;}"
+                            "QPushButton:checked{background-color:#0275d8;color:white;}")
+            b.setChecked(mode == "rgb")
+            b.clicked.connect(lambda _checked=False, m=mode: self._on_color_mode(m))
+            self.grp_color_mode.addButton(b)
+            h.addWidget(b)
+        l.addLayout(h)
+
+        self.widget_color_range = QWidget()
+        lr = QVBoxLayout(self.widget_color_range)
+        lr.setContentsMargins(0, 0, 0, 0)
+        self.sld_color_lo = QSlider(Qt.Horizontal)
+        self.sld_color_hi = QSlider(Qt.Horizontal)
+        for text, sld, val in [("下限", self.sld_color_lo, 0), ("上限", self.sld_color_hi, 100)]:
+            hr = QHBoxLayout()
+            lb = QLabel(text); lb.setStyleSheet("font-size: 16px;")
+            sld.setMinimum(0); sld.setMaximum(100); sld.setValue(val)
+            sld.setTracking(True)
+            sld.setStyleSheet("height: 40px;")
+            sld.valueChanged.connect(self._emit_color_range)
+            hr.addWidget(lb); hr.addWidget(sld, 1)
+            lr.addLayout(hr)
+        l.addWidget(self.widget_color_range)
+        self.widget_color_range.hide()
+
+    def _on_color_mode(self, mode):
+        for sld, val in [(self.sld_color_lo, 0), (self.sld_color_hi, 100)]:
+            sld.blockSignals(True); sld.setValue(val); sld.blockSignals(False)
+        self.widget_color_range.setVisible(mode != "rgb")
+        self.color_mode_changed.emit(mode)
+
+    def _emit_color_range(self, _value=None):
+        self.color_range_changed.emit(self.sld_color_lo.value() / 100.0, self.sld_color_hi.value() / 100.0)
+
     def _add_btn(self, layout, text, callback, color=None):
         btn = QPushButton(text)
         style = STYLE_TOUCH_BTN_NORMAL
@@ -1,3 +1,7 @@
+from .interaction import MoveCoalescer
+from .pan_utils import perform_pan
+
+
 class BaseTool:
     def __init__(self, canvas, data_manager):
         self.canvas = canvas
@@ -11,6 +15,33 @@ class BaseTool:
             self.plotter = None
             
         self.observers = []
+        self.pan_start_pos = None
+        # 平移的移动事件按帧合并 (各工具的 pan 模式共用)
+        self._pan_moves = MoveCoalescer(self._pan_to, name="pan")
+
+    def request_render(self):
+        """交给画布的渲染调度器，在下一帧合并渲染；没有调度器时直接渲染。"""
+        request = getattr(self.canvas, 'request_render', None)
+        if request is not None:
+            request()
+        elif self.plotter:
+            self.plotter.render()
+
+    # --- 平移 ---
+    def on_pan_start(self, obj, event):
+        self.pan_start_pos = self.plotter.interactor.GetEventPosition()
+
+    def on_pan_move(self, obj, event):
+        if not self.pan_start_pos: return
+        self._pan_moves.push(self.plotter.interactor.GetEventPosition())
+
+    def on_pan_end(self, obj, event):
+        self._pan_moves.finish()
+        self.pan_start_pos = None
+
+    def _pan_to(self, curr):
+        if not self.pan_start_pos: return
+        self.pan_start_pos = perform_pan(self.plotter, self.pan_start_pos, curr, render=self.request_render)
 
     def activate(self):
         pass
@@ -3,6 +3,8 @@ import numpy as np
 import pyvista as pv
 from PySide6.QtCore import QObject, Signal
 from .base import BaseTool
+from .interaction import MoveCoalescer
+from .pick_utils import pick_point
 
 class CalibrationTool(BaseTool, QObject):
     matrix_updated = Signal(object) 
@@ -25,6 +27,7 @@ class CalibrationTool(BaseTool, QObject):
         self.is_debug_mode = False
         self.last_mouse_pos = None
         self.pending_north_deg = 0.0
+        self._tune_moves = MoveCoalescer(self._tune_to, name="tune")
 
     def activate(self):
         self.is_active = True
@@ -42,15 +45,15 @@ class CalibrationTool(BaseTool, QObject):
     # --- 视图控制 ---
     def view_top(self):
         self.plotter.view_xy()
-        self.plotter.render()
+        self.request_render()
     def view_front(self):
         self.plotter.view_xz()
         self.plotter.camera.SetViewUp(0, 0, 1)
-        self.plotter.render()
+        self.request_render()
     def view_side(self):
         self.plotter.view_yz()
         self.plotter.camera.SetViewUp(0, 0, 1)
-        self.plotter.render()
+        self.request_render()
 
     # --- 流程 1: 地面校准 ---
     def start_ground_calibration_flow(self):
@@ -97,7 +100,7 @@ class CalibrationTool(BaseTool, QObject):
                 self.observers.append(iren.AddObserver("LeftButtonPressEvent", self.on_click_ground))
             else:
                 self.set_interaction_mode('view')
-        self.plotter.render()
+        self.request_render()
 
     def on_click_ground(self, obj, event):
         pos = self.plotter.interactor.GetEventPosition()
@@ -226,13 +229,16 @@ class CalibrationTool(BaseTool, QObject):
     def on_tune_move(self, obj, event):
         if not hasattr(self, 'is_dragging') or not self.is_dragging: return
         if not self.last_mouse_pos: return
-        curr_pos = self.plotter.interactor.GetEventPosition()
+        self._tune_moves.push(self.plotter.interactor.GetEventPosition())
+    def _tune_to(self, curr_pos):
+        if not self.last_mouse_pos: return
         dx = curr_pos[0] - self.last_mouse_pos[0]
         angle_deg = dx * 0.2
         self.pending_north_deg += angle_deg
         self._preview_rotate_by_delta(self.pending_north_deg)
         self.last_mouse_pos = curr_pos
     def on_tune_end(self, obj, event):
+        self._tune_moves.finish()
         self.is_dragging = False; self.last_mouse_pos = None
     def confirm_north(self):
         if abs(self.pending_north_deg) > 1e-6:
@@ -286,14 +292,14 @@ class CalibrationTool(BaseTool, QObject):
         mat = np.eye(4, dtype=np.float64)
         mat[:3, :3] = np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], dtype=np.float64)
         actor.SetUserMatrix(self._to_vtk_matrix(mat))
-        self.plotter.render()
+        self.request_render()
 
     def _clear_north_preview_transform(self):
         actor = getattr(self.canvas, "main_actor", None)
         if actor is None:
             return
         actor.SetUserMatrix(None)
-        self.plotter.render()
+        self.request_render()
 
     def _to_vtk_matrix(self, np_mat4):
         m = vtk.vtkMatrix4x4()
@@ -305,27 +311,17 @@ class CalibrationTool(BaseTool, QObject):
     def _apply_transform(self, matrix, record_history=False):
         if record_history: self.data_manager.push_history()
         self.accumulated_matrix = matrix @ self.accumulated_matrix
-        self.data_manager.mesh.transform(matrix, inplace=True)
+        self.data_manager.transform(matrix)
         for actor in self.visual_actors:
             try:
                 poly = actor.GetMapper().GetInput()
                 poly.transform(matrix, inplace=True)
             except: pass
         self.matrix_updated.emit(self.accumulated_matrix)
-        self.plotter.render()
+        self.request_render()
 
     def _pick_point(self, pos):
-        picker = vtk.vtkPointPicker()
-        picker.SetPickFromList(True)
-        main_actor = getattr(self.canvas, "main_actor", None)
-        if main_actor is not None:
-            try:
-                picker.InitializePickList()
-                picker.AddPickList(main_actor)
-            except Exception:
-                pass
-        picker.Pick(pos[0], pos[1], 0, self.plotter.renderer)
-        return picker.GetPickPosition() if picker.GetPointId() != -1 else None
+        return pick_point(self.plotter, self.data_manager, pos)
     def _clear_visuals(self):
         for actor in self.visual_actors: self.plotter.remove_actor(actor)
         self.visual_actors = []
@@ -342,11 +338,4 @@ class CalibrationTool(BaseTool, QObject):
         if color: prop.SetColor(pv.Color(color).float_rgb)
         if is_solid: prop.SetLighting(False)
         else: prop.SetLineWidth(line_width); prop.SetPointSize(15); prop.SetRenderLinesAsTubes(True)
-    def on_pan_start(self, obj, event): self.pan_start_pos = self.plotter.interactor.GetEventPosition()
-    def on_pan_move(self, obj, event):
-        if not getattr(self, 'pan_start_pos', None): return
-        from tools.pan_utils import perform_pan
-        curr = self.plotter.interactor.GetEventPosition()
-        self.pan_start_pos = perform_pan(self.plotter, self.pan_start_pos, curr)
-    def on_pan_end(self, obj, event): self.pan_start_pos = None
     def get_transform_matrix(self): return self.accumulated_matrix
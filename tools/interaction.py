@@ -0,0 +1,59 @@
+import time
+
+from PySide6.QtCore import QTimer
+
+
+class MoveCoalescer:
+    """
+    合并鼠标移动事件：触摸屏/高回报率鼠标的 MouseMoveEvent 比帧率快得多，
+    这里只保留最新位置，每帧最多调用一次 handler(pos)。
+    被合并掉的事件计入 dropped，拖动结束时打印统计。
+    """
+
+    def __init__(self, handler, name="move", frame_ms=16):
+        self.handler = handler
+        self.name = name
+        self.frame_ms = frame_ms
+        self.received = 0
+        self.handled = 0
+        self.dropped = 0
+        self._pending = None
+        self._last_run = 0.0
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def push(self, pos):
+        self.received += 1
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = pos
+        if self._timer.isActive():
+            return
+        wait = self.frame_ms - (time.perf_counter() - self._last_run) * 1000.0
+        if wait <= 0:
+            # 距上次处理已过一帧：立即处理，不增加延迟
+            self.flush()
+        else:
+            self._timer.start(int(wait) + 1)
+
+    def flush(self):
+        """立即处理挂起的位置 (松开鼠标时调用，保证最终位置不丢)。"""
+        self._timer.stop()
+        pos, self._pending = self._pending, None
+        if pos is None:
+            return
+        self._last_run = time.perf_counter()
+        self.handled += 1
+        self.handler(pos)
+
+    def finish(self):
+        """拖动结束：处理最后的位置并输出统计。"""
+        self.flush()
+        if self.received:
+            print(
+                f"[INPUT][{self.name}] received={self.received}, handled={self.handled}, "
+                f"dropped={self.dropped}",
+                flush=True,
+            )
+        self.received = self.handled = self.dropped = 0
@@ -0,0 +1,110 @@
+import numpy as np
+
+# 套索选择：多边形先栅格化成屏幕掩码，投影点按整数像素查表，
+# 只有落在边界像素里的点才做精确的多边形判断，整体是一次线性扫描。
+
+
+def points_in_polygon(xy, polygon, chunk_cells=4_000_000):
+    """奇偶规则判断点是否在多边形内 (向量化，按块处理以限制 点数×边数 的临时内存)。"""
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    poly = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    inside = np.zeros(len(xy), dtype=bool)
+    if len(poly) < 3 or len(xy) == 0:
+        return inside
+    x0, y0 = poly[:, 0], poly[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    step = max(1, chunk_cells // len(poly))
+    for s in range(0, len(xy), step):
+        px = xy[s:s + step, 0:1]
+        py = xy[s:s + step, 1:2]
+        crosses = (y0 > py) != (y1 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xc = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        inside[s:s + step] = (np.count_nonzero(crosses & (px < xc), axis=1) & 1).astype(bool)
+    return inside
+
+
+class LassoMask:
+    """
+    套索多边形在屏幕上的栅格掩码 (只覆盖多边形包围框内的窗口区域)。
+    inside: 像素中心在多边形内；edge: 有边穿过 (含一圈外扩) 的像素，需要精确判断。
+    """
+
+    def __init__(self, polygon, width, height, chunk_cells=4_000_000):
+        poly = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        self.polygon = poly
+        self.x0 = int(max(0, np.floor(poly[:, 0].min())))
+        self.y0 = int(max(0, np.floor(poly[:, 1].min())))
+        x1 = int(min(width, np.ceil(poly[:, 0].max()) + 1))
+        y1 = int(min(height, np.ceil(poly[:, 1].max()) + 1))
+        self.w = max(0, x1 - self.x0)
+        self.h = max(0, y1 - self.y0)
+        self.inside = np.zeros((self.h, self.w), dtype=bool)
+        self.edge = np.zeros((self.h, self.w), dtype=bool)
+        if len(poly) < 3 or self.w == 0 or self.h == 0:
+            return
+        self._fill(poly, chunk_cells)
+        self._mark_edges(poly)
+
+    def _fill(self, poly, chunk_cells):
+        """扫描线填充：每行像素中心与各边求交，交点右侧的像素翻转奇偶。"""
+        ex0, ey0 = poly[:, 0], poly[:, 1]
+        ex1, ey1 = np.roll(ex0, -1), np.roll(ey0, -1)
+        rows_per_chunk = max(1, chunk_cells // len(poly))
+        for r0 in range(0, self.h, rows_per_chunk):
+            r1 = min(self.h, r0 + rows_per_chunk)
+            cy = self.y0 + np.arange(r0, r1) + 0.5
+            crosses = (ey0[None, :] > cy[:, None]) != (ey1[None, :] > cy[:, None])
+            r, e = np.nonzero(crosses)
+            xc = ex0[e] + (cy[r] - ey0[e]) * (ex1[e] - ex0[e]) / (ey1[e] - ey0[e])
+            # 像素中心 x0+c+0.5 > xc 的第一列
+            col = np.clip(np.floor(xc - 0.5 - self.x0).astype(np.int64) + 1, 0, self.w)
+            toggles = np.zeros((r1 - r0, self.w + 1), dtype=np.int32)
+            np.add.at(toggles, (r, col), 1)
+            self.inside[r0:r1] = (np.cumsum(toggles, axis=1)[:, :self.w] & 1).astype(bool)
+
+    def _mark_edges(self, poly):
+        """沿每条边按半像素步长采样，标记经过的像素，再外扩一圈防漏。"""
+        ex0, ey0 = poly[:, 0], poly[:, 1]
+        dx = np.roll(ex0, -1) - ex0
+        dy = np.roll(ey0, -1) - ey0
+        n = np.maximum(1, np.ceil(np.hypot(dx, dy) / 0.5)).astype(np.int64) + 1
+        edge_id = np.repeat(np.arange(len(poly)), n)
+        starts = np.cumsum(n) - n
+        t = (np.arange(int(n.sum())) - np.repeat(starts, n)) / np.repeat(n - 1, n)
+        bx = np.floor(ex0[edge_id] + t * dx[edge_id]).astype(np.int64) - self.x0
+        by = np.floor(ey0[edge_id] + t * dy[edge_id]).astype(np.int64) - self.y0
+        ok = (bx >= 0) & (bx < self.w) & (by >= 0) & (by < self.h)
+        edge = np.zeros((self.h + 2, self.w + 2), dtype=bool)
+        edge[by[ok] + 1, bx[ok] + 1] = True
+        grown = edge.copy()
+        for oy in (-1, 0, 1):
+            for ox in (-1, 0, 1):
+                if oy or ox:
+                    grown[1:-1, 1:-1] |= edge[1 + oy:self.h + 1 + oy, 1 + ox:self.w + 1 + ox]
+        self.edge = grown[1:-1, 1:-1]
+
+    def contains(self, scr_x, scr_y, chunk=1_000_000):
+        """屏幕坐标 (像素，原点左下) 是否在套索内；按块查表，边界像素内的点精确判断。"""
+        scr_x = np.asarray(scr_x)
+        scr_y = np.asarray(scr_y)
+        n = len(scr_x)
+        out = np.zeros(n, dtype=bool)
+        if self.w == 0 or self.h == 0:
+            return out
+        inside_flat = self.inside.ravel()
+        edge_flat = self.edge.ravel()
+        for s in range(0, n, chunk):
+            x = scr_x[s:s + chunk]
+            y = scr_y[s:s + chunk]
+            ix = np.floor(x).astype(np.int64) - self.x0
+            iy = np.floor(y).astype(np.int64) - self.y0
+            valid = np.flatnonzero((ix >= 0) & (ix < self.w) & (iy >= 0) & (iy < self.h))
+            flat = iy[valid] * self.w + ix[valid]
+            res = inside_flat[flat]
+            near = np.flatnonzero(edge_flat[flat])
+            if len(near):
+                rows = valid[near]
+                res[near] = points_in_polygon(np.column_stack((x[rows], y[rows])), self.polygon)
+            out[s + valid] = res
+        return out
@@ -3,6 +3,8 @@ import numpy as np # Added for pan logic
 import pyvista as pv
 from PySide6.QtCore import QObject, Signal, Qt
 from .base import BaseTool
+from .pick_utils import pick_point
+from .overlay_batch import BatchOverlay, hex_to_rgb255
 
 class MarkerTool(BaseTool, QObject):
     marker_added = Signal(str, object) # label, data_ref
@@ -17,7 +19,8 @@ class MarkerTool(BaseTool, QObject):
         self.interaction_mode = 'draw'
         self.style_font_size = 20
         self.style_text_color = "#ffffff"
-
+        # 批量恢复的标记点共用一个点 actor (见 restore_batch)
+        self._overlay = BatchOverlay(self.plotter)
 
     @staticmethod
     def _hex_to_rgb(hex_str):
@@ -80,7 +83,7 @@ class MarkerTool(BaseTool, QObject):
 
         # 恢复相机
         camera.SetPosition(pos); camera.SetFocalPoint(focal); camera.SetViewUp(view_up)
-        self.plotter.render()
+        self.request_render()
         
     def set_cursor_cross(self):
         self.canvas.setCursor(Qt.CrossCursor)
@@ -94,9 +97,7 @@ class MarkerTool(BaseTool, QObject):
         pos = self.plotter.interactor.GetEventPosition()
         
         # 1. 尝试拾取点
-        picker = vtk.vtkPointPicker()
-        picker.Pick(pos[0], pos[1], 0, self.plotter.renderer)
-        pt = picker.GetPickPosition() if picker.GetPointId() != -1 else None
+        pt = pick_point(self.plotter, self.data_manager, pos)
         
         # 2. 如果没拾取到点，尝试拾取世界坐标 (Fallback)
         if not pt:
@@ -119,9 +120,27 @@ class MarkerTool(BaseTool, QObject):
         actor_pt = self.plotter.add_mesh(pv.PolyData([pos]), color="blue", point_size=20, render_points_as_spheres=True, reset_camera=False)
         
         # 2. 绘制文字标签 (始终朝向屏幕)
+        actor_lbl = self._make_label_actor(pos, label)
+        
+        # 保存扩展数据
+        # 保存扩展数据
+        data = {
+            'actors': [actor_pt, actor_lbl], 
+            'pos': [float(v) for v in pos],
+            'label_actor': actor_lbl,
+            'label': label,
+            'desc': desc,
+            'image': image_path,
+            'font_size': self.style_font_size,
+            'text_color': self.style_text_color
+        }
+        self.markers.append(data)
+        self.marker_added.emit(label, data)
+
+    def _make_label_actor(self, pos, label):
         # 稍微抬高一点 z
         label_pos = [pos[0], pos[1], pos[2] + 0.2]
-        
+
         new_lbl = vtk.vtkTextActor()
         new_lbl.SetInput(label)
         prop = new_lbl.GetTextProperty()
@@ -134,32 +153,55 @@ class MarkerTool(BaseTool, QObject):
             prop.SetBackgroundColor(0.0, 0.0, 0.0)
         if hasattr(prop, 'SetBackgroundOpacity'):
             prop.SetBackgroundOpacity(0.6)
-        
+
         from gui.canvas import _FONT_PATH
         if _FONT_PATH:
             try:
                 prop.SetFontFamily(vtk.VTK_FONT_FILE)
                 prop.SetFontFile(_FONT_PATH)
             except Exception: pass
-            
+
         new_lbl.SetPosition(label_pos[0], label_pos[1])
         new_lbl.GetPositionCoordinate().SetCoordinateSystemToWorld()
         new_lbl.GetPositionCoordinate().SetValue(label_pos[0], label_pos[1], label_pos[2])
         self.plotter.renderer.AddActor(new_lbl)
-        actor_lbl = new_lbl
-        
-        # 保存扩展数据
-        # 保存扩展数据
-        data = {
-            'actors': [actor_pt, actor_lbl], 
-            'label': label,
-            'desc': desc,
-            'image': image_path,
-            'font_size': self.style_font_size,
-            'text_color': self.style_text_color
-        }
-        self.markers.append(data)
-        self.marker_added.emit(label, data)
+        return new_lbl
+
+    def restore_batch(self, items):
+        """
+        批量恢复自动保存的标记：所有标记点合并进一个点 actor，只逐个创建文字标签。
+        items 为 {pos, label, desc, image} 字典列表。
+        """
+        if not items:
+            return []
+        restored = []
+        positions = []
+        for item in items:
+            pos = [float(v) for v in item['pos']]
+            self.count += 1
+            bid = self._overlay.new_id()
+            actor_lbl = self._make_label_actor(pos, item['label'])
+            data = {
+                'actors': [actor_lbl],
+                'pos': pos,
+                'label_actor': actor_lbl,
+                'label': item['label'],
+                'desc': item.get('desc', ''),
+                'image': item.get('image', ''),
+                'font_size': self.style_font_size,
+                'text_color': self.style_text_color,
+                '_batch_id': bid,
+            }
+            positions.append(pos)
+            restored.append(data)
+        owner = np.array([m['_batch_id'] for m in restored])
+        colors = np.tile(hex_to_rgb255("#0000ff"), (len(restored), 1))
+        self._overlay.add_points(20, owner, np.array(positions), colors)
+        self._overlay.commit()
+        for data in restored:
+            self.markers.append(data)
+            self.marker_added.emit(data['label'], data)
+        return restored
 
     def update_style_defaults(self, key, value):
         if key == 'font':
@@ -171,37 +213,41 @@ class MarkerTool(BaseTool, QObject):
         if key == 'font':
             new_size = int(value)
             data_ref['font_size'] = new_size
-            if len(data_ref.get('actors', [])) > 1:
-                lbl_actor = data_ref['actors'][1]
+            lbl_actor = data_ref.get('label_actor')
+            if lbl_actor is not None:
                 if isinstance(lbl_actor, vtk.vtkTextActor):
                     lbl_actor.GetTextProperty().SetFontSize(new_size)
         elif key == 'text_color':
             data_ref['text_color'] = value
-            if len(data_ref.get('actors', [])) > 1:
-                lbl_actor = data_ref['actors'][1]
+            lbl_actor = data_ref.get('label_actor')
+            if lbl_actor is not None:
                 if isinstance(lbl_actor, vtk.vtkTextActor):
                     r, g, b = self._hex_to_rgb(value)
                     lbl_actor.GetTextProperty().SetColor(r, g, b)
         if render:
-            self.plotter.render()
+            self.request_render()
 
     def delete_by_data(self, data, render=True):
         if data in self.markers:
             for a in data['actors']: self.plotter.remove_actor(a)
+            if '_batch_id' in data:
+                self._overlay.remove(data.pop('_batch_id'))
             self.markers.remove(data)
             if render:
-                self.plotter.render()
+                self.request_render()
 
     def clear_all(self, render=True):
         while self.markers:
             self.delete_by_data(self.markers[0], render=False)
+        self._overlay.clear()
         if render:
-            self.plotter.render()
+            self.request_render()
     def set_visible(self, visible):
         for marker in self.markers:
             for actor in marker.get('actors', []):
                 if actor is not None:
                     actor.SetVisibility(visible)
+        self._overlay.set_visible(visible)
 
     def redraw_all(self):
         """Re-add all marker actors to the renderer after a plotter.clear()"""
@@ -210,26 +256,20 @@ class MarkerTool(BaseTool, QObject):
                 if actor is not None:
                     try: self.plotter.renderer.AddActor(actor)
                     except Exception: pass
-        self.plotter.render()
-
-    # --- Pan Logic (Copied from Base or RefTool) ---
-    def on_pan_start(self, obj, event): self.pan_start_pos = self.plotter.interactor.GetEventPosition()
-    def on_pan_move(self, obj, event):
-        if not hasattr(self, 'pan_start_pos') or not self.pan_start_pos: return
-        from tools.pan_utils import perform_pan
-        curr = self.plotter.interactor.GetEventPosition()
-        self.pan_start_pos = perform_pan(self.plotter, self.pan_start_pos, curr)
-    def on_pan_end(self, obj, event): self.pan_start_pos = None
+        self._overlay.attach()
+        self.request_render()
 
     def highlight_segment(self, target_data):
         for marker in self.markers:
             is_selected = (marker is target_data)
             final_color = "#FF00FF" if is_selected else "#00FF00" # Green is default for markers
             rgb_color = tuple(int(final_color.lstrip('#')[i:i+2], 16) / 255.0 for i in (0, 2, 4))
+            if '_batch_id' in marker:
+                self._overlay.set_color(marker['_batch_id'], hex_to_rgb255(final_color))
             for actor in marker.get('actors', []):
                 try:
                     if hasattr(actor.GetMapper(), 'SetResolveCoincidentTopologyToPolygonOffset'):
                         actor.GetProperty().SetColor(*rgb_color)
                 except Exception:
                     pass
-        self.plotter.render()
+        self.request_render()
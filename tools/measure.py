@@ -3,12 +3,11 @@ import numpy as np
 import pyvista as pv
 from PySide6.QtCore import QObject, Signal, Qt
 from .base import BaseTool
+from .pick_utils import composite_matrix, pick_point
+from .projection import project_points
+from .lasso import points_in_polygon
+from .overlay_batch import BatchOverlay, arrows, cylinders, hex_to_rgb255
 
-try:
-    from matplotlib.path import Path
-    HAS_MATPLOTLIB = True
-except ImportError:
-    HAS_MATPLOTLIB = False
 
 class MeasureTool(BaseTool, QObject):
     measurement_added = Signal(str, object) 
@@ -42,6 +41,9 @@ class MeasureTool(BaseTool, QObject):
         self.style_tube_radius = 0.03
         self.style_text_color = "#ffffff"
 
+        # 批量恢复的测量共用少量合并 actor (见 restore_batch)
+        self._overlay = BatchOverlay(self.plotter, apply_style=self._apply_style)
+
     def update_style_defaults(self, key, value):
         """浠呮洿鏂伴粯璁ゆ牱寮忕姸鎬侊紝褰卞搷鍚庣画鏂版祴閲忥紝涓嶄慨鏀瑰凡鏈塧ctor"""
         if key == 'color':
@@ -59,6 +61,8 @@ class MeasureTool(BaseTool, QObject):
             rgb = self._hex_to_rgb(value)
             for seg in segments:
                 seg['color'] = value  # persist per-segment
+                if '_batch_id' in seg:
+                    self._overlay.set_color(seg['_batch_id'], hex_to_rgb255(value))
                 for actor in seg.get('actors', []):
                     try:
                         if hasattr(actor.GetMapper(), 'SetResolveCoincidentTopologyToPolygonOffset'):
@@ -70,6 +74,8 @@ class MeasureTool(BaseTool, QObject):
             for seg in segments:
                 stype = seg.get('type', 'poly')
                 color = seg.get('color', self.style_color)
+                if '_batch_id' in seg:
+                    self._detach_from_batch(seg)
                 # Remove old geometric actors (not label or point actors)
                 keep, to_remove = [], []
                 for a in seg.get('actors', []):
@@ -179,7 +185,7 @@ class MeasureTool(BaseTool, QObject):
                         lbl.GetTextProperty().SetColor(*rgb)
                     except Exception:
                         pass
-        self.plotter.render()
+        self.request_render()
 
     @staticmethod
     def _hex_to_rgb(hex_str):
@@ -245,13 +251,15 @@ class MeasureTool(BaseTool, QObject):
             base_color = seg.get('color', self.style_color)
             final_color = color if is_selected else base_color
             rgb_color = tuple(int(final_color.lstrip('#')[i:i+2], 16) / 255.0 for i in (0, 2, 4))
+            if '_batch_id' in seg:
+                self._overlay.set_color(seg['_batch_id'], hex_to_rgb255(final_color))
             for actor in seg.get('actors', []):
                 try:
                     if hasattr(actor.GetMapper(), 'SetResolveCoincidentTopologyToPolygonOffset'):
                         actor.GetProperty().SetColor(*rgb_color)
                 except:
                     pass
-        self.plotter.render()
+        self.request_render()
 
     def set_visible(self, visible):
         vis = bool(visible)
@@ -278,6 +286,7 @@ class MeasureTool(BaseTool, QObject):
                     except Exception:
                         pass
             self.segments = []
+            self._overlay.clear()
         except Exception:
             pass
         print("MeasureTool cleanup done")
@@ -309,7 +318,15 @@ class MeasureTool(BaseTool, QObject):
             seg_type = seg.get('type', 'poly')
             pts = seg.get('points')
             actors = []
-            if seg_type == 'poly' and pts and len(pts) >= 2:
+            if '_batch_id' in seg:
+                # 批量几何在合并 actor 里，只需加回标签
+                for a in seg['actors']:
+                    try:
+                        self.plotter.renderer.AddActor(a)
+                    except Exception:
+                        pass
+                new_segments.append(seg)
+            elif seg_type == 'poly' and pts and len(pts) >= 2:
                 # Re-draw poly measurement with current style
                 for p in pts:
                     a = self.plotter.add_mesh(pv.PolyData([p]), color=self.style_color, point_size=20,
@@ -333,7 +350,8 @@ class MeasureTool(BaseTool, QObject):
             else:
                 new_segments.append(seg)
         self.segments = new_segments
-        self.plotter.render()
+        self._overlay.attach()
+        self.request_render()
 
     def _create_segment_visuals(self, points, is_new=True):
         actors = []
@@ -362,9 +380,11 @@ class MeasureTool(BaseTool, QObject):
     def delete_by_data(self, data, render=True):
         if data in self.segments:
             for a in data['actors']: self.plotter.remove_actor(a)
+            if '_batch_id' in data:
+                self._overlay.remove(data.pop('_batch_id'))
             self.segments.remove(data)
             if render:
-                self.plotter.render()
+                self.request_render()
 
     def delete_segment_by_index(self, index):
         if 0 <= index < len(self.segments):
@@ -372,31 +392,19 @@ class MeasureTool(BaseTool, QObject):
             self.delete_by_data(seg)
 
     def delete_points_inside_polygon(self, polygon_points):
-        if not HAS_MATPLOTLIB or not self.segments: return
-        polygon_path = Path(polygon_points)
+        if not self.segments: return
         width, height = self.plotter.window_size
-        renderer = self.plotter.renderer
-        mat = self.plotter.camera.GetCompositeProjectionTransformMatrix(renderer.GetTiledAspectRatio(), -1, 1)
+        segs = [seg for seg in self.segments if 'points' in seg and len(seg['points'])]
+        if not segs: return
+        # 所有测量端点一次投影 (共用选择的投影内核)，再按所属测量汇总
+        pts = np.asarray([pt for seg in segs for pt in seg['points']], dtype=np.float64).reshape(-1, 3)
+        owner = np.repeat(np.arange(len(segs)), [len(seg['points']) for seg in segs])
+        scr_x, scr_y = project_points(pts, composite_matrix(self.plotter), width, height)
+        inside = points_in_polygon(np.column_stack((scr_x, scr_y)), polygon_points)
+        hit = np.zeros(len(segs), dtype=bool)
+        hit[owner[inside]] = True
+        to_remove = [seg for seg, h in zip(segs, hit) if h]
 
-        to_remove = []
-        for seg in self.segments:
-            if 'points' not in seg: continue
-            hit = False
-            for pt in seg['points']:
-                pt4 = np.array([pt[0], pt[1], pt[2], 1.0])
-                np_mat = np.zeros((4, 4))
-                for r in range(4):
-                    for c in range(4): np_mat[r, c] = mat.GetElement(r, c)
-                clip = np_mat @ pt4
-                w = clip[3]
-                if w == 0: continue
-                ndc = clip[:3] / w
-                sx = (ndc[0] + 1) / 2.0 * width
-                sy = (ndc[1] + 1) / 2.0 * height
-                if polygon_path.contains_point((sx, sy)):
-                    hit = True; break
-            if hit: to_remove.append(seg)
-        
         for seg in to_remove:
             self.delete_by_data(seg)
 
@@ -411,12 +419,12 @@ class MeasureTool(BaseTool, QObject):
             tube = line.tube(radius=self.style_tube_radius)
             l_actor = self.plotter.add_mesh(tube, color=self.style_color, lighting=False, reset_camera=False)
             self._apply_style(l_actor); self.current_actors.append(l_actor)
-        self.plotter.render()
+        self.request_render()
 
     def finish_segment(self):
         if self.mode == 'poly' and len(self.current_points) > 1:
             self._create_segment_visuals(self.current_points, is_new=True)
-            self._clear_temp(); self.plotter.render()
+            self._clear_temp(); self.request_render()
 
     def clear_all(self, render=True):
         for s in self.segments:
@@ -429,9 +437,10 @@ class MeasureTool(BaseTool, QObject):
                 except Exception:
                     pass
         self.segments = []
+        self._overlay.clear()
         self._clear_temp(render=render)
         if render:
-            self.plotter.render()
+            self.request_render()
     def set_interaction_mode(self, mode):
         print(f"[TRACE][MeasureTool] set_interaction_mode mode={mode}")
         self.clear_observers() 
@@ -461,11 +470,12 @@ class MeasureTool(BaseTool, QObject):
             self.observers.append(iren.AddObserver("LeftButtonReleaseEvent", self.on_release, 100))
             self.canvas.setCursor(Qt.CrossCursor)
 
-        camera.SetPosition(pos); camera.SetFocalPoint(focal); camera.SetViewUp(view_up); self.plotter.render()
+        camera.SetPosition(pos); camera.SetFocalPoint(focal); camera.SetViewUp(view_up); self.request_render()
 
     def set_visible(self, visible):
         for seg in self.segments:
             for actor in seg['actors']: actor.SetVisibility(visible)
+        self._overlay.set_visible(visible)
         for actor in self.current_actors: actor.SetVisibility(visible)
         if self.two_point_start_actor is not None:
             self.two_point_start_actor.SetVisibility(visible)
@@ -478,10 +488,11 @@ class MeasureTool(BaseTool, QObject):
         self.is_xray_enabled = enabled
         for seg in self.segments:
             for actor in seg['actors']: self._apply_style(actor)
+        self._overlay.restyle()
         for a in self.current_actors: self._apply_style(a)
         if self.two_point_start_actor is not None:
             self._apply_style(self.two_point_start_actor)
-        self.plotter.render()
+        self.request_render()
 
     def _apply_style(self, actor):
         mapper = actor.GetMapper()
@@ -497,8 +508,7 @@ class MeasureTool(BaseTool, QObject):
 
     # --- Pick / Mouse / Pan ---
     def pick_measure_point(self, pos):
-        picker = vtk.vtkPointPicker(); picker.SetTolerance(0.01); picker.Pick(pos[0], pos[1], 0, self.plotter.renderer)
-        final_pt = picker.GetPickPosition() if picker.GetPointId() != -1 else None
+        final_pt = pick_point(self.plotter, self.data_manager, pos, tolerance=0.01)
         if not final_pt:
             wp = vtk.vtkWorldPointPicker(); wp.Pick(pos[0], pos[1], 0, self.plotter.renderer); final_pt = wp.GetPickPosition()
         if final_pt: 
@@ -518,7 +528,7 @@ class MeasureTool(BaseTool, QObject):
                 reset_camera=False
             )
             self._apply_style(self.two_point_start_actor)
-            self.plotter.render()
+            self.request_render()
             return
 
         p1 = self.two_point_start.copy()
@@ -849,17 +859,159 @@ class MeasureTool(BaseTool, QObject):
 
         self.style_color = old_color
 
+    # --- 批量恢复 ---
+    def _make_label_actor(self, text, pt3d, text_color):
+        text_actor = vtk.vtkTextActor()
+        text_actor.SetInput(text)
+        prop = text_actor.GetTextProperty()
+        prop.SetFontSize(self.style_font_size)
+        self._style_text_prop(prop, text_color)
+
+        from gui.canvas import _FONT_PATH
+        if _FONT_PATH:
+            try:
+                prop.SetFontFamily(vtk.VTK_FONT_FILE)
+                prop.SetFontFile(_FONT_PATH)
+            except Exception: pass
+
+        text_actor.SetPosition(pt3d[0], pt3d[1])
+        text_actor.GetPositionCoordinate().SetCoordinateSystemToWorld()
+        text_actor.GetPositionCoordinate().SetValue(pt3d[0], pt3d[1], pt3d[2])
+        self.plotter.renderer.AddActor(text_actor)
+        return text_actor
+
+    def restore_batch(self, items):
+        """
+        批量恢复自动保存的测量：所有管线/箭头一次性向量化生成，
+        合并进一个 actor，端点合并进按尺寸划分的点 actor；只有文字标签逐个创建。
+        items 为自动保存的测量字典列表。
+        """
+        TARGET_SHAFT_RAD = 0.02
+        TARGET_TIP_RAD = 0.06
+        TARGET_TIP_LEN = 0.2
+
+        cyl = {'p0': [], 'p1': [], 'owner': [], 'rgb': []}
+        arr = {'start': [], 'dir': [], 'len': [], 'owner': [], 'rgb': []}
+        pts = {20: ([], [], []), 15: ([], [], [])}   # size -> (points, owner, rgb)
+        restored = []
+
+        def add_points(size, plist, bid, rgb):
+            dst = pts[size]
+            for p in plist:
+                dst[0].append(p); dst[1].append(bid); dst[2].append(rgb)
+
+        def add_arrow(start, direction, length, bid, rgb):
+            arr['start'].append(start); arr['dir'].append(direction); arr['len'].append(length)
+            arr['owner'].append(bid); arr['rgb'].append(rgb)
+
+        for item in items:
+            mtype = item.get('type', 'poly')
+            color = item.get('color', '#ffff00')
+            rgb = hex_to_rgb255(color)
+            bid = self._overlay.new_id()
+            if mtype == 'poly':
+                points = [np.array(p, dtype=float) for p in item.get('points', [])]
+                if len(points) < 2:
+                    continue
+                P = np.array(points)
+                cyl['p0'].append(P[:-1]); cyl['p1'].append(P[1:])
+                cyl['owner'].append(np.full(len(P) - 1, bid)); cyl['rgb'].append(np.tile(rgb, (len(P) - 1, 1)))
+                add_points(20, P, bid, rgb)
+                dist = float(np.linalg.norm(P[1:] - P[:-1], axis=1).sum())
+                seg = {'points': points, 'actors': [], 'distance': dist, 'type': 'poly', 'color': color}
+                self.count += 1
+                text = f"测量-{self.count}: {dist:.2f}m"
+            elif mtype in ('perp', 'direct', 'two_point'):
+                if mtype == 'perp':
+                    if 'pt' not in item or 'h' not in item:
+                        continue
+                    a, b = np.array(item['pt'], dtype=float), np.array(item['h'], dtype=float)
+                else:
+                    if 'p1' not in item or 'p2' not in item:
+                        continue
+                    a, b = np.array(item['p1'], dtype=float), np.array(item['p2'], dtype=float)
+                dist = float(item.get('dist', 0)) or float(np.linalg.norm(b - a))
+                if dist < 1e-4:
+                    continue
+                if mtype == 'direct':
+                    # 斜距: 基准点 -> 目标点的单向箭头
+                    add_arrow(a, b - a, dist, bid, rgb)
+                    add_points(15, [b], bid, rgb)
+                    lbl_pt = (a + b) / 2.0
+                    arrow_pts = {'p1': a.copy(), 'p2': b.copy()}
+                    text = f"斜距: {dist:.2f}m"
+                else:
+                    # 垂距/两点距: 中点向两端的双向箭头
+                    mid = (a + b) / 2.0
+                    add_arrow(mid, a - b, dist / 2.0, bid, rgb)
+                    add_arrow(mid, b - a, dist / 2.0, bid, rgb)
+                    add_points(15, [a] if mtype == 'perp' else [a, b], bid, rgb)
+                    lbl_pt = mid.copy()
+                    if mtype == 'perp':
+                        arrow_pts = {'pt': a.copy(), 'h': b.copy()}
+                        text = f"垂距: {dist:.2f}m"
+                    else:
+                        arrow_pts = {'p1': a.copy(), 'p2': b.copy()}
+                        text = f"两点距: {dist:.2f}m"
+                lbl_pt[2] += 0.3
+                label = f"{dist:.2f}m"
+                text_actor = self._make_label_actor(label, lbl_pt, self.style_text_color)
+                seg = {'actors': [text_actor], 'distance': dist, 'type': mtype, 'color': color,
+                       'label_info': {'pt': lbl_pt, 'text': label},
+                       'label_actor': text_actor,
+                       'text_color': self.style_text_color,
+                       'arrow_pts': arrow_pts}
+            else:
+                continue
+            seg['_batch_id'] = bid
+            restored.append((seg, text))
+
+        if cyl['p0']:
+            points, tris, n_per = cylinders(np.concatenate(cyl['p0']), np.concatenate(cyl['p1']), self.style_tube_radius)
+            owner = np.repeat(np.concatenate(cyl['owner']), n_per)
+            self._overlay.add_solid(owner, points, tris, np.repeat(np.concatenate(cyl['rgb']), n_per, axis=0))
+        if arr['start']:
+            points, tris, n_per = arrows(np.array(arr['start']), np.array(arr['dir']), np.array(arr['len']),
+                                         TARGET_SHAFT_RAD, TARGET_TIP_RAD, TARGET_TIP_LEN)
+            owner = np.repeat(np.array(arr['owner']), n_per)
+            self._overlay.add_solid(owner, points, tris, np.repeat(np.array(arr['rgb']), n_per, axis=0))
+        for size, (plist, owner, rgbs) in pts.items():
+            if plist:
+                self._overlay.add_points(size, np.array(owner), np.array(plist), np.array(rgbs))
+        self._overlay.commit()
+
+        for seg, text in restored:
+            self.segments.append(seg)
+            self.measurement_added.emit(text, seg)
+        return [seg for seg, _ in restored]
+
+    def _detach_from_batch(self, seg):
+        """把批量恢复的测量拆成独立 actor (线宽重建等逐条操作前调用)。"""
+        bid = seg.pop('_batch_id', None)
+        if bid is None:
+            return
+        self._overlay.remove(bid)
+        color = seg.get('color', self.style_color)
+        stype = seg.get('type', 'poly')
+        if stype == 'poly':
+            ends, size = seg.get('points', []), 20
+        elif stype == 'perp':
+            ends, size = [seg['arrow_pts']['pt']], 15
+        elif stype == 'direct':
+            ends, size = [seg['arrow_pts']['p2']], 15
+        else:
+            ends, size = [seg['arrow_pts']['p1'], seg['arrow_pts']['p2']], 15
+        point_actors = []
+        for p in ends:
+            a = self.plotter.add_mesh(pv.PolyData([p]), color=color, point_size=size,
+                                      render_points_as_spheres=True, lighting=False, reset_camera=False)
+            self._apply_style(a); point_actors.append(a)
+        seg['actors'] = point_actors + seg.get('actors', [])
+
     def on_press(self, obj, event): self.start_pos = self.plotter.interactor.GetEventPosition()
     def on_release(self, obj, event):
         if not self.start_pos: return
         ep = self.plotter.interactor.GetEventPosition()
         if ((ep[0]-self.start_pos[0])**2 + (ep[1]-self.start_pos[1])**2)**0.5 < 10: self.pick_measure_point(ep)
         self.start_pos = None
-    def on_pan_start(self, o, e): self.pan_start_pos = self.plotter.interactor.GetEventPosition()
-    def on_pan_move(self, o, e):
-        if not getattr(self, 'pan_start_pos', None): return
-        from tools.pan_utils import perform_pan
-        curr = self.plotter.interactor.GetEventPosition()
-        self.pan_start_pos = perform_pan(self.plotter, self.pan_start_pos, curr)
-    def on_pan_end(self, o, e): self.pan_start_pos = None
 
@@ -0,0 +1,260 @@
+import numpy as np
+import pyvista as pv
+
+
+def hex_to_rgb255(hex_str):
+    h = hex_str.lstrip('#')
+    return np.array([int(h[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.uint8)
+
+
+def _perp_frames(d):
+    """每个单位方向 d 的两个正交垂直向量 (u, v)。"""
+    helper = np.zeros_like(d)
+    use_x = np.abs(d[:, 0]) < 0.9
+    helper[use_x, 0] = 1.0
+    helper[~use_x, 1] = 1.0
+    u = np.cross(d, helper)
+    u /= np.linalg.norm(u, axis=1, keepdims=True)
+    v = np.cross(d, u)
+    return u, v
+
+
+def _ring_template(resolution):
+    theta = 2.0 * np.pi * np.arange(resolution) / resolution
+    return np.cos(theta), np.sin(theta)
+
+
+def _place(starts, d, x, ry, rz):
+    """把局部坐标 (x 沿轴, ry/rz 在截面) 批量变换到世界坐标，返回 (K*P, 3)。"""
+    u, v = _perp_frames(d)
+    pts = (starts[:, None, :] + x[:, :, None] * d[:, None, :]
+           + ry[None, :, None] * u[:, None, :] + rz[None, :, None] * v[:, None, :])
+    return pts.reshape(-1, 3).astype(np.float32)
+
+
+def _ring_quads(a, b, resolution):
+    """两圈顶点 (起始序号 a, b) 之间的侧面三角形。"""
+    i = np.arange(resolution)
+    j = (i + 1) % resolution
+    return np.concatenate((np.column_stack((a + i, a + j, b + j)), np.column_stack((a + i, b + j, b + i))))
+
+
+def _fan(center, ring, resolution, flip=False):
+    i = np.arange(resolution)
+    j = (i + 1) % resolution
+    c = np.full(resolution, center)
+    return np.column_stack((c, ring + j, ring + i) if not flip else (c, ring + i, ring + j))
+
+
+def cylinders(p0, p1, radius, resolution=16):
+    """一次生成 K 段圆柱 (带端盖)。返回 (points, tris, 每段点数)。"""
+    p0 = np.asarray(p0, dtype=np.float64).reshape(-1, 3)
+    p1 = np.asarray(p1, dtype=np.float64).reshape(-1, 3)
+    axis = p1 - p0
+    length = np.linalg.norm(axis, axis=1)
+    d = axis / np.maximum(length, 1e-12)[:, None]
+    c, s = _ring_template(resolution)
+    r = float(radius)
+    # 局部顶点: 底圈、顶圈、底心、顶心
+    ry = np.concatenate((r * c, r * c, [0.0, 0.0]))
+    rz = np.concatenate((r * s, r * s, [0.0, 0.0]))
+    x = np.concatenate((np.zeros(resolution), np.ones(resolution), [0.0, 1.0]))[None, :] * length[:, None]
+    n_per = 2 * resolution + 2
+    tris = np.concatenate((
+        _ring_quads(0, resolution, resolution),
+        _fan(2 * resolution, 0, resolution, flip=True),
+        _fan(2 * resolution + 1, resolution, resolution),
+    ))
+    return _place(p0, d, x, ry, rz), _tile_tris(tris, len(p0), n_per), n_per
+
+
+def arrows(starts, directions, lengths, shaft_radius, tip_radius, tip_length, resolution=16):
+    """一次生成 K 个箭头 (圆柱杆 + 圆锥头)，尺寸为世界单位。返回 (points, tris, 每个点数)。"""
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+    d = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    d = d / np.maximum(np.linalg.norm(d, axis=1), 1e-12)[:, None]
+    length = np.asarray(lengths, dtype=np.float64).reshape(-1)
+    tl = np.minimum(float(tip_length), length)
+    c, s = _ring_template(resolution)
+    rs, rt = float(shaft_radius), float(tip_radius)
+    # 局部顶点: 杆底圈、杆顶圈、锥底圈、锥尖、杆底心、锥底心
+    ry = np.concatenate((rs * c, rs * c, rt * c, [0.0, 0.0, 0.0]))
+    rz = np.concatenate((rs * s, rs * s, rt * s, [0.0, 0.0, 0.0]))
+    base = (length - tl)[:, None]
+    x = np.concatenate((
+        np.zeros((len(length), resolution)),
+        np.repeat(base, resolution, axis=1),
+        np.repeat(base, resolution, axis=1),
+        length[:, None],
+        np.zeros((len(length), 1)),
+        base,
+    ), axis=1)
+    n_per = 3 * resolution + 3
+    apex, base_c, tip_c = 3 * resolution, 3 * resolution + 1, 3 * resolution + 2
+    i = np.arange(resolution)
+    j = (i + 1) % resolution
+    cone = np.column_stack((2 * resolution + i, 2 * resolution + j, np.full(resolution, apex)))
+    tris = np.concatenate((
+        _ring_quads(0, resolution, resolution),
+        _fan(base_c, 0, resolution, flip=True),
+        _fan(tip_c, 2 * resolution, resolution, flip=True),
+        cone,
+    ))
+    return _place(starts, d, x, ry, rz), _tile_tris(tris, len(starts), n_per), n_per
+
+
+def _tile_tris(tris, count, n_per):
+    offsets = (np.arange(count, dtype=np.int64) * n_per)[:, None, None]
+    return (tris[None, :, :].astype(np.int64) + offsets).reshape(-1, 3)
+
+
+class _Layer:
+    """一个 actor 对应的合并几何；每个条目 (owner id) 占一组点，颜色逐点存储。"""
+
+    def __init__(self, plotter, point_size=None):
+        self.plotter = plotter
+        self.point_size = point_size
+        self.points = np.empty((0, 3), dtype=np.float32)
+        self.colors = np.empty((0, 3), dtype=np.uint8)
+        self.owner = np.empty(0, dtype=np.int64)
+        self.tris = np.empty((0, 3), dtype=np.int64)
+        self.mesh = None
+        self.actor = None
+
+    def append(self, owner, points, colors, tris=None):
+        offset = len(self.points)
+        self.points = np.concatenate((self.points, np.asarray(points, dtype=np.float32)))
+        self.colors = np.concatenate((self.colors, np.asarray(colors, dtype=np.uint8)))
+        self.owner = np.concatenate((self.owner, np.asarray(owner, dtype=np.int64)))
+        if tris is not None and len(tris):
+            self.tris = np.concatenate((self.tris, np.asarray(tris, dtype=np.int64) + offset))
+
+    def remove(self, item_id):
+        keep = self.owner != item_id
+        if keep.all():
+            return False
+        new_id = np.cumsum(keep) - 1
+        if len(self.tris):
+            tri_keep = keep[self.tris[:, 0]]
+            self.tris = new_id[self.tris[tri_keep]]
+        self.points = self.points[keep]
+        self.colors = self.colors[keep]
+        self.owner = self.owner[keep]
+        return True
+
+    def set_color(self, item_id, rgb):
+        sel = self.owner == item_id
+        if not sel.any():
+            return False
+        self.colors[sel] = rgb
+        return True
+
+    def sync(self, apply_style=None, visible=True):
+        """把数组推送到 VTK；几何变化时替换 mapper 输入，不重建 actor。"""
+        if len(self.points) == 0:
+            self.clear()
+            return
+        if self.point_size is None:
+            faces = np.column_stack((np.full(len(self.tris), 3, dtype=np.int64), self.tris)).ravel()
+            mesh = pv.PolyData(self.points, faces)
+        else:
+            mesh = pv.PolyData(self.points)
+        mesh.point_data['rgb'] = self.colors
+        self.mesh = mesh
+        if self.actor is None:
+            kwargs = dict(scalars='rgb', rgb=True, lighting=False, reset_camera=False)
+            if self.point_size is not None:
+                kwargs.update(point_size=self.point_size, render_points_as_spheres=True)
+            self.actor = self.plotter.add_mesh(mesh, **kwargs)
+            if apply_style is not None:
+                apply_style(self.actor)
+            self.actor.SetVisibility(visible)
+        else:
+            self.actor.GetMapper().SetInputData(mesh)
+
+    def push_colors(self):
+        if self.mesh is not None:
+            self.mesh.point_data['rgb'] = self.colors
+
+    def clear(self):
+        if self.actor is not None:
+            try:
+                self.plotter.renderer.RemoveActor(self.actor)
+            except Exception:
+                pass
+        self.actor = None
+        self.mesh = None
+
+
+class BatchOverlay:
+    """
+    批量标注几何：同一工具的所有管线/箭头合并进一个 actor，
+    同尺寸的点球合并进一个 actor。条目用整数 id 标识，
+    改色、显隐、删除只改数组，不增删 actor。
+    """
+
+    def __init__(self, plotter, apply_style=None):
+        self.plotter = plotter
+        self.apply_style = apply_style
+        self._layers = {}
+        self._next_id = 0
+        self._visible = True
+
+    def new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def _layer(self, point_size=None):
+        key = 'solid' if point_size is None else f'points{point_size}'
+        layer = self._layers.get(key)
+        if layer is None:
+            layer = self._layers[key] = _Layer(self.plotter, point_size)
+        return layer
+
+    def add_solid(self, owner, points, tris, colors):
+        self._layer().append(owner, points, colors, tris)
+
+    def add_points(self, point_size, owner, points, colors):
+        self._layer(point_size).append(owner, points, colors)
+
+    def commit(self):
+        for layer in self._layers.values():
+            layer.sync(self.apply_style, self._visible)
+
+    def remove(self, item_id):
+        for layer in self._layers.values():
+            if layer.remove(item_id):
+                layer.sync(self.apply_style, self._visible)
+
+    def set_color(self, item_id, rgb):
+        rgb = np.asarray(rgb, dtype=np.uint8)
+        for layer in self._layers.values():
+            if layer.set_color(item_id, rgb):
+                layer.push_colors()
+
+    def set_visible(self, visible):
+        self._visible = bool(visible)
+        for layer in self._layers.values():
+            if layer.actor is not None:
+                layer.actor.SetVisibility(self._visible)
+
+    def restyle(self):
+        if self.apply_style is None:
+            return
+        for layer in self._layers.values():
+            if layer.actor is not None:
+                self.apply_style(layer.actor)
+
+    def attach(self):
+        """plotter.clear() 之后把合并 actor 加回渲染器。"""
+        for layer in self._layers.values():
+            if layer.actor is not None:
+                try:
+                    self.plotter.renderer.AddActor(layer.actor)
+                except Exception:
+                    pass
+
+    def clear(self):
+        for layer in self._layers.values():
+            layer.clear()
+        self._layers = {}
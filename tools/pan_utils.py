@@ -1,9 +1,10 @@
 import numpy as np
 
-def perform_pan(plotter, start_pos, curr_pos):
+def perform_pan(plotter, start_pos, curr_pos, render=None):
     """
     执行精准平移：根据 VTK Display 坐标系和 focal depth 准确推算每个像素对应的世界坐标物理距离，
     解决高分辨率屏幕 (High DPI) 和透视投影下平移计算不准确、放大缩小后平移不跟手的问题。
+    render: 渲染回调 (通常是画布调度器的 request_render)，不传则直接 plotter.render()。
     """
     if not start_pos: return curr_pos
     
@@ -52,6 +53,9 @@ def perform_pan(plotter, start_pos, curr_pos):
     
     cam.SetPosition(pos + translation)
     cam.SetFocalPoint(foc + translation)
-    plotter.render()
+    if render is not None:
+        render()
+    else:
+        plotter.render()
     
     return curr_pos
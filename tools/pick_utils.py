@@ -0,0 +1,83 @@
+import numpy as np
+
+from core.spatial import frustum_planes
+
+
+def composite_matrix(plotter):
+    """相机 world->clip 复合矩阵 (numpy 4x4)。"""
+    ren = plotter.renderer
+    mat = plotter.camera.GetCompositeProjectionTransformMatrix(ren.GetTiledAspectRatio(), -1, 1)
+    np_mat = np.zeros((4, 4), dtype=np.float64)
+    for r in range(4):
+        for c in range(4):
+            np_mat[r, c] = mat.GetElement(r, c)
+    return np_mat
+
+
+def view_depth_row(plotter):
+    """world -> 视线深度 (世界单位，相机前方为正) 的行向量 (4,)，即视图矩阵第 3 行取反。"""
+    mat = plotter.camera.GetViewTransformMatrix()
+    return -np.array([mat.GetElement(2, c) for c in range(4)], dtype=np.float64)
+
+
+def _display_to_world(ren, x, y, z):
+    ren.SetDisplayPoint(float(x), float(y), float(z))
+    ren.DisplayToWorld()
+    w = ren.GetWorldPoint()
+    if w[3] == 0:
+        return None
+    return np.array(w[:3], dtype=np.float64) / w[3]
+
+
+def pick_point(plotter, data_manager, pos, tolerance=0.025):
+    """
+    用 DataManager 的空间索引拾取屏幕位置下的点云点，替代 vtkPointPicker 的全量扫描。
+    tolerance 与 vtkPicker 含义一致：占渲染窗口对角线的比例。
+    与 vtkPointPicker 相同，在容差范围内选取离拾取射线最近的点。
+    返回世界坐标 tuple，未命中返回 None。
+    """
+    mesh = data_manager.mesh
+    if mesh is None or mesh.n_points == 0:
+        return None
+    w, h = plotter.window_size
+    if w <= 0 or h <= 0:
+        return None
+    tol_px = max(1.0, float(tolerance) * float(np.hypot(w, h)))
+    x, y = float(pos[0]), float(pos[1])
+    planes = frustum_planes(composite_matrix(plotter), x - tol_px, y - tol_px, x + tol_px, y + tol_px, w, h)
+    idx = data_manager.query_frustum(planes)
+    if len(idx) == 0:
+        return None
+
+    ren = plotter.renderer
+    p0 = _display_to_world(ren, x, y, 0.0)
+    p1 = _display_to_world(ren, x, y, 1.0)
+    pts = np.asarray(mesh.points[idx], dtype=np.float64)
+    if p0 is None or p1 is None:
+        return tuple(pts[0])
+    ray = p1 - p0
+    ray_len2 = float(ray @ ray)
+    if ray_len2 < 1e-18:
+        return tuple(pts[0])
+    rel = pts - p0
+    t = (rel @ ray) / ray_len2
+    perp = rel - np.outer(t, ray)
+    dist2 = np.einsum("ij,ij->i", perp, perp)
+    return tuple(pts[int(np.argmin(dist2))])
+
+
+def ground_point(plotter, pos, z):
+    """屏幕位置的视线与水平面 Z=z 的交点 (世界坐标)；视线与平面平行或交点在相机后方时返回 None。"""
+    ren = plotter.renderer
+    p0 = _display_to_world(ren, pos[0], pos[1], 0.0)
+    p1 = _display_to_world(ren, pos[0], pos[1], 1.0)
+    if p0 is None or p1 is None:
+        return None
+    ray = p1 - p0
+    if abs(ray[2]) < 1e-9 * max(float(np.linalg.norm(ray)), 1e-300):
+        return None
+    hit = p0 + (float(z) - p0[2]) / ray[2] * ray
+    # 近裁剪面贴着数据，交点可能在近裁剪面之前；只要在相机前方即可
+    if float((hit - np.asarray(plotter.camera.GetPosition(), dtype=np.float64)) @ ray) <= 0.0:
+        return None
+    return hit
@@ -0,0 +1,124 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# 屏幕投影内核：点按缓存大小的块分给线程池 (numpy 运算期间释放 GIL)，
+# 每块只用一份 (k,3) 取点缓冲和一份 (k,4) 齐次坐标缓冲，结果直接写进预分配的输出。
+# 套索/框选/删除测量等屏幕空间选择共用。
+CHUNK_POINTS = 1 << 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="project")
+    return _pool
+
+
+def _chunks(n, chunk):
+    return [(s, min(n, s + chunk)) for s in range(0, n, chunk)]
+
+
+def _run(fn, spans):
+    """多于一块时并行执行，返回按块顺序排列的结果。"""
+    if len(spans) <= 1:
+        return [fn(s, e) for s, e in spans]
+    return list(_executor().map(lambda se: fn(*se), spans))
+
+
+def _project_chunk(points, rows, s, e, m, width, height, out_x, out_y, out_z=None, depth_row=None):
+    """投影第 s:e 行，写入 out_*[:e-s]。m 为 float32 的 world->clip 矩阵，
+    depth_row 为 (4,) 的深度行向量 (out_z = depth_row[:3]·p + depth_row[3])。"""
+    sel = rows[s:e] if rows is not None else slice(s, e)
+    pts = np.asarray(points[sel], dtype=np.float32)
+    clip = pts @ m[:, :3].T
+    clip += m[:, 3]
+    cw = np.maximum(clip[:, 3], np.float32(1e-8), out=clip[:, 3])
+    np.divide(clip[:, 0], cw, out=out_x)
+    out_x += 1.0
+    out_x *= np.float32(0.5 * width)
+    np.divide(clip[:, 1], cw, out=out_y)
+    out_y += 1.0
+    out_y *= np.float32(0.5 * height)
+    if out_z is not None:
+        np.dot(pts, depth_row[:3], out=out_z)
+        out_z += depth_row[3]
+
+
+def project_points(points, matrix, width, height, rows=None, depth_row=None, chunk=CHUNK_POINTS):
+    """
+    把 points[rows] (rows 为 None 时全部) 投影到屏幕像素坐标 (原点左下)。
+    返回 (scr_x, scr_y)；给出 depth_row 时返回 (scr_x, scr_y, depth)，float32，输出一次性预分配。
+    """
+    n = len(rows) if rows is not None else len(points)
+    m = np.asarray(matrix, dtype=np.float32)
+    out_x = np.empty(n, dtype=np.float32)
+    out_y = np.empty(n, dtype=np.float32)
+    d = None if depth_row is None else np.asarray(depth_row, dtype=np.float32)
+    out_z = np.empty(n, dtype=np.float32) if d is not None else None
+
+    def work(s, e):
+        _project_chunk(points, rows, s, e, m, width, height, out_x[s:e], out_y[s:e],
+                       out_z[s:e] if out_z is not None else None, d)
+
+    _run(work, _chunks(n, chunk))
+    return (out_x, out_y, out_z) if d is not None else (out_x, out_y)
+
+
+def select_projected(points, rows, matrix, width, height, test, chunk=CHUNK_POINTS):
+    """
+    逐块投影 points[rows]，test(scr_x, scr_y) 返回布尔掩码，直接返回通过的 rows。
+    每个线程只持有一块的坐标缓冲，峰值临时内存与总点数无关。
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    m = np.asarray(matrix, dtype=np.float32)
+
+    def work(s, e):
+        k = e - s
+        sx = np.empty(k, dtype=np.float32)
+        sy = np.empty(k, dtype=np.float32)
+        _project_chunk(points, rows, s, e, m, width, height, sx, sy)
+        return rows[s:e][test(sx, sy)]
+
+    parts = _run(work, _chunks(len(rows), chunk))
+    if not parts:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(parts)
+
+
+def visible_mask(points, rows, matrix, depth_row, width, height, tolerance, cell_px=3):
+    """
+    仅可见面：把 points[rows] 投影到 cell_px 像素一格的粗网格，np.minimum.at 得到每格最近深度
+    (CPU z-min 缓冲)，再做 3x3 最小值膨胀堵住前景点之间的空隙，防止背面的点从缝里漏选。
+    深度不超过 前表面 + tolerance (世界单位) 的点视为可见，返回与 rows 等长的布尔掩码。
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        return np.zeros(0, dtype=bool)
+    sx, sy, z = project_points(points, matrix, width, height, rows=rows, depth_row=depth_row)
+    gw = int(width) // cell_px + 1
+    gh = int(height) // cell_px + 1
+    inv = np.float32(1.0 / cell_px)
+    gx = np.clip((sx * inv).astype(np.int32), 0, gw - 1)
+    gy = np.clip((sy * inv).astype(np.int32), 0, gh - 1)
+    flat = gy * np.int32(gw)
+    flat += gx
+    del sx, sy, gx, gy
+
+    zbuf = np.full((gh + 2) * (gw + 2), np.inf, dtype=np.float32)
+    # 带一圈 inf 边框，膨胀时直接切片
+    np.minimum.at(zbuf, flat + (flat // gw) * 2 + (gw + 3), z)
+    zbuf = zbuf.reshape(gh + 2, gw + 2)
+    front = zbuf[1:-1, 1:-1].copy()
+    for oy in (-1, 0, 1):
+        for ox in (-1, 0, 1):
+            if oy or ox:
+                np.minimum(front, zbuf[1 + oy:gh + 1 + oy, 1 + ox:gw + 1 + ox], out=front)
+    front += np.float32(tolerance)
+    return z <= front.ravel()[flat]
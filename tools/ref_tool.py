@@ -3,6 +3,7 @@ import numpy as np
 import pyvista as pv
 from PySide6.QtCore import QObject, Signal, Qt
 from .base import BaseTool
+from .pick_utils import pick_point
 
 class ReferenceTool(BaseTool, QObject):
     # 淇″彿锛氱被鍨?'line'/'point'), ID, 鏁版嵁1(p1/pt), 鏁版嵁2(p2/None)
@@ -41,7 +42,7 @@ class ReferenceTool(BaseTool, QObject):
             # 濡傛灉褰撳墠鏄墦鐐规ā寮忥紝鍒囨崲鍏夋爣鏍峰紡
             if self.plotter.interactor.GetInteractorStyle().IsA("vtkInteractorStyleTrackballCamera"):
                  self._update_cursor_for_draw()
-            self.plotter.render()
+            self.request_render()
 
     def activate(self):
         if not self.plotter: return
@@ -100,7 +101,7 @@ class ReferenceTool(BaseTool, QObject):
             
         # 鎭㈠鐩告満
         camera.SetPosition(pos); camera.SetFocalPoint(focal); camera.SetViewUp(view_up)
-        self.plotter.render()
+        self.request_render()
 
     def _update_cursor_for_draw(self):
         if self.mode == 'line': 
@@ -110,9 +111,7 @@ class ReferenceTool(BaseTool, QObject):
 
     def on_click(self, obj, event):
         pos = self.plotter.interactor.GetEventPosition()
-        picker = vtk.vtkPointPicker()
-        picker.Pick(pos[0], pos[1], 0, self.plotter.renderer)
-        pt = picker.GetPickPosition() if picker.GetPointId() != -1 else None
+        pt = pick_point(self.plotter, self.data_manager, pos)
         
         if not pt:
              # Fallback
@@ -272,7 +271,7 @@ class ReferenceTool(BaseTool, QObject):
                     pass
                 
         if render:
-            self.plotter.render()
+            self.request_render()
 
     def redraw_all(self):
         """Re-add all reference actors to the renderer after a plotter.clear()"""
@@ -335,7 +334,7 @@ class ReferenceTool(BaseTool, QObject):
                 new_refs.append(ref)
                 
         self.refs = new_refs
-        self.plotter.render()
+        self.request_render()
 
     def highlight_segment(self, target_data, color="#FF00FF"):
         for ref in self.refs:
@@ -355,7 +354,7 @@ class ReferenceTool(BaseTool, QObject):
                         actor.GetProperty().SetColor(*rgb_color)
                 except Exception:
                     pass
-        self.plotter.render()
+        self.request_render()
 
     def delete_by_data(self, data_from_ui, render=True):
         idx = data_from_ui.get('idx')
@@ -372,14 +371,13 @@ class ReferenceTool(BaseTool, QObject):
                 for a in target['actors']: self.plotter.remove_actor(a)
             self.refs = [r for r in self.refs if r is not target]
             if render:
-                self.plotter.render()
+                self.request_render()
 
     def clear_all(self, render=True):
         while self.refs:
             self.delete_by_data({'idx': self.refs[0]['idx'], 'subtype': self.refs[0]['type']}, render=False)
         if render:
-            self.plotter.render()
-    def on_pan_start(self, obj, event): self.pan_start_pos = self.plotter.interactor.GetEventPosition()
+            self.request_render()
 
     def set_visible(self, visible):
         vis = bool(visible)
@@ -390,10 +388,4 @@ class ReferenceTool(BaseTool, QObject):
                 for a in ref['actors']:
                     a.SetVisibility(vis)
 
-    def on_pan_move(self, obj, event):
-        if not getattr(self, 'pan_start_pos', None): return
-        from tools.pan_utils import perform_pan
-        curr = self.plotter.interactor.GetEventPosition()
-        self.pan_start_pos = perform_pan(self.plotter, self.pan_start_pos, curr)
-    def on_pan_end(self, obj, event): self.pan_start_pos = None
 
@@ -0,0 +1,173 @@
+import time
+
+import numpy as np
+from PySide6.QtCore import QThread, Signal
+
+# 点击选物体：从拾取点出发，在体素邻接图上向外生长 (体素边长 = 间距阈值，26 邻域)，
+# 每一轮把整层前沿一次性向量化扩展，不逐点查询。
+# 贴地的点 (高于局部地面不足 clearance) 不参与生长，车辆/杂物与地面自然断开；
+# 可选按相邻体素法向夹角截断 (曲面折角处停止)。
+
+_OFFSETS = np.array([(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)
+                     if i or j or k], dtype=np.int64)
+
+
+def _voxel_normals(pts, inverse, n_vox):
+    """每个体素点的 PCA 法向 (单位向量)；点数不足 3 的体素为 0 向量。"""
+    cnt = np.bincount(inverse, minlength=n_vox).astype(np.float64)
+    mean = np.column_stack([np.bincount(inverse, pts[:, a], n_vox) for a in range(3)]) / np.maximum(cnt, 1)[:, None]
+    cov = np.empty((n_vox, 3, 3))
+    for a in range(3):
+        for b in range(a, 3):
+            v = np.bincount(inverse, pts[:, a] * pts[:, b], n_vox) / np.maximum(cnt, 1) - mean[:, a] * mean[:, b]
+            cov[:, a, b] = v
+            cov[:, b, a] = v
+    _, vecs = np.linalg.eigh(cov)
+    normals = vecs[:, :, 0]
+    normals[cnt < 3] = 0.0
+    return normals
+
+
+def grow_region(points, rows, seed_row, gap, clearance=0.15, ground_cell=1.0, max_normal_angle=0.0,
+                report=None, cancelled=None):
+    """
+    在候选点 points[rows] 中从 seed_row 生长。返回 (选中行号, 是否碰到候选区域的 XY 边界)。
+    report(rows) 约每 100ms 回调一次当前结果；cancelled() 为真时提前返回 (None, False)。
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    pts = np.asarray(points[rows], dtype=np.float64)
+    seed_local = np.flatnonzero(rows == seed_row)
+    if len(seed_local) == 0:
+        return np.empty(0, dtype=np.int64), False
+    seed_local = int(seed_local[0])
+    lo = pts.min(axis=0)
+
+    # 局部地面：XY 网格内的最低点；点在地面上方不足 clearance 的不参与 (种子本身贴地时则整片地面可选)
+    eligible = np.ones(len(pts), dtype=bool)
+    if clearance > 0:
+        col = ((pts[:, :2] - lo[:2]) / ground_cell).astype(np.int64)
+        col_key = col[:, 0] * (int(col[:, 1].max()) + 1) + col[:, 1]
+        ground = np.full(int(col_key.max()) + 1, np.inf)
+        np.minimum.at(ground, col_key, pts[:, 2])
+        eligible = pts[:, 2] - ground[col_key] >= clearance
+        if not eligible[seed_local]:
+            eligible[:] = True
+    cand = np.flatnonzero(eligible)
+    p = pts[cand]
+
+    # 体素化 (外扩一格，邻居键不会越界回绕)
+    ijk = ((p - lo) / gap).astype(np.int64) + 1
+    dims = ijk.max(axis=0) + 2
+    keys = (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2]
+    vox_keys, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    n_vox = len(vox_keys)
+    offsets = (_OFFSETS[:, 0] * dims[1] + _OFFSETS[:, 1]) * dims[2] + _OFFSETS[:, 2]
+
+    normals = None
+    cos_limit = 0.0
+    if max_normal_angle > 0:
+        normals = _voxel_normals(p - lo, inverse, n_vox)
+        cos_limit = float(np.cos(np.deg2rad(max_normal_angle)))
+
+    visited = np.zeros(n_vox, dtype=bool)
+    seed_vox = inverse[np.searchsorted(cand, seed_local)]
+    visited[seed_vox] = True
+    frontier = np.array([seed_vox], dtype=np.int64)
+    last_report = time.perf_counter()
+
+    def current_rows():
+        return rows[cand[visited[inverse]]]
+
+    while len(frontier):
+        if cancelled is not None and cancelled():
+            return None, False
+        nk = (vox_keys[frontier][:, None] + offsets[None, :]).ravel()
+        src = np.repeat(frontier, len(offsets))
+        pos = np.searchsorted(vox_keys, nk)
+        pos[pos >= n_vox] = 0
+        hit = vox_keys[pos] == nk
+        nb, src = pos[hit], src[hit]
+        fresh = ~visited[nb]
+        nb, src = nb[fresh], src[fresh]
+        if normals is not None and len(nb):
+            na, nn = normals[src], normals[nb]
+            dot = np.abs(np.einsum("ij,ij->i", na, nn))
+            undefined = ~na.any(axis=1) | ~nn.any(axis=1)
+            nb = nb[undefined | (dot >= cos_limit)]
+        frontier = np.unique(nb)
+        visited[frontier] = True
+        if report is not None and time.perf_counter() - last_report > 0.1:
+            report(current_rows())
+            last_report = time.perf_counter()
+
+    grown = current_rows()
+    # 生长区域碰到候选范围的 XY 边界 (一格以内)，说明物体可能更大
+    g = pts[cand[visited[inverse]]]
+    touches = bool(np.any(g[:, :2].min(axis=0) - lo[:2] < gap) or
+                   np.any(pts[:, :2].max(axis=0) - g[:, :2].max(axis=0) < gap))
+    return grown, touches
+
+
+class RegionGrowWorker(QThread):
+    """
+    后台生长：候选点取种子周围 XY 方形范围 (全高)，生长碰到边界就把范围加倍重来，
+    直到不再碰边界或达到 max_radius。progress 发出中间结果用于逐步高亮。
+    """
+    progress = Signal(object)   # 当前行号
+    grown = Signal(object)      # 最终行号
+
+    def __init__(self, data_manager, seed_row, gap=0.15, clearance=0.15, max_normal_angle=0.0,
+                 radius=5.0, max_radius=200.0):
+        super().__init__()
+        self.data_manager = data_manager
+        self.mesh = data_manager.mesh
+        self.generation = data_manager.mesh_generation
+        self.seed_row = int(seed_row)
+        self.gap = float(gap)
+        self.clearance = float(clearance)
+        self.max_normal_angle = float(max_normal_angle)
+        self.radius = float(radius)
+        self.max_radius = float(max_radius)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            self._grow()
+        except Exception as e:
+            print(f"[GROW] failed: {e}", flush=True)
+
+    def _grow(self):
+        t0 = time.perf_counter()
+        points = self.mesh.points
+        seed = np.asarray(points[self.seed_row], dtype=np.float64)
+        _, _, _, _, z0, z1 = self.mesh.bounds
+        ground_cell = max(1.0, self.gap * 5.0)
+        r = max(self.radius, self.gap * 4.0)
+        grown = np.empty(0, dtype=np.int64)
+        rounds = 0
+        n_cand = 0
+        while True:
+            rounds += 1
+            if self.data_manager.mesh_generation != self.generation:
+                return  # 生长期间 mesh 被替换，结果已无意义
+            rows = self.data_manager.query_box((seed[0] - r, seed[1] - r, z0 - 1.0), (seed[0] + r, seed[1] + r, z1 + 1.0))
+            n_cand = len(rows)
+            grown, touches = grow_region(points, rows, self.seed_row, self.gap, self.clearance, ground_cell,
+                                         self.max_normal_angle, report=self.progress.emit,
+                                         cancelled=lambda: self._cancelled)
+            if grown is None:
+                return
+            if not touches or r >= self.max_radius:
+                break
+            self.progress.emit(grown)
+            r = min(r * 2.0, self.max_radius)
+        print(
+            f"[TIME][GROW] total={1000 * (time.perf_counter() - t0):.1f}ms, rounds={rounds}, "
+            f"radius={r:.1f}, candidates={n_cand}, grown={len(grown)}",
+            flush=True,
+        )
+        self.grown.emit(grown)
@@ -0,0 +1,92 @@
+import numpy as np
+
+# 每个字节值的置位数，用于按字节统计选中点数
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+COMBINE_MODES = ("replace", "union", "subtract", "intersect")
+
+
+class SelectionSet:
+    """
+    当前 mesh 上的选区，按位压缩存储 (每点 1 bit，点序与 mesh 行号一致)。
+    新的套索结果与已有选区做 替换/并/差/交，反选是按位取反，集合运算只扫 N/8 字节。
+    mesh 被替换 (删除/撤回/加载) 后行号失效，bind() 根据 generation 自动清空。
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.generation = None
+        self.bits = np.zeros(0, dtype=np.uint8)
+        self._rows = None
+
+    def bind(self, n, generation):
+        """绑定到 n 个点、代号为 generation 的 mesh；与当前不同时清空。"""
+        n = int(n)
+        if n != self.n or generation != self.generation:
+            self.n = n
+            self.generation = generation
+            self.bits = np.zeros((n + 7) // 8, dtype=np.uint8)
+            self._rows = None
+
+    def clear(self):
+        self.bits[:] = 0
+        self._rows = None
+
+    def _pack(self, rows):
+        """行号 -> 位图；只按行号散写，不分配 N 字节的布尔掩码。"""
+        bits = np.zeros_like(self.bits)
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        if len(rows):
+            np.bitwise_or.at(bits, rows >> 3, (0x80 >> (rows & 7)).astype(np.uint8))
+        return bits
+
+    def combine(self, rows, mode="replace"):
+        """把一次选择的行号按 mode 合并进选区。"""
+        other = self._pack(rows)
+        if mode == "union":
+            np.bitwise_or(self.bits, other, out=self.bits)
+        elif mode == "subtract":
+            np.bitwise_and(self.bits, np.invert(other, out=other), out=self.bits)
+        elif mode == "intersect":
+            np.bitwise_and(self.bits, other, out=self.bits)
+        else:
+            self.bits = other
+        self._rows = None
+
+    def add(self, rows):
+        """把 rows 并入选区；只改写命中行所在的字节 (笔刷每帧用，代价与命中数成正比)。"""
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        if len(rows):
+            np.bitwise_or.at(self.bits, rows >> 3, (0x80 >> (rows & 7)).astype(np.uint8))
+            self._rows = None
+
+    def discard(self, rows):
+        """从选区去掉 rows；同 add 只改写命中字节。"""
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        if len(rows):
+            np.bitwise_and.at(self.bits, rows >> 3, np.invert((0x80 >> (rows & 7)).astype(np.uint8)))
+            self._rows = None
+
+    def snapshot(self):
+        return self.bits.copy()
+
+    def restore(self, bits):
+        self.bits = bits.copy()
+        self._rows = None
+
+    def invert(self):
+        np.invert(self.bits, out=self.bits)
+        tail = self.n & 7
+        if tail:
+            # 最后一个字节里超出 n 的填充位保持为 0
+            self.bits[-1] &= np.uint8((0xFF << (8 - tail)) & 0xFF)
+        self._rows = None
+
+    def count(self):
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def rows(self):
+        """选中点的行号 (升序，int64)；结果缓存到下一次修改。"""
+        if self._rows is None:
+            self._rows = np.flatnonzero(np.unpackbits(self.bits, count=self.n)).astype(np.int64)
+        return self._rows
@@ -1,15 +1,16 @@
+import time
 import vtk
 import numpy as np
 import pyvista as pv
-import time
 from PySide6.QtCore import Signal, QObject
 from .base import BaseTool
-
-try:
-    from matplotlib.path import Path
-    HAS_MATPLOTLIB = True
-except ImportError:
-    HAS_MATPLOTLIB = False
+from .interaction import MoveCoalescer
+from .lasso import LassoMask
+from .projection import select_projected, visible_mask
+from .selection_set import SelectionSet, COMBINE_MODES
+from .pick_utils import composite_matrix, view_depth_row, pick_point, ground_point
+from .region_grow import RegionGrowWorker
+from core.spatial import box_planes, frustum_planes, oriented_box
 
 class SelectTool(BaseTool, QObject):
     request_delete_measurements = Signal(list)
@@ -22,19 +23,62 @@ class SelectTool(BaseTool, QObject):
         self.lasso_visual_points = [] 
         self.is_active = False
         self.selection_actor = None
-        self.selected_indices = []
+        # 选区按位存储；每次套索按 combine_mode 合并 (Shift 加选、Ctrl 减选、Shift+Ctrl 交集)
+        self.selection = SelectionSet()
+        self.combine_mode = 'replace'
+        self._stroke_mode = 'replace'
+        # 选择形状：lasso 套索 / box 框选 (拖出的矩形投到地面，取世界轴对齐的整列盒) / brush 屏幕笔刷 / grow 点选物体
+        self.select_shape = 'lasso'
+        self.brush_radius_px = 40.0
+        self._box_start = None
+        self._brush_last = None
+        self._brush_hits = []
+        self._shape_moves = MoveCoalescer(self._shape_to, name="shape")
+        # 点选物体 (区域生长)：间距阈值、离地高度、相邻体素法向夹角 (0 为不限制)
+        self.grow_gap = 0.15
+        self.grow_clearance = 0.15
+        self.grow_normal_angle = 0.0
+        self._grow_worker = None
+        self._grow_workers = []
+        self._grow_base = None
+        self._grow_mode = 'replace'
+        self._grow_generation = None
         self.interaction_mode = 'view' 
         self.pan_start_pos = None
         self.last_screen_pos = None
-        self._last_trace_render_t = 0.0
-        self._trace_render_interval_s = 1.0 / 30.0
+        self._visual_upto = 0
+        self._trace_moves = MoveCoalescer(self._trace_to, name="lasso")
         self._min_move_px = 4.0
         self._max_highlight_points = 200000
+        # 仅可见面：只选前表面 occlusion_tolerance (世界单位) 以内的点，不穿透选到背后的点
+        self.visible_only = False
+        self.occlusion_tolerance = 0.05
+
+    @property
+    def selected_indices(self):
+        """选中点的行号 (由位图展开，修改前缓存)。"""
+        self._bind_selection()
+        return self.selection.rows()
+
+    @selected_indices.setter
+    def selected_indices(self, rows):
+        self._bind_selection()
+        self.selection.combine(rows, 'replace')
+
+    def _bind_selection(self):
+        mesh = self.data_manager.mesh
+        self.selection.bind(mesh.n_points if mesh is not None else 0, self.data_manager.mesh_generation)
+
+    def set_combine_mode(self, mode):
+        self.combine_mode = mode if mode in COMBINE_MODES else 'replace'
+
+    def set_select_shape(self, shape):
+        self.select_shape = shape if shape in ('lasso', 'box', 'brush', 'grow') else 'lasso'
+        self._clear_trace()
 
     def activate(self):
-        if not HAS_MATPLOTLIB: return
         self.is_active = True
-        self.plotter.render()
+        self.request_render()
         self.set_interaction_mode('view')
 
 
@@ -50,6 +94,7 @@ class SelectTool(BaseTool, QObject):
         """退出时清理资源"""
         if not self.plotter: return
         try:
+            self._cancel_grow(wait=True)
             self._clear_trace()
             self._clear_selection_visuals()
         except: pass
@@ -87,25 +132,37 @@ class SelectTool(BaseTool, QObject):
             self.observers.append(iren.AddObserver("LeftButtonReleaseEvent", self.on_end))
 
         camera.SetPosition(pos); camera.SetFocalPoint(focal); camera.SetViewUp(view_up)
-        self.plotter.render()
-
-    def on_pan_start(self, obj, event): self.pan_start_pos = self.plotter.interactor.GetEventPosition()
-    def on_pan_move(self, obj, event):
-        if not getattr(self, 'pan_start_pos', None): return
-        from tools.pan_utils import perform_pan
-        curr = self.plotter.interactor.GetEventPosition()
-        self.pan_start_pos = perform_pan(self.plotter, self.pan_start_pos, curr)
-    def on_pan_end(self, obj, event): self.pan_start_pos = None
+        self.request_render()
 
     def on_start(self, obj, event):
         pos = self.plotter.interactor.GetEventPosition()
         self.lasso_points = [pos]
         self.lasso_visual_points = []
         self.last_screen_pos = pos
-        self._last_trace_render_t = 0.0
-        self._clear_selection_visuals()
+        shift, ctrl = bool(obj.GetShiftKey()), bool(obj.GetControlKey())
+        if shift and ctrl:
+            self._stroke_mode = 'intersect'
+        elif shift:
+            self._stroke_mode = 'union'
+        elif ctrl:
+            self._stroke_mode = 'subtract'
+        else:
+            self._stroke_mode = self.combine_mode
+        if self.select_shape == 'grow':
+            self._start_grow(pos)
+            return
+        if self._stroke_mode == 'replace':
+            self.clear_selection()
         self.is_drawing = True
+        if self.select_shape == 'brush':
+            self._brush_last = None
+            self._brush_hits = []
+            self._shape_moves.push(pos)
+            return
+        if self.select_shape == 'box':
+            self._box_start = pos
         self._add_visual_point_safe(pos)
+        self._visual_upto = 1
         self._update_trace_actor()
 
     def on_move(self, obj, event):
@@ -115,17 +172,233 @@ class SelectTool(BaseTool, QObject):
             dist = np.linalg.norm(np.array(curr) - np.array(self.last_screen_pos))
             if dist < self._min_move_px:
                 return
+        if self.select_shape != 'lasso':
+            self.last_screen_pos = curr
+            self._shape_moves.push(curr)
+            return
+        # 记录屏幕点很便宜，每个事件都记；换算世界坐标和刷新轨迹线按帧合并
         self.lasso_points.append(curr)
-        self._add_visual_point_safe(curr)
         self.last_screen_pos = curr
+        self._trace_moves.push(curr)
+
+    def _trace_to(self, pos):
+        for p in self.lasso_points[self._visual_upto:]:
+            self._add_visual_point_safe(p)
+        self._visual_upto = len(self.lasso_points)
         self._update_trace_actor()
 
     def on_end(self, obj, event):
+        if self.select_shape == 'grow':
+            return
+        if self.select_shape != 'lasso':
+            self._shape_moves.finish()
+            end = self.last_screen_pos
+            self.is_drawing = False
+            self.last_screen_pos = None
+            if self.select_shape == 'box' and self._box_start is not None and end is not None:
+                self._select_ground_box(self._box_start, end)
+            elif self.select_shape == 'brush' and self._stroke_mode == 'intersect':
+                hits = np.concatenate(self._brush_hits) if self._brush_hits else np.empty(0, dtype=np.int64)
+                self._apply_hits(hits)
+            self._box_start = None
+            self._brush_hits = []
+            self._clear_trace()
+            return
+        self._trace_moves.finish()
         self.is_drawing = False
         self.last_screen_pos = None
         if len(self.lasso_points) > 2: self.calculate_selection()
         self._clear_trace()
 
+    def _shape_to(self, pos):
+        if not self.is_drawing:
+            return
+        if self.select_shape == 'brush':
+            self._brush_to(pos)
+        elif self.select_shape == 'box' and self._box_start is not None:
+            # 轨迹线画成拖出的矩形
+            (x0, y0), (x1, y1) = self._box_start, pos
+            self.lasso_visual_points = []
+            for p in ((x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)):
+                self._add_visual_point_safe(p)
+            self._update_trace_actor()
+
+    # --- 框选 / 高度区间 / 笔刷 (都先走空间索引，只处理候选点) ---
+    def select_box(self, lo, hi, mode=None):
+        """选中世界坐标轴对齐盒 [lo, hi] 内的点；仅可见面模式下只取窗口内、未被遮挡的点。"""
+        if not self.data_manager.mesh: return
+        t0 = time.perf_counter()
+        planes = box_planes(lo, hi)
+        if self.visible_only:
+            # 窗口外的点谈不上可见，先与整个视锥求交再做遮挡判断
+            w, h = self.plotter.window_size
+            np_mat = composite_matrix(self.plotter)
+            planes = np.vstack((planes, frustum_planes(np_mat, 0, 0, w, h, w, h)))
+        hits = self.data_manager.query_frustum(planes)
+        print(f"[TIME][SELECT] box={1000 * (time.perf_counter() - t0):.1f}ms, hits={len(hits)}", flush=True)
+        if self.visible_only:
+            hits = self._visible_filter(hits, np_mat, w, h)
+        self._apply_hits(hits, mode)
+
+    def select_slab(self, z_lo, z_hi, mode=None):
+        """选中高度在 [z_lo, z_hi] 之间的点 (地面校准后 Z=0 为地面)，如 3 米以上的树和电线。"""
+        mesh = self.data_manager.mesh
+        if not mesh or mesh.n_points == 0: return
+        x0, x1, y0, y1, _, _ = mesh.bounds
+        lo, hi = sorted((float(z_lo), float(z_hi)))
+        self.select_box((x0 - 1.0, y0 - 1.0, lo), (x1 + 1.0, y1 + 1.0, hi),
+                        mode if mode is not None else self.combine_mode)
+
+    def _select_ground_box(self, p0, p1):
+        """
+        框选：拖出的矩形四角投到过相机焦点的水平面上，取 XY 范围、Z 取点云整个高度，作为世界轴对齐盒交给 select_box
+        (与高度区间用交集合并即得任意轴对齐盒)。侧视时矩形投不到水平面，退回按矩形视锥选择。
+        """
+        mesh = self.data_manager.mesh
+        if not mesh or mesh.n_points == 0: return
+        z = float(self.plotter.camera.GetFocalPoint()[2])
+        (x0, y0), (x1, y1) = p0, p1
+        corners = [ground_point(self.plotter, c, z) for c in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+        if any(c is None for c in corners):
+            self._select_screen_box(p0, p1)
+            return
+        xy = np.array(corners)[:, :2]
+        _, _, _, _, z0, z1 = mesh.bounds
+        self.select_box((*xy.min(axis=0), z0 - 1.0), (*xy.max(axis=0), z1 + 1.0))
+
+    def _select_screen_box(self, p0, p1):
+        """屏幕上拖出的矩形：矩形视锥的侧面直接交给空间索引 (逐点按平面判定，结果即精确的框内点)。"""
+        mesh = self.data_manager.mesh
+        if not mesh or mesh.n_points == 0: return
+        w, h = self.plotter.window_size
+        np_mat = composite_matrix(self.plotter)
+        t0 = time.perf_counter()
+        planes = frustum_planes(np_mat, min(p0[0], p1[0]), min(p0[1], p1[1]),
+                                max(p0[0], p1[0]), max(p0[1], p1[1]), w, h)
+        hits = self.data_manager.query_frustum(planes)
+        print(f"[TIME][SELECT] screen_box={1000 * (time.perf_counter() - t0):.1f}ms, hits={len(hits)}", flush=True)
+        self._apply_hits(self._visible_filter(hits, np_mat, w, h))
+
+    def _brush_to(self, pos):
+        prev = self._brush_last if self._brush_last is not None else pos
+        self._brush_last = pos
+        hits = self._brush_hits_between(prev, pos)
+        if self._stroke_mode == 'intersect':
+            # 交集要等整笔画完再求
+            self._brush_hits.append(hits)
+            return
+        # 每帧只改写命中行：位图按命中字节合并，掩码只写命中行，不展开整个选区
+        self._bind_selection()
+        selected = self._stroke_mode != 'subtract'
+        if selected:
+            self.selection.add(hits)
+        else:
+            self.selection.discard(hits)
+        mark = getattr(self.canvas, 'mark_selection', None)
+        if mark is not None and mark(hits, selected):
+            self._remove_highlight_actor()
+            self.request_render()
+        else:
+            self._highlight_selection()
+
+    def _brush_hits_between(self, p0, p1):
+        """笔刷从 p0 扫到 p1 覆盖的点：到线段的屏幕距离不超过半径 (合并掉的移动事件不会留下空隙)。"""
+        mesh = self.data_manager.mesh
+        if not mesh or mesh.n_points == 0:
+            return np.empty(0, dtype=np.int64)
+        w, h = self.plotter.window_size
+        np_mat = composite_matrix(self.plotter)
+        r = float(self.brush_radius_px)
+        ax, ay = float(p0[0]), float(p0[1])
+        dx, dy = float(p1[0]) - ax, float(p1[1]) - ay
+        planes = frustum_planes(np_mat, min(ax, ax + dx) - r, min(ay, ay + dy) - r,
+                                max(ax, ax + dx) + r, max(ay, ay + dy) + r, w, h)
+        candidate_idx = self.data_manager.query_frustum(planes)
+        if len(candidate_idx) == 0:
+            return np.empty(0, dtype=np.int64)
+        seg_len2 = dx * dx + dy * dy
+
+        def test(sx, sy):
+            ex = sx - np.float32(ax)
+            ey = sy - np.float32(ay)
+            if seg_len2 > 0:
+                t = np.clip((ex * np.float32(dx) + ey * np.float32(dy)) / np.float32(seg_len2), 0.0, 1.0)
+                ex -= t * np.float32(dx)
+                ey -= t * np.float32(dy)
+            return ex * ex + ey * ey <= np.float32(r * r)
+
+        hits = select_projected(mesh.points, candidate_idx, np_mat, w, h, test)
+        return self._visible_filter(hits, np_mat, w, h)
+
+    # --- 点选物体：后台区域生长，中间结果逐步高亮 ---
+    def _start_grow(self, pos):
+        mesh = self.data_manager.mesh
+        if not mesh or mesh.n_points == 0: return
+        p = pick_point(self.plotter, self.data_manager, pos)
+        if p is None: return
+        row, _ = self.data_manager.query_nearest(p)
+        if row is None: return
+        self._cancel_grow()
+        self._bind_selection()
+        self._grow_base = self.selection.snapshot()
+        self._grow_mode = self._stroke_mode
+        self._grow_generation = self.data_manager.mesh_generation
+        worker = RegionGrowWorker(self.data_manager, row, gap=self.grow_gap, clearance=self.grow_clearance,
+                                  max_normal_angle=self.grow_normal_angle)
+        worker.progress.connect(self._on_grow_progress)
+        worker.grown.connect(self._on_grow_done)
+        worker.finished.connect(self._reap_grow_workers)
+        self._grow_worker = worker
+        self._grow_workers.append(worker)
+        worker.start()
+
+    def _cancel_grow(self, wait=False):
+        if self._grow_worker is not None:
+            self._grow_worker.cancel()
+            self._grow_worker = None
+        if wait:
+            for w in self._grow_workers:
+                w.wait()
+
+    def _reap_grow_workers(self):
+        self._grow_workers = [w for w in self._grow_workers if w.isRunning()]
+
+    def _on_grow_progress(self, rows):
+        if self.sender() is not self._grow_worker: return
+        self._show_grow(rows)
+
+    def _on_grow_done(self, rows):
+        if self.sender() is not self._grow_worker: return
+        self._grow_worker = None
+        self._show_grow(rows)
+
+    def _show_grow(self, rows):
+        # 只对发起生长时的 mesh 有效
+        if self.data_manager.mesh_generation != self._grow_generation: return
+        self._bind_selection()
+        self.selection.restore(self._grow_base)
+        self.selection.combine(rows, self._grow_mode)
+        if self.selection.count() > 0:
+            self._highlight_selection()
+        else:
+            self._clear_selection_visuals()
+
+    def _visible_filter(self, hits, np_mat, w, h):
+        """仅可见面模式下去掉被前表面挡住的点。"""
+        if not self.visible_only or len(hits) == 0:
+            return hits
+        t0 = time.perf_counter()
+        n_before = len(hits)
+        vis = visible_mask(self.data_manager.mesh.points, hits, np_mat,
+                           view_depth_row(self.plotter), w, h, self.occlusion_tolerance)
+        hits = hits[vis]
+        print(
+            f"[TIME][SELECT] visible_only={1000 * (time.perf_counter() - t0):.1f}ms, "
+            f"kept={len(hits)}/{n_before}",
+            flush=True,
+        )
+        return hits
+
     def _add_visual_point_safe(self, pos):
         try:
             renderer = self.plotter.renderer
@@ -139,109 +412,109 @@ class SelectTool(BaseTool, QObject):
 
     def _update_trace_actor(self):
         if len(self.lasso_visual_points) < 2: return
-        now = time.time()
-        if (now - self._last_trace_render_t) < self._trace_render_interval_s:
-            return
-        self._last_trace_render_t = now
-        self.plotter.remove_actor("lasso_trace_dynamic")
+        self.plotter.remove_actor("lasso_trace_dynamic", render=False)
         line = pv.lines_from_points(np.array(self.lasso_visual_points))
         actor = self.plotter.add_mesh(line, color="#FF00FF", line_width=4, name="lasso_trace_dynamic", 
-                              reset_camera=False, lighting=False)
+                              reset_camera=False, lighting=False, render=False)
         mapper = actor.GetMapper()
         mapper.SetResolveCoincidentTopologyToPolygonOffset()
         mapper.SetRelativeCoincidentTopologyPolygonOffsetParameters(0, -66000)
-        self.plotter.render()
+        self.request_render()
 
     def _clear_trace(self):
-        self.plotter.remove_actor("lasso_trace_dynamic")
+        self.plotter.remove_actor("lasso_trace_dynamic", render=False)
         self.lasso_points = []
         self.lasso_visual_points = []
         self.last_screen_pos = None
         self.is_drawing = False
-        self.plotter.render()
+        self.request_render()
 
     def calculate_selection(self):
         if not self.data_manager.mesh: return
         if len(self.lasso_points) < 3:
             return
-        path = Path(np.asarray(self.lasso_points, dtype=np.float32))
         w, h = self.plotter.window_size
-        mat = self.plotter.camera.GetCompositeProjectionTransformMatrix(self.plotter.renderer.GetTiledAspectRatio(), -1, 1)
-        np_mat = np.zeros((4, 4), dtype=np.float64)
-        for r in range(4):
-            for c in range(4): np_mat[r, c] = mat.GetElement(r, c)
-
-        # Keep math in float32 to reduce allocations/CPU on 4M+ points.
-        pts = np.asarray(self.data_manager.mesh.points, dtype=np.float32)
-        m = np_mat.astype(np.float32, copy=False)
-        x = pts[:, 0]
-        y = pts[:, 1]
-        z = pts[:, 2]
-        clip_w = x * m[3, 0] + y * m[3, 1] + z * m[3, 2] + m[3, 3]
-        visible = clip_w > 1e-8
-        if not np.any(visible):
-            self.selected_indices = np.array([], dtype=np.int64)
-            self._clear_selection_visuals()
-            return
-
-        clip_x = x * m[0, 0] + y * m[0, 1] + z * m[0, 2] + m[0, 3]
-        clip_y = x * m[1, 0] + y * m[1, 1] + z * m[1, 2] + m[1, 3]
-        inv_w = np.zeros_like(clip_w, dtype=np.float32)
-        inv_w[visible] = 1.0 / clip_w[visible]
-        scr_x = ((clip_x * inv_w) + 1.0) * (0.5 * float(w))
-        scr_y = ((clip_y * inv_w) + 1.0) * (0.5 * float(h))
+        np_mat = composite_matrix(self.plotter)
 
         lasso_arr = np.asarray(self.lasso_points, dtype=np.float32)
         min_x, max_x = float(lasso_arr[:, 0].min()), float(lasso_arr[:, 0].max())
         min_y, max_y = float(lasso_arr[:, 1].min()), float(lasso_arr[:, 1].max())
-        coarse = visible & (scr_x >= min_x) & (scr_x <= max_x) & (scr_y >= min_y) & (scr_y <= max_y)
-        if not np.any(coarse):
-            self.selected_indices = np.array([], dtype=np.int64)
-            self._clear_selection_visuals()
-            return
 
-        candidate_idx = np.where(coarse)[0]
-        candidate_scr = np.column_stack((scr_x[candidate_idx], scr_y[candidate_idx]))
-        inside = path.contains_points(candidate_scr, radius=0)
-        self.selected_indices = candidate_idx[inside]
-        if len(self.selected_indices) > 0:
+        # 先用空间索引按套索包围框的视锥粗筛，只投影候选点
+        planes = frustum_planes(np_mat, min_x, min_y, max_x, max_y, w, h)
+        candidate_idx = self.data_manager.query_frustum(planes)
+        hits = np.empty(0, dtype=np.int64)
+        if len(candidate_idx) > 0:
+            # 套索栅格化一次；候选点分块多线程投影后按像素查表 (窗口外的点不可见，不会被选中)
+            lasso = LassoMask(lasso_arr, w, h)
+            hits = select_projected(self.data_manager.mesh.points, candidate_idx, np_mat, w, h, lasso.contains)
+        self._apply_hits(self._visible_filter(hits, np_mat, w, h))
+
+    def _apply_hits(self, hits, mode=None):
+        """按合并方式 (默认本次笔画的) 把命中的行号并入选区并刷新高亮。"""
+        self._bind_selection()
+        self.selection.combine(hits, mode if mode is not None else self._stroke_mode)
+        if self.selection.count() > 0:
             self._highlight_selection()
         else:
             self._clear_selection_visuals()
         
+    def select_rows(self, rows, mode='replace'):
+        """外部算出的行号 (如离群点检测) 作为选区并高亮。"""
+        if not self.data_manager.mesh: return
+        self._apply_hits(np.asarray(rows, dtype=np.int64), mode)
+
+    def set_visible_only(self, enabled):
+        self.visible_only = bool(enabled)
+
     def clear_selection(self):
         """清除当前所有选区和高亮，重置选择状态"""
-        self.selected_indices = np.array([], dtype=int)
+        self._bind_selection()
+        self.selection.clear()
         self._clear_selection_visuals()
 
     def _highlight_selection(self):
+        if len(self.selected_indices) == 0:
+            self._clear_selection_visuals()
+            return
+        # 主点云上的逐点选区掩码：原地改写，显示全部选中点
+        set_mask = getattr(self.canvas, 'set_selection_mask', None)
+        if set_mask is not None and set_mask(self.selected_indices):
+            self._remove_highlight_actor()
+            self.request_render()
+            return
+        # 八叉树模式下主 mesh 不在 GPU 上，退回抽样的子集高亮
         self._clear_selection_visuals()
-        if len(self.selected_indices) == 0: return
         draw_indices = self.selected_indices
         if len(draw_indices) > self._max_highlight_points:
             # Keep selection result full-resolution for edit operations,
             # but render only a sampled subset to keep interaction smooth.
             step = max(1, len(draw_indices) // self._max_highlight_points)
             draw_indices = draw_indices[::step]
-        sub = self.data_manager.mesh.extract_points(draw_indices)
+        # 高亮只是少量点的叠加层，直接取坐标 (主 mesh 无单元格，extract_points 取不到点)
+        sub = pv.PolyData(np.asarray(self.data_manager.mesh.points)[draw_indices])
         self.selection_actor = self.plotter.add_mesh(sub, color="red", point_size=4, 
-                                                     lighting=False, name="selection_highlight", reset_camera=False)
+                                                     lighting=False, name="selection_highlight", reset_camera=False, render=False)
         mapper = self.selection_actor.GetMapper()
         mapper.SetResolveCoincidentTopologyToPolygonOffset()
         mapper.SetRelativeCoincidentTopologyPolygonOffsetParameters(0, -66000)
-        self.plotter.render()
+        self.request_render()
+
+    def _remove_highlight_actor(self):
+        if self.selection_actor: self.plotter.remove_actor(self.selection_actor, render=False); self.selection_actor = None
+        self.plotter.remove_actor("selection_highlight", render=False)
 
     def _clear_selection_visuals(self):
-        if self.selection_actor: self.plotter.remove_actor(self.selection_actor); self.selection_actor = None
-        self.plotter.remove_actor("selection_highlight")
+        self._remove_highlight_actor()
+        clear_mask = getattr(self.canvas, 'clear_selection_mask', None)
+        if clear_mask is not None:
+            clear_mask()
+        self.request_render()
 
     def delete_selection(self):
         if len(self.selected_indices) == 0: return
         if len(self.lasso_points) > 2: self.request_delete_measurements.emit(self.lasso_points)
-        self.data_manager.push_history()
-        all_ids = np.arange(self.data_manager.mesh.n_points)
-        keep = ~np.isin(all_ids, self.selected_indices)
-        self.data_manager.mesh = self.data_manager.mesh.extract_points(keep)
+        self.data_manager.delete_points(self.selected_indices)
         self.selected_indices = []
         self._clear_selection_visuals()
         self.selection_deleted.emit()
@@ -249,18 +522,17 @@ class SelectTool(BaseTool, QObject):
 
     def invert_selection(self):
         if not self.data_manager.mesh: return
-        all_ids = np.arange(self.data_manager.mesh.n_points)
-        self.selected_indices = np.setdiff1d(all_ids, self.selected_indices)
+        self._bind_selection()
+        self.selection.invert()
         self._highlight_selection()
         
     def get_crop_bbox(self):
-        if len(self.selected_indices) < 4: return None
-        try:
-            import open3d as o3d
-            sub = self.data_manager.mesh.extract_points(self.selected_indices)
-            pcd = o3d.geometry.PointCloud()
-            pcd.points = o3d.utility.Vector3dVector(sub.points)
-            bbox = pcd.get_oriented_bounding_box()
-            bbox.scale(1.05, bbox.get_center())
-            return bbox
-        except: return None
+        """选区的定向包围盒 (放大 5%)，直接按行号计算，交给 GeometryProcessor 裁剪。"""
+        rows = self.selected_indices
+        if len(rows) < 4: return None
+        t0 = time.perf_counter()
+        bbox = oriented_box(self.data_manager.mesh.points, rows)
+        if bbox is None: return None
+        bbox.scale(1.05)
+        print(f"[TIME][SELECT] crop_obb={1000 * (time.perf_counter() - t0):.1f}ms, points={len(rows)}", flush=True)
+        return bbox